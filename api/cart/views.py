@@ -5,10 +5,10 @@ from rest_framework import status
 from products.models import Product, Size, ProductSize
 from cart.cart import Cart
 from cart.models import CartReservation
+from cart.availability import check_availability
 from .serializers import CartAddSerializer, CartSerializer, CartItemSerializer, ReservationSerializer, ReserveItemSerializer, StockValidationSerializer
 from django.utils import timezone
 from django.db import transaction
-from django.db import models
 from datetime import timedelta
 
 @api_view(['GET'])
@@ -21,29 +21,16 @@ def cart_detail(request):
     cart_items = []
     
     for item in cart:
-        cart_item = {
-            'product_id': item['product'].id,
-            'name': item['product'].name,
-            'price': item['price'],
-            'quantity': item['quantity'],
-            'total_price': item['total_price'],
-            'image_url': item['product'].image_url
-        }
-        
-        # Add size information if available
-        if 'size' in item:
-            cart_item['size_id'] = item['size'].id
-            cart_item['size_name'] = item['size'].name
-        elif 'size_id' in item and item['size_id']:
-            try:
-                size = Size.objects.get(id=item['size_id'])
-                cart_item['size_id'] = size.id
-                cart_item['size_name'] = size.name
-            except Size.DoesNotExist:
-                cart_item['size_id'] = None
-                cart_item['size_name'] = None
-        
-        cart_items.append(cart_item)
+        cart_items.append({
+            'product_id': item.product.id,
+            'name': item.product.name,
+            'price': item.price,
+            'quantity': item.quantity,
+            'total_price': item.total_price,
+            'image_url': item.product.image_url,
+            'size_id': item.size.id if item.size else None,
+            'size_name': item.size_name,
+        })
     
     serializer = CartSerializer({
         'items': cart_items,
@@ -229,83 +216,11 @@ def validate_cart_stock(request):
         is_active=True
     ).update(is_active=False)
 
-    for item in items:
-        product_id = item.get('product_id')
-        size_id = item.get('size_id')
-        requested_quantity = item.get('quantity', 1)
-        reservation_id = item.get('reservation_id')
-
-        try:
-            product = Product.objects.get(id=product_id)
-            size = Size.objects.get(id=size_id) if size_id else None
-
-            # Check if current user's reservation is still valid
-            user_has_valid_reservation = False
-            if reservation_id:
-                try:
-                    user_reservation = CartReservation.objects.get(
-                        id=reservation_id,
-                        is_active=True,
-                        expires_at__gt=timezone.now()
-                    )
-                    user_has_valid_reservation = True
-                except CartReservation.DoesNotExist:
-                    user_has_valid_reservation = False
-
-            # Get total stock
-            if size:
-                try:
-                    product_size = ProductSize.objects.get(product=product, size=size)
-                    total_stock = product_size.stock
-                except ProductSize.DoesNotExist:
-                    total_stock = 0
-            else:
-                total_stock = product.stock
-
-            # Calculate reserved stock by others
-            reserved_stock = CartReservation.objects.filter(
-                product=product,
-                size=size,
-                is_active=True,
-                expires_at__gt=timezone.now()
-            ).aggregate(total=models.Sum('quantity'))['total'] or 0
-
-            available_stock = total_stock - reserved_stock
-
-            # Determine availability
-            is_available = True
-            is_expired_and_taken = False
-
-            if not user_has_valid_reservation:
-                # User's reservation expired, check if item is still available
-                if available_stock < requested_quantity:
-                    # Item is not available because others have reserved it
-                    is_available = False
-                    is_expired_and_taken = True
-                    expired_but_taken_items.append({
-                        'product_id': product_id,
-                        'name': product.name,
-                        'size': size.name if size else None
-                    })
-                # If available_stock >= requested_quantity, item is still available
-                # so is_available remains True
-
-            if not is_available:
-                all_available = False
+    for line in check_availability(items):
+        product_id = line.product_id
+        size_id = line.size_id
 
-            validation_results.append({
-                'product_id': product_id,
-                'size_id': size_id,
-                'product_name': product.name,
-                'size_name': size.name if size else None,
-                'requested_quantity': requested_quantity,
-                'available_stock': available_stock,
-                'is_available': is_available,
-                'is_expired': not user_has_valid_reservation,
-                'is_expired_and_taken': is_expired_and_taken
-            })
-
-        except (Product.DoesNotExist, Size.DoesNotExist):
+        if not line.found:
             validation_results.append({
                 'product_id': product_id,
                 'size_id': size_id,
@@ -315,6 +230,44 @@ def validate_cart_stock(request):
                 'is_expired_and_taken': False
             })
             all_available = False
+            continue
+
+        product = line.product
+        size = line.size
+        available_stock = line.available_stock
+
+        # Determine availability
+        is_available = True
+        is_expired_and_taken = False
+
+        if not line.has_valid_reservation:
+            # User's reservation expired, check if item is still available
+            if available_stock < line.requested_quantity:
+                # Item is not available because others have reserved it
+                is_available = False
+                is_expired_and_taken = True
+                expired_but_taken_items.append({
+                    'product_id': product_id,
+                    'name': product.name,
+                    'size': size.name if size else None
+                })
+            # If available_stock >= requested_quantity, item is still available
+            # so is_available remains True
+
+        if not is_available:
+            all_available = False
+
+        validation_results.append({
+            'product_id': product_id,
+            'size_id': size_id,
+            'product_name': product.name,
+            'size_name': size.name if size else None,
+            'requested_quantity': line.requested_quantity,
+            'available_stock': available_stock,
+            'is_available': is_available,
+            'is_expired': not line.has_valid_reservation,
+            'is_expired_and_taken': is_expired_and_taken
+        })
 
     return Response({
         'success': all_available,
@@ -351,86 +304,52 @@ def validate_checkout(request):
     unavailable_items = []
     renewed_reservations = []
     
-    for item in items:
-        reservation_id = item.get('reservation_id')
-        product_id = item.get('product_id')
-        size_id = item.get('size_id')
-        quantity = item.get('quantity', 1)
-        session_id = request.session.session_key or f"session_{timezone.now().timestamp()}"
-        
-        try:
-            product = Product.objects.get(id=product_id)
-            size = Size.objects.get(id=size_id) if size_id else None
-            
-            # Check if user's reservation exists and is valid
-            user_has_valid_reservation = False
-            if reservation_id:
-                try:
-                    reservation = CartReservation.objects.get(
-                        id=reservation_id,
-                        is_active=True,
-                        expires_at__gt=timezone.now()
-                    )
-                    user_has_valid_reservation = True
-                except CartReservation.DoesNotExist:
-                    user_has_valid_reservation = False
-
-            # If user doesn't have valid reservation, check if item is still available
-            if not user_has_valid_reservation:
-                # Get total stock
-                if size:
-                    try:
-                        product_size = ProductSize.objects.get(product=product, size=size)
-                        total_stock = product_size.stock
-                    except ProductSize.DoesNotExist:
-                        total_stock = 0
-                else:
-                    total_stock = product.stock
-
-                # Calculate reserved stock by others
-                reserved_stock = CartReservation.objects.filter(
-                    product=product,
-                    size=size,
-                    is_active=True,
-                    expires_at__gt=timezone.now()
-                ).aggregate(total=models.Sum('quantity'))['total'] or 0
-
-                available_stock = total_stock - reserved_stock
-
-                # If item is still available, try to create new reservation
-                if available_stock >= quantity:
-                    try:
-                        # Create new reservation for the item
-                        new_reservation = CartReservation.objects.create(
-                            session_id=session_id,
-                            product=product,
-                            size=size,
-                            quantity=quantity,
-                            expires_at=timezone.now() + timedelta(minutes=5),
-                            is_active=True
-                        )
-                        renewed_reservations.append({
-                            'product_id': product_id,
-                            'reservation_id': new_reservation.id,
-                            'expires_at': new_reservation.expires_at
-                        })
-                    except Exception as e:
-                        # If reservation creation fails, still allow if item is available
-                        print(f"Failed to create new reservation: {e}")
-                else:
-                    # Item is not available because others have reserved it
-                    expired_but_taken_items.append({
-                        'product_id': product_id,
-                        'name': product.name,
-                        'size': size.name if size else None
-                    })
-            
-        except (Product.DoesNotExist, Size.DoesNotExist):
+    session_id = request.session.session_key or f"session_{timezone.now().timestamp()}"
+
+    for line in check_availability(items):
+        product_id = line.product_id
+
+        if not line.found:
             unavailable_items.append({
                 'product_id': product_id,
                 'name': 'Unknown Product',
                 'size': 'Unknown Size'
             })
+            continue
+
+        # If user doesn't have valid reservation, check if item is still available
+        if not line.has_valid_reservation:
+            product = line.product
+            size = line.size
+            quantity = line.requested_quantity
+
+            # If item is still available, try to create new reservation
+            if line.available_stock >= quantity:
+                try:
+                    # Create new reservation for the item
+                    new_reservation = CartReservation.objects.create(
+                        session_id=session_id,
+                        product=product,
+                        size=size,
+                        quantity=quantity,
+                        expires_at=timezone.now() + timedelta(minutes=5),
+                        is_active=True
+                    )
+                    renewed_reservations.append({
+                        'product_id': product_id,
+                        'reservation_id': new_reservation.id,
+                        'expires_at': new_reservation.expires_at
+                    })
+                except Exception as e:
+                    # If reservation creation fails, still allow if item is available
+                    print(f"Failed to create new reservation: {e}")
+            else:
+                # Item is not available because others have reserved it
+                expired_but_taken_items.append({
+                    'product_id': product_id,
+                    'name': product.name,
+                    'size': size.name if size else None
+                })
 
     # Only prevent checkout if items are taken by others
     if expired_but_taken_items or unavailable_items:
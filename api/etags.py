@@ -0,0 +1,55 @@
+"""
+Strong ETags for the read-only API endpoints.
+
+Use the decorators above ``@api_view`` so a matching ``If-None-Match``
+is answered with 304 before DRF runs the view or any serializer:
+
+    @catalog_etag
+    @api_view(['GET'])
+    @permission_classes([AllowAny])
+    def product_list(request):
+        ...
+"""
+import hashlib
+
+from django.db.models import Count, Max
+from django.views.decorators.http import etag
+
+
+def _digest(*parts):
+    raw = '|'.join(str(part) for part in parts)
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+
+def catalog_etag_func(request, *args, **kwargs):
+    """
+    ETag for catalog responses, from the catalog version in products.cache.
+
+    The version is a database row bumped by every catalog change (products,
+    sizes, stock, images), so every process derives the same ETag for the
+    same catalog state, as with the governorate ETag below.
+    """
+    from products.cache import get_catalog_version
+
+    return _digest(
+        'catalog',
+        get_catalog_version(),
+        request.get_full_path(),
+    )
+
+
+def governorate_etag_func(request, *args, **kwargs):
+    """ETag for governorate shipping responses, from GovernorateShipping.updated"""
+    from orders.models import GovernorateShipping
+
+    state = GovernorateShipping.objects.aggregate(last_updated=Max('updated'), count=Count('id'))
+    return _digest(
+        'governorates',
+        state['last_updated'],
+        state['count'],
+        request.get_full_path(),
+    )
+
+
+catalog_etag = etag(catalog_etag_func)
+governorate_etag = etag(governorate_etag_func)
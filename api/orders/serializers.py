@@ -13,9 +13,9 @@ class OrderItemSerializer(serializers.ModelSerializer):
 class OrderSerializer(serializers.ModelSerializer):
     items = OrderItemSerializer(many=True, read_only=True)
     status_display = serializers.CharField(source='get_status_display', read_only=True)
-    total_cost = serializers.DecimalField(source='get_total_cost', max_digits=10, decimal_places=2, read_only=True)
-    shipping_cost = serializers.DecimalField(source='get_shipping_cost', max_digits=10, decimal_places=2, read_only=True)
-    total_cost_with_shipping = serializers.DecimalField(source='get_total_cost_with_shipping', max_digits=10, decimal_places=2, read_only=True)
+    total_cost = serializers.DecimalField(source='subtotal', max_digits=10, decimal_places=2, read_only=True)
+    shipping_cost = serializers.DecimalField(source='shipping_amount', max_digits=10, decimal_places=2, read_only=True)
+    total_cost_with_shipping = serializers.DecimalField(source='total', max_digits=10, decimal_places=2, read_only=True)
 
     class Meta:
         model = Order
@@ -52,7 +52,8 @@ class OrderCreateSerializer(serializers.ModelSerializer):
 
         # Import the custom exception
         from orders.exceptions import InsufficientStockError
-        from products.models import Product, ProductSize
+        from orders.inventory import commit_stock
+        from cart.availability import check_availability
         from django.db import transaction
 
         # Determine data source: either from request items or session cart
@@ -77,75 +78,49 @@ class OrderCreateSerializer(serializers.ModelSerializer):
             cart = Cart(request)
             
             for item in cart:
-                size_id = None
-                size_name = None
-                
-                # Extract size information from cart item
-                if 'size' in item and hasattr(item['size'], 'id'):
-                    size_id = item['size'].id
-                    size_name = item['size'].name
-                elif 'size_id' in item:
-                    size_id = item['size_id']
-                    size_name = item.get('size_name', None)
-                
                 cart_items.append({
-                    'product_id': item['product'].id if item['product'] else None,
-                    'product': item['product'],
-                    'name': item['product'].name if item['product'] else item.get('name', ''),
-                    'price': item['price'],
-                    'quantity': item['quantity'],
-                    'size_name': size_name,
-                    'size_id': size_id,
+                    'product_id': item.product.id,
+                    'product': item.product,
+                    'name': item.product.name,
+                    'price': item.price,
+                    'quantity': item.quantity,
+                    'size_name': item.size_name,
+                    'size_id': item.size_id,
                     'is_request_item': False
                 })
 
-        # Validate stock for all items before creating the order
+        # Validate stock for all items before creating the order. This is a
+        # fast read-only check; commit_stock() below is authoritative.
         if cart_items:
             print(f"Validating stock for {len(cart_items)} items")
-            for cart_item in cart_items:
-                product_id = cart_item.get('product_id')
-                if not product_id:
-                    continue  # Skip validation for custom items without product_id
-
-                try:
-                    product = cart_item.get('product') if not cart_item['is_request_item'] else Product.objects.get(id=product_id)
-                    quantity = cart_item['quantity']
-                    size_id = cart_item.get('size_id')
-                    size_name = cart_item.get('size_name')
-
+            # Skip validation for custom items without product_id
+            stock_items = [cart_item for cart_item in cart_items if cart_item.get('product_id')]
+
+            for cart_item, line in zip(stock_items, check_availability(stock_items)):
+                product = line.product
+                if product is None:
+                    print(f"Product with ID {cart_item['product_id']} not found")
+                    continue
+                cart_item['product'] = product
+
+                quantity = cart_item['quantity']
+                if line.size_stock is not None:
                     # Check stock for product with specific size
-                    if size_id:
-                        try:
-                            product_size = ProductSize.objects.get(
-                                product=product,
-                                size_id=size_id
-                            )
-                            if product_size.stock < quantity:
-                                raise InsufficientStockError(
-                                    product.name,
-                                    size_name or product_size.size.name,
-                                    quantity,
-                                    product_size.stock
-                                )
-                        except ProductSize.DoesNotExist:
-                            # If ProductSize doesn't exist, check general product stock
-                            if product.stock < quantity:
-                                raise InsufficientStockError(
-                                    product.name,
-                                    None,
-                                    quantity,
-                                    product.stock
-                                )
-                    # Check general product stock if no size specified
-                    elif product.stock < quantity:
+                    if line.size_stock < quantity:
                         raise InsufficientStockError(
                             product.name,
-                            None,
+                            cart_item.get('size_name') or line.size.name,
                             quantity,
-                            product.stock
+                            line.size_stock
                         )
-                except Product.DoesNotExist:
-                    print(f"Product with ID {product_id} not found")
+                # No size, or no ProductSize row: check general product stock
+                elif product.stock < quantity:
+                    raise InsufficientStockError(
+                        product.name,
+                        None,
+                        quantity,
+                        product.stock
+                    )
 
         # Use single transaction to ensure all operations succeed or fail together
         with transaction.atomic():
@@ -156,16 +131,19 @@ class OrderCreateSerializer(serializers.ModelSerializer):
             )
 
             # Add email to consolidated email list
+            # Errors are swallowed, so run in a savepoint: a database error
+            # must not leave the order's transaction aborted
             try:
                 from communications.utils import add_to_email_list
                 name = f"{order.first_name} {order.last_name}".strip()
-                add_to_email_list(
-                    email=order.email,
-                    name=name,
-                    source='order',
-                    user=user,
-                    increment_order=True
-                )
+                with transaction.atomic():
+                    add_to_email_list(
+                        email=order.email,
+                        name=name,
+                        source='order',
+                        user=user,
+                        increment_order=True
+                    )
             except ImportError:
                 print("Communications app not available - skipping email list update")
             except Exception as e:
@@ -174,55 +152,31 @@ class OrderCreateSerializer(serializers.ModelSerializer):
             # Process all cart items
             if cart_items:
                 print(f"Creating order items: {len(cart_items)} items")
-                for cart_item in cart_items:
-                    product_id = cart_item.get('product_id')
-                    product = None
-
-                    if product_id:
-                        if cart_item['is_request_item']:
-                            try:
-                                product = Product.objects.get(id=product_id)
-                            except Product.DoesNotExist:
-                                print(f"Product with ID {product_id} not found")
-                        else:
-                            product = cart_item.get('product')
-
-                    # Create the order item with size information
-                    OrderItem.objects.create(
+                # Create the order items with size information in one
+                # insert; product was resolved during stock validation and
+                # is None for custom items
+                OrderItem.objects.bulk_create([
+                    OrderItem(
                         order=order,
-                        product=product,  # Can be None for custom items
+                        product=cart_item.get('product'),
                         price=cart_item['price'],
                         quantity=cart_item['quantity'],
                         size_name=cart_item.get('size_name'),
                         size_id=cart_item.get('size_id')
                     )
-
-                    # Update inventory if product exists
-                    if product:
-                        size_id = cart_item.get('size_id')
-                        quantity = cart_item['quantity']
-                        
-                        if size_id:
-                            try:
-                                product_size = ProductSize.objects.get(
-                                    product=product,
-                                    size_id=size_id
-                                )
-                                # We already validated stock, so we can safely decrease it
-                                product_size.stock -= quantity
-                                product_size.save()
-                                print(f"Updated inventory for {product.name}, size ID {size_id}: new stock = {product_size.stock}")
-                            except ProductSize.DoesNotExist:
-                                print(f"Warning: ProductSize not found for product ID {product.id}, size ID {size_id}")
-                                # Fallback to general product stock
-                                product.stock -= quantity
-                                product.save()
-                                print(f"Updated general inventory for {product.name}: new stock = {product.stock}")
-                        else:
-                            # Update general product stock
-                            product.stock -= quantity
-                            product.save()
-                            print(f"Updated general inventory for {product.name}: new stock = {product.stock}")
+                    for cart_item in cart_items
+                ])
+                # bulk_create() skips the signal that maintains the totals
+                order.update_totals()
+
+                # Take stock for every line in one pass; raises
+                # InsufficientStockError (rolling back the order) if another
+                # checkout got there first
+                commit_stock(
+                    (cart_item['product'], cart_item.get('size_id'), cart_item['quantity'])
+                    for cart_item in cart_items
+                    if cart_item.get('product')
+                )
 
                 # Clear the session cart if we used it
                 if not items_data:
@@ -234,10 +188,12 @@ class OrderCreateSerializer(serializers.ModelSerializer):
                 print("No items to process")
 
             
-            # Send confirmation email after all items are created
+            # Queue confirmation email after all items are created, in a
+            # savepoint for the same reason
             try:
                 from orders.utils import send_order_confirmation_email
-                send_order_confirmation_email(order)
+                with transaction.atomic():
+                    send_order_confirmation_email(order)
             except Exception as e:
                 print(f"Error sending confirmation email: {e}")
                 import traceback
@@ -2,11 +2,15 @@ from rest_framework import generics, status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework.response import Response
-from orders.models import Order, GovernorateShipping
+from orders.models import Order, OrderItem, DEFAULT_SHIPPING_FEE
+from orders.rates import get_rate_table
 from .serializers import OrderSerializer, OrderCreateSerializer
 from django.shortcuts import get_object_or_404
+from django.db.models import Prefetch
 from django.contrib.auth.models import User
+from api.etags import governorate_etag
 
+@governorate_etag
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def get_shipping_cost(request):
@@ -20,43 +24,36 @@ def get_shipping_cost(request):
             'error': 'Governorate parameter is required'
         }, status=status.HTTP_400_BAD_REQUEST)
     
-    # Get shipping cost using the model's method
-    shipping_cost = GovernorateShipping.get_shipping_cost(governorate)
-    
-    # Check if governorate exists and is active
-    try:
-        gov_obj = GovernorateShipping.objects.get(name__iexact=governorate, is_active=True)
-        governorate_found = True
-        is_custom_rate = True
-    except GovernorateShipping.DoesNotExist:
-        governorate_found = False
-        is_custom_rate = False
+    # One lookup in the in-process rate table for both the cost and whether
+    # the governorate has an active custom rate
+    rates = get_rate_table()
+    governorate_found = rates.get(governorate) is not None
+    shipping_cost = rates.shipping_cost(governorate)
     
     return Response({
         'governorate': governorate,
         'shipping_cost': float(shipping_cost),
         'governorate_found': governorate_found,
-        'is_custom_rate': is_custom_rate,
+        'is_custom_rate': governorate_found,
         'currency': 'LE'
     })
 
+@governorate_etag
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def list_governorates_shipping(request):
     """
     List all available governorates with their shipping costs
     """
-    governorates = GovernorateShipping.objects.filter(is_active=True).order_by('name')
-    
     data = [{
-        'name': gov.name,
-        'shipping_cost': float(gov.shipping_cost),
-        'is_active': gov.is_active
-    } for gov in governorates]
+        'name': rate.name,
+        'shipping_cost': float(rate.shipping_cost),
+        'is_active': True
+    } for rate in get_rate_table().active()]
     
     return Response({
         'governorates': data,
-        'default_shipping_cost': 100,
+        'default_shipping_cost': DEFAULT_SHIPPING_FEE,
         'currency': 'LE'
     })
 
@@ -68,7 +65,9 @@ class OrderListView(generics.ListAPIView):
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        return Order.objects.filter(user=self.request.user).order_by('-created')
+        return Order.objects.filter(user=self.request.user).prefetch_related(
+            Prefetch('items', queryset=OrderItem.objects.select_related('product'))
+        ).order_by('-created')
 
 class OrderDetailView(generics.RetrieveAPIView):
     """
@@ -79,7 +78,10 @@ class OrderDetailView(generics.RetrieveAPIView):
 
     def get_object(self):
         order_id = self.kwargs.get('order_id')
-        return get_object_or_404(Order, id=order_id, user=self.request.user)
+        queryset = Order.objects.prefetch_related(
+            Prefetch('items', queryset=OrderItem.objects.select_related('product'))
+        )
+        return get_object_or_404(queryset, id=order_id, user=self.request.user)
 
 @api_view(['POST'])
 @permission_classes([AllowAny])
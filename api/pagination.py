@@ -0,0 +1,85 @@
+import base64
+import json
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class NameIdCursorPagination(BasePagination):
+    """
+    Keyset pagination over (name, id).
+
+    Each page is a single indexed range scan starting after the last row of
+    the previous page, so response time does not grow with the page number
+    the way OFFSET pagination does. The cursor is an opaque token holding
+    the (name, id) of that last row.
+    """
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'limit'
+    page_size = 24
+    max_page_size = 100
+    ordering = ('name', 'id')
+
+    invalid_cursor_message = 'Invalid cursor'
+
+    def is_requested(self, request):
+        """Pagination is opt-in so existing clients keep the full list."""
+        params = request.query_params
+        return self.cursor_query_param in params or self.page_size_query_param in params
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if size <= 0:
+            return self.page_size
+        return min(size, self.max_page_size)
+
+    def encode_cursor(self, obj):
+        raw = json.dumps([obj.name, obj.id], ensure_ascii=False).encode('utf-8')
+        return base64.urlsafe_b64encode(raw).decode('ascii')
+
+    def decode_cursor(self, request):
+        token = request.query_params.get(self.cursor_query_param)
+        if not token:
+            return None
+        try:
+            name, pk = json.loads(base64.urlsafe_b64decode(token.encode('ascii')))
+        except (TypeError, ValueError, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+        # Only what encode_cursor() writes; anything else could fail in the query
+        if not isinstance(name, str) or type(pk) is not int or not 0 < pk < 2 ** 63:
+            raise NotFound(self.invalid_cursor_message)
+        return name, pk
+
+    def paginate_queryset(self, queryset, request, view=None):
+        """Return (page, next_cursor) for the requested slice of ``queryset``."""
+        page_size = self.get_page_size(request)
+        queryset = queryset.order_by(*self.ordering)
+
+        position = self.decode_cursor(request)
+        if position is not None:
+            name, pk = position
+            queryset = queryset.filter(Q(name__gt=name) | Q(name=name, id__gt=pk))
+
+        # Fetch one extra row to learn whether there is a next page
+        rows = list(queryset[:page_size + 1])
+        page = rows[:page_size]
+        next_cursor = self.encode_cursor(page[-1]) if len(rows) > page_size else None
+        return page, next_cursor
+
+    def get_next_link(self, request, next_cursor):
+        if next_cursor is None:
+            return None
+        url = request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, next_cursor)
+
+    def get_paginated_response(self, data, request=None, next_cursor=None):
+        return Response({
+            'next': self.get_next_link(request, next_cursor),
+            'results': data,
+        })
@@ -1,5 +1,63 @@
+from django.db import models
 from rest_framework import serializers
-from products.models import Product, Category, Size, ProductImage, ProductSize
+from products.models import DEFAULT_PRODUCT_IMAGE, Product, Category, Size, ProductImage, ProductSize
+from products.images import image_urls
+from products.renditions import load_srcsets
+
+
+class DynamicFieldsMixin:
+    """
+    Accepts an optional ``fields`` argument limiting which fields are rendered.
+    Unknown names are ignored.
+    """
+
+    def __init__(self, *args, **kwargs):
+        fields = kwargs.pop('fields', None)
+        super().__init__(*args, **kwargs)
+
+        if fields is not None:
+            for field_name in set(self.fields) - set(fields):
+                self.fields.pop(field_name)
+
+
+class CatalogImageMixin:
+    """
+    ``image_url`` and ``image_srcset`` ({format: srcset string} of the
+    image's renditions). Lists build the URLs and load the renditions of
+    every image they render in one pass (see CatalogImageListSerializer); a
+    single object does it for itself.
+    """
+    default_image_url = ''
+
+    def image_files(self, instances):
+        return [obj.image for obj in instances]
+
+    def load_images(self, instances):
+        files = self.image_files(instances)
+        self.context.setdefault('image_urls', {}).update(image_urls(files))
+        # Products also render their detail images' srcsets
+        if {'image_srcset', 'detail_images'} & set(self.fields):
+            self.context.setdefault('image_srcsets', {}).update(load_srcsets([file.name for file in files]))
+
+    def get_image_url(self, obj):
+        if 'image_urls' not in self.context:
+            self.load_images([obj])
+        return self.context['image_urls'].get(obj.image.name, self.default_image_url)
+
+    def get_image_srcset(self, obj):
+        if 'image_srcsets' not in self.context:
+            self.load_images([obj])
+        return self.context['image_srcsets'].get(obj.image.name, {})
+
+
+class CatalogImageListSerializer(serializers.ListSerializer):
+    """Builds image URLs and loads renditions for the whole list up front."""
+
+    def to_representation(self, data):
+        items = list(data.all() if isinstance(data, models.manager.BaseManager) else data)
+        if 'image_urls' not in self.context:
+            self.child.load_images(items)
+        return super().to_representation(items)
 
 
 class CategorySerializer(serializers.ModelSerializer):
@@ -22,42 +80,66 @@ class ProductSizeSerializer(serializers.ModelSerializer):
         fields = ['id', 'size', 'stock']
 
 
-class ProductImageSerializer(serializers.ModelSerializer):
+class ProductImageSerializer(CatalogImageMixin, serializers.ModelSerializer):
     image_url = serializers.SerializerMethodField()
+    image_srcset = serializers.SerializerMethodField()
 
     class Meta:
         model = ProductImage
-        fields = ['id', 'image_url', 'alt_text']
-
-    def get_image_url(self, obj):
-        # Use the model's image_url property which handles GitHub URLs
-        return obj.image_url
+        fields = ['id', 'image_url', 'image_srcset', 'alt_text']
+        list_serializer_class = CatalogImageListSerializer
 
 
-class ProductSerializer(serializers.ModelSerializer):
+class ProductSerializer(CatalogImageMixin, serializers.ModelSerializer):
     category = CategorySerializer(read_only=True)
     sizes = SizeSerializer(many=True, read_only=True)
     available_sizes = serializers.SerializerMethodField()
     image_url = serializers.SerializerMethodField()
+    image_srcset = serializers.SerializerMethodField()
     detail_images = serializers.SerializerMethodField()
 
     class Meta:
         model = Product
         fields = [
-            'id', 'name', 'slug', 'image_url', 'description', 
+            'id', 'name', 'slug', 'image_url', 'image_srcset', 'description', 
             'price', 'stock', 'available', 'category', 'sizes',
             'is_featured', 'detail_images', 'available_sizes', 'created', 'updated'
         ]
+        list_serializer_class = CatalogImageListSerializer
 
-    def get_image_url(self, obj):
-        # Use the model's image_url property which handles GitHub URLs
-        return obj.image_url
+    default_image_url = DEFAULT_PRODUCT_IMAGE
 
     def get_detail_images(self, obj):
         detail_images = obj.detail_images.all()
-        return ProductImageSerializer(detail_images, many=True).data
+        # Shares the context so the URLs and renditions loaded for the list are reused
+        return ProductImageSerializer(detail_images, many=True, context=self.context).data
+
+    def image_files(self, instances):
+        files = super().image_files(instances)
+        if 'detail_images' in self.fields:
+            files += [image.image for obj in instances for image in obj.detail_images.all()]
+        return files
     
     def get_available_sizes(self, obj):
         """Returns sizes that have stock available"""
-        product_sizes = obj.product_sizes.filter(stock__gt=0)
-        return ProductSizeSerializer(product_sizes, many=True).data
\ No newline at end of file
+        # Prefer the rows loaded by Product.objects.with_catalog_relations()
+        product_sizes = getattr(obj, 'in_stock_sizes', None)
+        if product_sizes is None:
+            product_sizes = obj.product_sizes.filter(stock__gt=0).select_related('size')
+        return ProductSizeSerializer(product_sizes, many=True).data
+
+
+class ProductListSerializer(DynamicFieldsMixin, ProductSerializer):
+    """
+    Lightweight serializer for catalog listings.
+    Skips description and detail images unless they are asked for via ``fields``.
+    """
+    default_excluded_fields = ('description', 'detail_images')
+
+    def __init__(self, *args, **kwargs):
+        if kwargs.get('fields') is None:
+            kwargs['fields'] = [
+                name for name in ProductSerializer.Meta.fields
+                if name not in self.default_excluded_fields
+            ]
+        super().__init__(*args, **kwargs)
@@ -5,4 +5,5 @@ urlpatterns = [
     path('', views.product_list, name='api_product_list'),
     path('<int:id>/<slug:slug>/', views.product_detail, name='api_product_detail'),
     path('categories/', views.category_list, name='api_category_list'),
+    path('cache-stats/', views.catalog_cache_stats, name='api_catalog_cache_stats'),
 ] 
\ No newline at end of file
@@ -1,53 +1,112 @@
 from rest_framework.decorators import api_view, permission_classes
-from rest_framework.permissions import AllowAny
+from rest_framework.permissions import AllowAny, IsAdminUser
 from rest_framework.response import Response
 from rest_framework import status
 from products.models import Product, Category
-from .serializers import ProductSerializer, CategorySerializer
+from products.cache import get_or_build, get_cache_stats
+from api.etags import catalog_etag
+from api.pagination import NameIdCursorPagination
+from .serializers import ProductSerializer, ProductListSerializer, CategorySerializer
 
+@catalog_etag
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def product_list(request):
     """
-    List all available products or filter by category or is_featured
+    List all available products or filter by category or is_featured.
+
+    Optional parameters:
+    - fields: comma-separated list of fields to return
+    - limit / cursor: keyset pagination; the response becomes
+      {"next": <url or null>, "results": [...]} and uses the lightweight
+      listing serializer (no description or detail images unless asked for)
     """
     category_slug = request.query_params.get('category', None)
     is_featured = request.query_params.get('is_featured', None)
+    fields_param = request.query_params.get('fields', None)
+    fields = [f.strip() for f in fields_param.split(',') if f.strip()] if fields_param else None
+
+    paginator = NameIdCursorPagination()
+    paginate = paginator.is_requested(request)
+    lightweight = paginate or fields is not None
+
+    def build():
+        if lightweight:
+            serializer_class = ProductListSerializer
+            serializer_kwargs = {'fields': fields}
+            wanted = fields or [
+                name for name in ProductSerializer.Meta.fields
+                if name not in ProductListSerializer.default_excluded_fields
+            ]
+        else:
+            serializer_class = ProductSerializer
+            serializer_kwargs = {}
+            wanted = ProductSerializer.Meta.fields
 
-    products = Product.objects.filter(available=True)
+        products = Product.objects.filter(available=True).with_catalog_relations(
+            detail_images='detail_images' in wanted
+        )
+        if 'description' not in wanted:
+            products = products.defer('description')
 
-    if category_slug:
-        try:
+        if category_slug:
             category = Category.objects.get(slug=category_slug)
             products = products.filter(category=category)
-        except Category.DoesNotExist:
-            return Response({"error": "Category not found"}, status=status.HTTP_404_NOT_FOUND)
 
-    if is_featured is not None:
-        products = products.filter(is_featured=is_featured.lower() == 'true')
+        if is_featured is not None:
+            products = products.filter(is_featured=is_featured.lower() == 'true')
+
+        if paginate:
+            page, next_cursor = paginator.paginate_queryset(products, request)
+            return {
+                'next_cursor': next_cursor,
+                'results': serializer_class(page, many=True, **serializer_kwargs).data,
+            }
+        return serializer_class(products, many=True, **serializer_kwargs).data
+
+    try:
+        data = get_or_build('product_list', request.query_params.dict(), build)
+    except Category.DoesNotExist:
+        return Response({"error": "Category not found"}, status=status.HTTP_404_NOT_FOUND)
 
-    serializer = ProductSerializer(products, many=True)
-    return Response(serializer.data)
+    if paginate:
+        return paginator.get_paginated_response(data['results'], request, data['next_cursor'])
+    return Response(data)
 
+@catalog_etag
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def product_detail(request, id, slug):
     """
     Retrieve a specific product
     """
+    def build():
+        product = Product.objects.with_catalog_relations().get(id=id, slug=slug, available=True)
+        return ProductSerializer(product).data
+
     try:
-        product = Product.objects.get(id=id, slug=slug, available=True)
-        serializer = ProductSerializer(product)
-        return Response(serializer.data)
+        data = get_or_build('product_detail', {'id': id, 'slug': slug}, build)
+        return Response(data)
     except Product.DoesNotExist:
         return Response({"error": "Product not found"}, status=status.HTTP_404_NOT_FOUND)
 
+@catalog_etag
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def category_list(request):
     """
     List all product categories
     """
-    categories = Category.objects.all()
-    serializer = CategorySerializer(categories, many=True)
-    return Response(serializer.data)
\ No newline at end of file
+    def build():
+        categories = Category.objects.all()
+        return CategorySerializer(categories, many=True).data
+
+    return Response(get_or_build('category_list', None, build))
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def catalog_cache_stats(request):
+    """
+    Hit/miss counters for the catalog response cache
+    """
+    return Response(get_cache_stats())
@@ -0,0 +1,126 @@
+"""
+Batched stock availability for a whole cart.
+
+check_availability() resolves every line of a cart with a fixed number of
+queries (products, sizes, ProductSize stock, grouped reservation totals and
+reservation validity) instead of four or more queries per line, and then
+computes availability in memory.
+"""
+from django.db.models import Sum
+from django.utils import timezone
+from products.models import Product, Size, ProductSize
+from .models import CartReservation
+
+
+def _to_int(value):
+    if value in (None, '', 'null', 'undefined'):
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class LineAvailability:
+    """Availability of one requested cart line."""
+    __slots__ = (
+        'product_id', 'size_id', 'requested_quantity', 'reservation_id',
+        'product', 'size', 'size_stock', 'reserved_stock', 'has_valid_reservation',
+    )
+
+    def __init__(self, product_id, size_id, requested_quantity, reservation_id):
+        self.product_id = product_id
+        self.size_id = size_id
+        self.requested_quantity = requested_quantity
+        self.reservation_id = reservation_id
+        self.product = None
+        self.size = None
+        self.size_stock = None  # None when no ProductSize row exists
+        self.reserved_stock = 0
+        self.has_valid_reservation = False
+
+    @property
+    def found(self):
+        """False if the product, or the requested size, doesn't exist"""
+        return self.product is not None and (self.size_id is None or self.size is not None)
+
+    @property
+    def total_stock(self):
+        if self.size is not None:
+            return self.size_stock or 0
+        return self.product.stock if self.product is not None else 0
+
+    @property
+    def available_stock(self):
+        """Stock left once every active reservation is taken into account"""
+        return self.total_stock - self.reserved_stock
+
+    @property
+    def is_available(self):
+        return self.found and self.available_stock >= self.requested_quantity
+
+
+def check_availability(items, now=None):
+    """
+    Compute availability for a list of cart lines.
+
+    ``items`` is an iterable of dicts with ``product_id``, optional ``size_id``,
+    optional ``quantity`` (default 1) and optional ``reservation_id``.
+    Returns a list of LineAvailability in the same order.
+    """
+    now = now or timezone.now()
+    lines = [
+        LineAvailability(
+            product_id=_to_int(item.get('product_id')),
+            size_id=_to_int(item.get('size_id')),
+            requested_quantity=item.get('quantity', 1),
+            reservation_id=_to_int(item.get('reservation_id')),
+        )
+        for item in items
+    ]
+
+    product_ids = {line.product_id for line in lines if line.product_id is not None}
+    size_ids = {line.size_id for line in lines if line.size_id is not None}
+    reservation_ids = {line.reservation_id for line in lines if line.reservation_id is not None}
+    if not product_ids:
+        return lines
+
+    products = Product.objects.in_bulk(product_ids)
+    sizes = Size.objects.in_bulk(size_ids) if size_ids else {}
+
+    size_stock = {}
+    if size_ids:
+        rows = ProductSize.objects.filter(
+            product_id__in=product_ids,
+            size_id__in=size_ids,
+        ).values_list('product_id', 'size_id', 'stock')
+        size_stock = {(product_id, size_id): stock for product_id, size_id, stock in rows}
+
+    reserved = {
+        (row['product_id'], row['size_id']): row['total']
+        for row in CartReservation.objects.filter(
+            product_id__in=product_ids,
+            is_active=True,
+            expires_at__gt=now,
+        ).values('product_id', 'size_id').annotate(total=Sum('quantity'))
+    }
+
+    valid_reservations = set()
+    if reservation_ids:
+        valid_reservations = set(
+            CartReservation.objects.filter(
+                id__in=reservation_ids,
+                is_active=True,
+                expires_at__gt=now,
+            ).values_list('id', flat=True)
+        )
+
+    for line in lines:
+        line.product = products.get(line.product_id)
+        if line.size_id is not None:
+            line.size = sizes.get(line.size_id)
+            line.size_stock = size_stock.get((line.product_id, line.size_id))
+        line.reserved_stock = reserved.get((line.product_id, line.size_id), 0)
+        line.has_valid_reservation = line.reservation_id in valid_reservations
+
+    return lines
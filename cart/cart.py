@@ -1,18 +1,65 @@
-from django.db import models
-from django.conf import settings
+from decimal import Decimal
 from products.models import Product, Size
+from .storage import get_cart_storage
+
+
+def parse_cart_key(key):
+    """
+    Split a cart key ("<product_id>" or "<product_id>_<size_id>") into ids.
+    Returns (product_id, size_id); size_id is None for unsized lines and
+    product_id is None if the key is malformed.
+    """
+    product_part, _, size_part = str(key).partition('_')
+    try:
+        product_id = int(product_part)
+    except ValueError:
+        return None, None
+    try:
+        size_id = int(size_part) if size_part else None
+    except ValueError:
+        # Legacy keys may carry 'null' / 'undefined' from the front end
+        size_id = None
+    return product_id, size_id
+
+
+class CartLine:
+    """
+    A resolved cart line. Built once per Cart (again after it changes) and
+    never written back into the session, so views can attach forms to it.
+    """
+    __slots__ = ('key', 'product', 'size', 'size_id', 'quantity', 'price', 'update_quantity_form')
+
+    def __init__(self, key, product, size, size_id, quantity, price):
+        self.key = key
+        self.product = product
+        self.size = size
+        self.size_id = size_id
+        self.quantity = quantity
+        self.price = price
+        self.update_quantity_form = None
+
+    @property
+    def size_name(self):
+        return self.size.name if self.size else None
+
+    @property
+    def total_price(self):
+        return self.price * self.quantity
+
 
 class Cart:
     def __init__(self, request):
         """
         Initialize the cart.
+        Lines are kept by the backend selected with CART_STORAGE_BACKEND.
         """
-        self.session = request.session
-        cart = self.session.get(settings.CART_SESSION_ID)
-        if not cart:
-            # save an empty cart in the session
-            cart = self.session[settings.CART_SESSION_ID] = {}
-        self.cart = cart
+        self.storage = get_cart_storage(request)
+        self._lines = None
+
+    @property
+    def cart(self):
+        """Current cart lines as {key: {'quantity', 'price', 'size_id'}}"""
+        return self.storage.load()
     
     def add(self, product, size_id=None, quantity=1, override_quantity=False):
         """
@@ -24,24 +71,12 @@ class Cart:
         key = product_id
         if size_id:
             key = f"{product_id}_{size_id}"
-            
-        if key not in self.cart:
-            self.cart[key] = {
-                'quantity': 0, 
-                'price': str(product.price),
-                'size_id': size_id
-            }
-            
-        if override_quantity:
-            self.cart[key]['quantity'] = quantity
-        else:
-            self.cart[key]['quantity'] += quantity
-            
-        self.save()
+
+        self._lines = None
+        self.storage.add_line(key, quantity, product.price, size_id, override_quantity)
     
     def save(self):
-        # mark the session as "modified" to make sure it gets saved
-        self.session.modified = True
+        self.storage.save()
     
     def remove(self, product_id, size_id=None):
         """
@@ -50,61 +85,52 @@ class Cart:
         key = str(product_id)
         if size_id:
             key = f"{product_id}_{size_id}"
-            
-        if key in self.cart:
-            del self.cart[key]
-            self.save()
+
+        self._lines = None
+        self.storage.remove_line(key)
     
     def __iter__(self):
         """
         Iterate over the items in the cart and get the products from the database.
+        The lines are built on the first pass and reused by later ones, so
+        attributes a view sets on them (update_quantity_form) reach the template.
         """
-        # Get all product_ids and size_ids from cart
+        if self._lines is None:
+            self._lines = self._build_lines()
+        return iter(self._lines)
+
+    def _build_lines(self):
+        """CartLines for the stored lines; products and sizes are loaded with one query each."""
+        lines = []
         product_ids = set()
         size_ids = set()
-        
-        for key in self.cart.keys():
-            if '_' in key:
-                p_id, s_id = key.split('_')
-                product_ids.add(p_id)
-                if s_id and s_id != 'null' and s_id != 'undefined':
-                    size_ids.add(s_id)
-            else:
-                product_ids.add(key)
-        
-        # Get the product objects
-        products = Product.objects.filter(id__in=product_ids)
-        
-        # Get the size objects if needed
-        sizes = {}
-        if size_ids:
-            for size in Size.objects.filter(id__in=size_ids):
-                sizes[str(size.id)] = size
-        
-        # Create a copy of the cart
-        cart = self.cart.copy()
-        
-        # Add product and size objects to cart items
-        for key, item in cart.items():
-            if '_' in key:
-                p_id, s_id = key.split('_')
-                product = next((p for p in products if str(p.id) == p_id), None)
-                if not product:
-                    continue
-                    
-                item['product'] = product
-                
-                if s_id and s_id != 'null' and s_id != 'undefined' and s_id in sizes:
-                    item['size'] = sizes[s_id]
-                    item['size_name'] = sizes[s_id].name
-            else:
-                product = next((p for p in products if str(p.id) == key), None)
-                if product:
-                    item['product'] = product
-            
-            item['price'] = float(item['price'])
-            item['total_price'] = item['price'] * item['quantity']
-            yield item
+
+        for key, item in self.cart.items():
+            product_id, size_id = parse_cart_key(key)
+            if product_id is None:
+                continue
+            lines.append((key, product_id, size_id, item))
+            product_ids.add(product_id)
+            if size_id is not None:
+                size_ids.add(size_id)
+
+        products = Product.objects.in_bulk(product_ids) if product_ids else {}
+        sizes = Size.objects.in_bulk(size_ids) if size_ids else {}
+
+        cart_lines = []
+        for key, product_id, size_id, item in lines:
+            product = products.get(product_id)
+            if product is None:
+                continue
+            cart_lines.append(CartLine(
+                key=key,
+                product=product,
+                size=sizes.get(size_id) if size_id is not None else None,
+                size_id=size_id,
+                quantity=item['quantity'],
+                price=Decimal(item['price']),
+            ))
+        return cart_lines
     
     def __len__(self):
         """
@@ -113,12 +139,14 @@ class Cart:
         return sum(item['quantity'] for item in self.cart.values())
     
     def get_total_price(self):
-        return sum(float(item['price']) * item['quantity'] for item in self.cart.values())
+        return sum(
+            (Decimal(item['price']) * item['quantity'] for item in self.cart.values()),
+            Decimal('0'),
+        )
     
     def clear(self):
-        # remove cart from session
-        del self.session[settings.CART_SESSION_ID]
-        self.save()
+        self._lines = None
+        self.storage.clear()
 
 def cart_processor(request):
     """
@@ -0,0 +1,81 @@
+import time
+from decimal import Decimal
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from cart.cart import Cart
+from products.models import Category, Product, Size
+
+
+class _FakeSession(dict):
+    modified = False
+
+
+class _FakeRequest:
+    def __init__(self):
+        self.session = _FakeSession()
+
+
+class Command(BaseCommand):
+    help = 'Micro-benchmark Cart iteration for carts of 1 to 200 lines (runs in a rolled-back transaction)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes',
+            type=int,
+            nargs='+',
+            default=[1, 10, 50, 100, 200],
+            help='Cart line counts to benchmark (default: 1 10 50 100 200)'
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=50,
+            help='Iterations per cart size (default: 50)'
+        )
+
+    def handle(self, *args, **options):
+        max_lines = max(options['sizes'])
+
+        with transaction.atomic():
+            products, sizes = self.create_fixtures(max_lines)
+
+            self.stdout.write(f"{'lines':>6} {'queries':>8} {'avg ms':>10} {'per line us':>12}")
+            for line_count in options['sizes']:
+                request = _FakeRequest()
+                cart = Cart(request)
+                for i in range(line_count):
+                    # Alternate sized and unsized lines
+                    size_id = sizes[i % len(sizes)].id if i % 2 else None
+                    cart.add(products[i], size_id=size_id, quantity=1 + i % 3)
+
+                with CaptureQueriesContext(connection) as queries:
+                    list(cart)
+
+                start = time.perf_counter()
+                for _ in range(options['repeat']):
+                    # Rebuild each time; iterating the Cart again reuses its lines
+                    for line in cart._build_lines():
+                        line.total_price
+                elapsed = (time.perf_counter() - start) / options['repeat']
+
+                self.stdout.write(
+                    f"{line_count:>6} {len(queries):>8} {elapsed * 1000:>10.3f} "
+                    f"{elapsed * 1e6 / line_count:>12.1f}"
+                )
+
+            transaction.set_rollback(True)
+
+    def create_fixtures(self, count):
+        category = Category.objects.create(name='Benchmark', slug='benchmark-cart')
+        sizes = [Size.objects.create(name=name, order=i) for i, name in enumerate(['S', 'M', 'L'])]
+        products = Product.objects.bulk_create([
+            Product(
+                category=category,
+                name=f'Benchmark product {i}',
+                slug=f'benchmark-product-{i}',
+                price=Decimal('100.00') + i,
+            )
+            for i in range(count)
+        ])
+        return products, sizes
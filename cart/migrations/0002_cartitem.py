@@ -0,0 +1,32 @@
+# Generated by Django 5.2.3 on 2026-10-18 00:48
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cart', '0001_initial'),
+        ('products', '0009_product_products_pr_name_37bd5c_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CartItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('owner', models.CharField(max_length=100)),
+                ('key', models.CharField(help_text='Cart key: <product_id> or <product_id>_<size_id>', max_length=50)),
+                ('quantity', models.PositiveIntegerField(default=0)),
+                ('price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('updated', models.DateTimeField(auto_now=True)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='products.product')),
+                ('size', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='products.size')),
+            ],
+            options={
+                'unique_together': {('owner', 'key')},
+            },
+        ),
+    ]
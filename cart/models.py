@@ -49,3 +49,25 @@ class CartReservation(models.Model):
     def __str__(self):
         size_info = f" - {self.size.name}" if self.size else ""
         return f"{self.product.name}{size_info} (x{self.quantity}) - Expires: {self.expires_at}"
+
+
+class CartItem(models.Model):
+    """
+    One cart line held by cart.storage.DatabaseCartStorage.
+    The owner is "user:<id>" for logged-in users or "session:<key>" otherwise,
+    so the same cart is reachable from JWT API calls and browser sessions.
+    """
+    owner = models.CharField(max_length=100)
+    key = models.CharField(max_length=50, help_text="Cart key: <product_id> or <product_id>_<size_id>")
+    product = models.ForeignKey(Product, on_delete=models.CASCADE)
+    size = models.ForeignKey(Size, on_delete=models.CASCADE, null=True, blank=True)
+    quantity = models.PositiveIntegerField(default=0)
+    price = models.DecimalField(max_digits=10, decimal_places=2)
+    created = models.DateTimeField(auto_now_add=True)
+    updated = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ['owner', 'key']
+
+    def __str__(self):
+        return f"{self.owner} - {self.key} (x{self.quantity})"
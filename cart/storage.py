@@ -0,0 +1,342 @@
+"""
+Cart storage backends.
+
+A backend stores cart lines as ``{key: {'quantity', 'price', 'size_id'}}``
+where ``key`` is "<product_id>" or "<product_id>_<size_id>". Select one with
+the CART_STORAGE_BACKEND setting:
+
+- cart.storage.SessionCartStorage   (default) the whole cart in the session
+- cart.storage.DatabaseCartStorage  one CartItem row per line
+- cart.storage.RedisCartStorage     one Redis hash pair per cart
+
+The database and Redis backends update a single line per call and never
+rewrite the session. Their carts are keyed by user for authenticated
+requests (JWT or session) and by session otherwise; an anonymous visitor
+gets a session and an owner key only when they first add to the cart, so
+page views that just read the (empty) cart store nothing. An anonymous cart
+is merged into the user's cart the first time the user is seen on that
+session.
+"""
+import json
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils.module_loading import import_string
+
+ANONYMOUS_OWNER_SESSION_KEY = '_cart_owner'
+
+
+def get_cart_storage(request):
+    backend = getattr(settings, 'CART_STORAGE_BACKEND', 'cart.storage.SessionCartStorage')
+    return import_string(backend)(request)
+
+
+class BaseCartStorage:
+    def __init__(self, request):
+        self.request = request
+
+    def load(self):
+        """Return all cart lines as a dict keyed by cart key."""
+        raise NotImplementedError
+
+    def add_line(self, key, quantity, price, size_id=None, override_quantity=False):
+        raise NotImplementedError
+
+    def remove_line(self, key):
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+    def save(self):
+        """Persist pending changes; only needed by session storage."""
+        pass
+
+
+class SessionCartStorage(BaseCartStorage):
+    """The original behaviour: the whole cart lives in request.session."""
+
+    def __init__(self, request):
+        super().__init__(request)
+        self.session = request.session
+        cart = self.session.get(settings.CART_SESSION_ID)
+        if not cart:
+            # save an empty cart in the session
+            cart = self.session[settings.CART_SESSION_ID] = {}
+        self.cart = cart
+
+    def load(self):
+        return self.cart
+
+    def add_line(self, key, quantity, price, size_id=None, override_quantity=False):
+        if key not in self.cart:
+            self.cart[key] = {
+                'quantity': 0,
+                'price': str(price),
+                'size_id': size_id
+            }
+
+        if override_quantity:
+            self.cart[key]['quantity'] = quantity
+        else:
+            self.cart[key]['quantity'] += quantity
+        self.save()
+
+    def remove_line(self, key):
+        if key in self.cart:
+            del self.cart[key]
+            self.save()
+
+    def clear(self):
+        # replace the session cart with an empty one
+        self.cart = self.session[settings.CART_SESSION_ID] = {}
+        self.save()
+
+    def save(self):
+        # mark the session as "modified" to make sure it gets saved
+        self.session.modified = True
+
+
+class OwnerCartStorage(BaseCartStorage):
+    """Base for backends that key carts by an owner string instead of the session."""
+
+    def __init__(self, request):
+        super().__init__(request)
+        # None for an anonymous visitor who has never added to the cart
+        self.owner = self._get_owner()
+        self._merge_anonymous_cart()
+        self._snapshot = None
+
+    def load(self):
+        # Read once per request; mutations below keep the snapshot current
+        if self._snapshot is None:
+            self._snapshot = self.fetch() if self.owner else {}
+        return self._snapshot
+
+    def fetch(self):
+        """Read all lines from the backing store."""
+        raise NotImplementedError
+
+    def _apply_add(self, key, quantity, price, size_id, override_quantity):
+        if self._snapshot is None:
+            return
+        line = self._snapshot.setdefault(key, {'quantity': 0, 'price': str(price), 'size_id': size_id})
+        line['quantity'] = quantity if override_quantity else line['quantity'] + quantity
+
+    def _apply_remove(self, key):
+        if self._snapshot is not None:
+            self._snapshot.pop(key, None)
+
+    def _get_owner(self, create=False):
+        user = getattr(self.request, 'user', None)
+        if user is not None and user.is_authenticated:
+            return f'user:{user.pk}'
+
+        # Remember the anonymous owner in the session so the cart survives
+        # the session key being cycled at login
+        session = self.request.session
+        owner = session.get(ANONYMOUS_OWNER_SESSION_KEY)
+        if not owner and create:
+            if not session.session_key:
+                session.create()
+            owner = session[ANONYMOUS_OWNER_SESSION_KEY] = f'session:{session.session_key}'
+        return owner
+
+    def _writable_owner(self):
+        """The owner to write lines for, creating the anonymous one if needed."""
+        if self.owner is None:
+            self.owner = self._get_owner(create=True)
+        return self.owner
+
+    def _merge_anonymous_cart(self):
+        """Fold the session's anonymous cart into the user's cart after login."""
+        if not self.owner or not self.owner.startswith('user:'):
+            return
+        session = getattr(self.request, 'session', None)
+        if session is None:
+            return
+        anonymous_owner = session.get(ANONYMOUS_OWNER_SESSION_KEY)
+        if anonymous_owner:
+            self.merge_from(anonymous_owner)
+            del session[ANONYMOUS_OWNER_SESSION_KEY]
+
+    def merge_from(self, other_owner):
+        raise NotImplementedError
+
+
+class DatabaseCartStorage(OwnerCartStorage):
+    """Cart lines stored as cart.models.CartItem rows."""
+
+    def _lines(self, owner=None):
+        from .models import CartItem
+        return CartItem.objects.filter(owner=owner or self.owner)
+
+    def fetch(self):
+        return {
+            row['key']: {
+                'quantity': row['quantity'],
+                'price': str(row['price']),
+                'size_id': row['size_id'],
+            }
+            for row in self._lines().values('key', 'quantity', 'price', 'size_id')
+        }
+
+    def add_line(self, key, quantity, price, size_id=None, override_quantity=False):
+        from .models import CartItem
+        from .cart import parse_cart_key
+
+        self._writable_owner()
+        self._apply_add(key, quantity, price, size_id, override_quantity)
+        product_id, _ = parse_cart_key(key)
+        lines = self._lines().filter(key=key)
+
+        if override_quantity:
+            updated = lines.update(quantity=quantity)
+        else:
+            updated = lines.update(quantity=F('quantity') + quantity)
+        if updated:
+            return
+
+        try:
+            with transaction.atomic():
+                CartItem.objects.create(
+                    owner=self.owner,
+                    key=key,
+                    product_id=product_id,
+                    size_id=size_id,
+                    quantity=quantity,
+                    price=price,
+                )
+        except IntegrityError:
+            # A concurrent request created the line first
+            if override_quantity:
+                lines.update(quantity=quantity)
+            else:
+                lines.update(quantity=F('quantity') + quantity)
+
+    def remove_line(self, key):
+        self._apply_remove(key)
+        if self.owner:
+            self._lines().filter(key=key).delete()
+
+    def clear(self):
+        self._snapshot = {}
+        if self.owner:
+            self._lines().delete()
+
+    def merge_from(self, other_owner):
+        with transaction.atomic():
+            incoming = list(self._lines(other_owner))
+            if not incoming:
+                return
+            existing = set(
+                self._lines().filter(key__in=[line.key for line in incoming]).values_list('key', flat=True)
+            )
+            for line in incoming:
+                if line.key in existing:
+                    self._lines().filter(key=line.key).update(quantity=F('quantity') + line.quantity)
+                    line.delete()
+                else:
+                    line.owner = self.owner
+                    line.save(update_fields=['owner', 'updated'])
+
+
+_redis_clients = {}
+
+
+def _get_redis_client(url):
+    client = _redis_clients.get(url)
+    if client is None:
+        try:
+            import redis
+        except ImportError:
+            raise ImproperlyConfigured("RedisCartStorage requires the 'redis' package")
+        client = _redis_clients[url] = redis.Redis.from_url(url)
+    return client
+
+
+class RedisCartStorage(OwnerCartStorage):
+    """
+    Cart lines stored in two Redis hashes per cart: ``<prefix>:lines`` maps
+    the cart key to JSON metadata (price, size_id) and ``<prefix>:qty`` holds
+    the quantity, so increments are a single atomic HINCRBY.
+    """
+
+    def __init__(self, request):
+        url = getattr(settings, 'CART_REDIS_URL', None)
+        if not url:
+            raise ImproperlyConfigured("RedisCartStorage requires the CART_REDIS_URL setting")
+        self.client = _get_redis_client(url)
+        self.ttl = getattr(settings, 'CART_REDIS_TTL', 60 * 60 * 24 * 30)
+        super().__init__(request)
+
+    def _keys(self, owner=None):
+        prefix = f'cart:{owner or self.owner}'
+        return f'{prefix}:lines', f'{prefix}:qty'
+
+    def fetch(self):
+        lines_key, qty_key = self._keys()
+        pipe = self.client.pipeline()
+        pipe.hgetall(lines_key)
+        pipe.hgetall(qty_key)
+        lines, quantities = pipe.execute()
+
+        cart = {}
+        for raw_key, raw_meta in lines.items():
+            key = raw_key.decode()
+            meta = json.loads(raw_meta)
+            quantity = int(quantities.get(raw_key, 0))
+            if quantity <= 0:
+                continue
+            cart[key] = {'quantity': quantity, 'price': meta['price'], 'size_id': meta['size_id']}
+        return cart
+
+    def add_line(self, key, quantity, price, size_id=None, override_quantity=False):
+        self._writable_owner()
+        self._apply_add(key, quantity, price, size_id, override_quantity)
+        lines_key, qty_key = self._keys()
+        pipe = self.client.pipeline(transaction=True)
+        pipe.hsetnx(lines_key, key, json.dumps({'price': str(price), 'size_id': size_id}))
+        if override_quantity:
+            pipe.hset(qty_key, key, quantity)
+        else:
+            pipe.hincrby(qty_key, key, quantity)
+        pipe.expire(lines_key, self.ttl)
+        pipe.expire(qty_key, self.ttl)
+        pipe.execute()
+
+    def remove_line(self, key):
+        self._apply_remove(key)
+        if not self.owner:
+            return
+        lines_key, qty_key = self._keys()
+        pipe = self.client.pipeline(transaction=True)
+        pipe.hdel(lines_key, key)
+        pipe.hdel(qty_key, key)
+        pipe.execute()
+
+    def clear(self):
+        self._snapshot = {}
+        if self.owner:
+            self.client.delete(*self._keys())
+
+    def merge_from(self, other_owner):
+        other_lines_key, other_qty_key = self._keys(other_owner)
+        pipe = self.client.pipeline()
+        pipe.hgetall(other_lines_key)
+        pipe.hgetall(other_qty_key)
+        lines, quantities = pipe.execute()
+        if not lines:
+            return
+
+        lines_key, qty_key = self._keys()
+        pipe = self.client.pipeline(transaction=True)
+        for raw_key, raw_meta in lines.items():
+            pipe.hsetnx(lines_key, raw_key, raw_meta)
+            pipe.hincrby(qty_key, raw_key, int(quantities.get(raw_key, 0)))
+        pipe.expire(lines_key, self.ttl)
+        pipe.expire(qty_key, self.ttl)
+        pipe.delete(other_lines_key, other_qty_key)
+        pipe.execute()
@@ -1,3 +1,203 @@
-from django.test import TestCase
+from collections import defaultdict
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import AnonymousUser, User
+from django.contrib.sessions.backends.db import SessionStore
+from django.contrib.sessions.models import Session
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+
+from products.models import Category, Product, Size
+from .cart import Cart
+from .models import CartItem
+
+
+class CartDetailViewTests(TestCase):
+    def setUp(self):
+        category = Category.objects.create(name='Jeans', slug='jeans')
+        self.product = Product.objects.create(category=category, name='Slim jeans', slug='slim-jeans',
+                                              image='products/slim.jpg', price='250.00')
+
+    def test_each_line_renders_its_quantity_form(self):
+        self.client.post(reverse('cart:cart_add', args=[self.product.id]), {'quantity': 3})
+
+        response = self.client.get(reverse('cart:cart_detail'))
+
+        self.assertContains(response, 'Slim jeans')
+        self.assertContains(response, reverse('cart:cart_update', args=[self.product.id]))
+        self.assertContains(response, '<select name="quantity"', count=1)
+        self.assertContains(response, '<option value="3" selected>3</option>', html=True)
+        self.assertContains(response, '<input type="hidden" name="override" value="True"', count=1)
+
+
+class CartIterationTests(TestCase):
+    def setUp(self):
+        category = Category.objects.create(name='Jeans', slug='jeans')
+        self.product = Product.objects.create(category=category, name='Slim jeans', slug='slim-jeans',
+                                              price='250.00')
+        self.request = RequestFactory().get('/')
+        self.request.session = SessionStore()
+        self.request.user = AnonymousUser()
+
+    def test_lines_are_built_once_until_the_cart_changes(self):
+        cart = Cart(self.request)
+        cart.add(self.product, quantity=2)
+
+        with self.assertNumQueries(1):
+            first = list(cart)
+            second = list(cart)
+        self.assertIs(first[0], second[0])
+
+        cart.add(self.product, quantity=1)
+        self.assertEqual([line.quantity for line in cart], [3])
+
+
+class FakeRedis:
+    """Just enough of a redis.Redis client (hashes and pipelines) for RedisCartStorage."""
+
+    def __init__(self):
+        self.hashes = defaultdict(dict)
+        self.calls = []
+
+    @staticmethod
+    def _bytes(value):
+        return value if isinstance(value, bytes) else str(value).encode()
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    def hgetall(self, name):
+        self.calls.append('hgetall')
+        return dict(self.hashes.get(name, {}))
+
+    def hsetnx(self, name, key, value):
+        self.hashes[name].setdefault(self._bytes(key), self._bytes(value))
+
+    def hset(self, name, key, value):
+        self.hashes[name][self._bytes(key)] = self._bytes(value)
+
+    def hincrby(self, name, key, amount):
+        key = self._bytes(key)
+        self.hashes[name][key] = self._bytes(int(self.hashes[name].get(key, 0)) + amount)
+
+    def hdel(self, name, key):
+        self.hashes[name].pop(self._bytes(key), None)
+
+    def expire(self, name, seconds):
+        pass
+
+    def delete(self, *names):
+        for name in names:
+            self.hashes.pop(name, None)
+
+
+class FakePipeline:
+    def __init__(self, client):
+        self.client = client
+        self.commands = []
+
+    def __getattr__(self, name):
+        def queue(*args):
+            self.commands.append((getattr(self.client, name), args))
+        return queue
+
+    def execute(self):
+        return [command(*args) for command, args in self.commands]
+
+
+class OwnerCartStorageTests:
+    """Shared by the database and Redis backend tests; see the subclasses below."""
+
+    def setUp(self):
+        category = Category.objects.create(name='Jeans', slug='jeans')
+        self.small = Size.objects.create(name='S')
+        self.slim = Product.objects.create(category=category, name='Slim jeans', slug='slim-jeans', price='250.00')
+        self.wide = Product.objects.create(category=category, name='Wide jeans', slug='wide-jeans', price='300.00')
+        self.session = SessionStore()
+        self.user = User.objects.create(username='mona', email='mona@example.com')
+
+    def request(self, user=None):
+        request = RequestFactory().get('/')
+        request.session = self.session
+        request.user = user or AnonymousUser()
+        return request
+
+    def quantities(self, user=None):
+        return {key: line['quantity'] for key, line in Cart(self.request(user)).cart.items()}
+
+    def test_reading_an_empty_cart_creates_no_session(self):
+        with self.assertNumQueries(0):
+            self.assertEqual(len(Cart(self.request())), 0)
+
+        self.assertIsNone(self.session.session_key)
+        self.assertFalse(self.session.modified)
+
+    def test_lines_are_added_updated_and_removed(self):
+        cart = Cart(self.request())
+        cart.add(self.slim, size_id=self.small.id, quantity=2)
+        cart.add(self.slim, size_id=self.small.id, quantity=1)
+        cart.add(self.wide, quantity=1)
+        cart.add(self.wide, quantity=5, override_quantity=True)
+
+        self.assertIsNotNone(self.session.session_key)
+        self.assertEqual(self.quantities(), {f'{self.slim.id}_{self.small.id}': 3, str(self.wide.id): 5})
+
+        cart = Cart(self.request())
+        cart.remove(self.wide.id)
+        self.assertEqual(self.quantities(), {f'{self.slim.id}_{self.small.id}': 3})
+        Cart(self.request()).clear()
+        self.assertEqual(self.quantities(), {})
+
+    def test_anonymous_cart_is_merged_on_login(self):
+        Cart(self.request(self.user)).add(self.slim, quantity=1)
+        cart = Cart(self.request())
+        cart.add(self.slim, quantity=2)
+        cart.add(self.wide, quantity=1)
+        anonymous_owner = cart.storage.owner
+
+        # Logging in cycles the session key; the cart goes with the session data
+        self.session.cycle_key()
+        self.assertEqual(self.quantities(self.user), {str(self.slim.id): 3, str(self.wide.id): 1})
+
+        self.assertNotIn('_cart_owner', self.session)
+        self.assertEqual(Cart(self.request(self.user)).storage.fetch(), Cart(self.request(self.user)).cart)
+        self.assertEqual(self.anonymous_lines(anonymous_owner), 0)
+
+    def test_user_cart_needs_no_session(self):
+        Cart(self.request(self.user)).add(self.slim, quantity=1)
+
+        self.assertIsNone(self.session.session_key)
+        self.assertEqual(self.quantities(self.user), {str(self.slim.id): 1})
+
+
+@override_settings(CART_STORAGE_BACKEND='cart.storage.DatabaseCartStorage')
+class DatabaseCartStorageTests(OwnerCartStorageTests, TestCase):
+    def anonymous_lines(self, owner):
+        return CartItem.objects.filter(owner=owner).count()
+
+    def test_page_views_create_no_session_rows(self):
+        self.client.get(reverse('cart:cart_detail'))
+        self.client.get(reverse('cart:cart_detail'))
+
+        self.assertFalse(Session.objects.exists())
+
+        self.client.post(reverse('cart:cart_add', args=[self.slim.id]), {'quantity': 1})
+        self.assertEqual(Session.objects.count(), 1)
+        self.assertEqual(CartItem.objects.get().quantity, 1)
+
+
+@override_settings(CART_STORAGE_BACKEND='cart.storage.RedisCartStorage', CART_REDIS_URL='redis://cart-test')
+class RedisCartStorageTests(OwnerCartStorageTests, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.redis = FakeRedis()
+        patcher = mock.patch('cart.storage._get_redis_client', return_value=self.redis)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def anonymous_lines(self, owner):
+        return len(self.redis.hashes.get(f'cart:{owner}:lines', {}))
+
+    def test_reading_an_empty_cart_creates_no_session(self):
+        super().test_reading_an_empty_cart_creates_no_session()
+        self.assertEqual(self.redis.calls, [])
@@ -36,7 +36,7 @@ def cart_update(request, product_id):
 def cart_detail(request):
     cart = Cart(request)
     for item in cart:
-        item['update_quantity_form'] = CartAddProductForm(initial={
-            'quantity': item['quantity'],
+        item.update_quantity_form = CartAddProductForm(initial={
+            'quantity': item.quantity,
             'override': True})
     return render(request, 'cart/cart_detail.html', {'cart': cart})
@@ -4,7 +4,8 @@ from django.urls import reverse
 from django.http import HttpResponse
 import csv
 from datetime import datetime
-from .models import EmailSubscription, ContactMessage, EmailList
+from django.utils import timezone
+from .models import EmailSubscription, ContactMessage, EmailList, OutboundEmail
 
 @admin.register(EmailSubscription)
 class EmailSubscriptionAdmin(admin.ModelAdmin):
@@ -189,3 +190,25 @@ class EmailListAdmin(admin.ModelAdmin):
         
         return response
     export_to_csv.short_description = "Export selected emails to CSV"
+
+@admin.register(OutboundEmail)
+class OutboundEmailAdmin(admin.ModelAdmin):
+    list_display = ['subject', 'recipients_display', 'category', 'status', 'attempts', 'created_at', 'sent_at']
+    list_filter = ['status', 'category', 'created_at']
+    search_fields = ['subject', 'recipients']
+    date_hierarchy = 'created_at'
+    readonly_fields = ['created_at', 'sent_at', 'attempts', 'last_error']
+    actions = ['retry_emails']
+
+    def recipients_display(self, obj):
+        return ", ".join(obj.recipients)
+    recipients_display.short_description = "Recipients"
+
+    def retry_emails(self, request, queryset):
+        updated = queryset.exclude(status=OutboundEmail.STATUS_SENT).update(
+            status=OutboundEmail.STATUS_PENDING,
+            attempts=0,
+            next_attempt_at=timezone.now()
+        )
+        self.message_user(request, f'{updated} emails queued for retry.')
+    retry_emails.short_description = "Retry selected emails"
@@ -0,0 +1,51 @@
+import time
+from django.core.management.base import BaseCommand
+from communications.outbox import send_queued_emails
+
+class Command(BaseCommand):
+    help = 'Send queued transactional emails from the outbox'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=50,
+            help='Emails claimed per batch (default: 50)'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=4,
+            help='Sending threads, each with its own SMTP connection (default: 4)'
+        )
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Keep polling for new emails instead of exiting once the queue is empty'
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=5,
+            help='Seconds to sleep between polls when --loop is used (default: 5)'
+        )
+
+    def handle(self, *args, **options):
+        total_sent = total_failed = 0
+        while True:
+            claimed, sent, failed = send_queued_emails(
+                batch_size=options['batch_size'],
+                workers=options['workers'],
+            )
+            total_sent += sent
+            total_failed += failed
+            if claimed:
+                self.stdout.write(f'Batch: {sent} sent, {failed} failed')
+                continue
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Done: {total_sent} sent, {total_failed} failed')
+        )
@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 from django.core.validators import EmailValidator
 from django.contrib.auth.models import User
 
@@ -171,3 +172,57 @@ class EmailList(models.Model):
     def get_sources_display(self):
         """Return a readable string of all sources"""
         return ", ".join(self.sources) if self.sources else "None"
+
+class OutboundEmail(models.Model):
+    """
+    Transactional email waiting to be sent by the send_queued_emails worker.
+
+    Requests only insert a row (inside their own transaction), so a slow or
+    unreachable SMTP server never delays checkout or admin saves.
+    """
+    STATUS_PENDING = 'pending'
+    STATUS_SENDING = 'sending'
+    STATUS_SENT = 'sent'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_SENDING, 'Sending'),
+        (STATUS_SENT, 'Sent'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
+    category = models.CharField(
+        max_length=50,
+        blank=True,
+        help_text="What the email is about, e.g. order_confirmation"
+    )
+    subject = models.CharField(max_length=255)
+    body = models.TextField(help_text="Plain text body")
+    html_body = models.TextField(blank=True)
+    from_email = models.CharField(max_length=255)
+    recipients = models.JSONField(default=list)
+
+    status = models.CharField(
+        max_length=20,
+        choices=STATUS_CHOICES,
+        default=STATUS_PENDING
+    )
+    attempts = models.PositiveIntegerField(default=0)
+    # When the row may next be picked up: the retry time for pending rows,
+    # the lease expiry for rows a worker is sending
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name = "Outbound Email"
+        verbose_name_plural = "Outbound Emails"
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} -> {', '.join(self.recipients)} ({self.get_status_display()})"
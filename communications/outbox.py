@@ -0,0 +1,171 @@
+"""
+Durable outbox for transactional email.
+
+enqueue_email() stores a message in the OutboundEmail table; it is committed
+with the caller's transaction (in a savepoint of its own) and sends nothing. The send_queued_emails
+management command calls send_queued_emails() to drain the table:
+
+- a batch of due rows is claimed with SELECT ... FOR UPDATE SKIP LOCKED and
+  leased, so several workers can run side by side;
+- the batch is split across a bounded thread pool, and each thread sends its
+  share over a single SMTP connection;
+- failures are retried with exponential backoff until
+  EMAIL_OUTBOX_MAX_ATTEMPTS, then marked failed.
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from .models import OutboundEmail
+
+logger = logging.getLogger(__name__)
+
+
+def _max_attempts():
+    return getattr(settings, 'EMAIL_OUTBOX_MAX_ATTEMPTS', 5)
+
+
+def _retry_delay(attempts):
+    """Backoff before the next try: base * 2 ** (attempts - 1), capped."""
+    base = getattr(settings, 'EMAIL_OUTBOX_RETRY_DELAY', 60)
+    cap = getattr(settings, 'EMAIL_OUTBOX_MAX_RETRY_DELAY', 60 * 60)
+    return timedelta(seconds=min(base * 2 ** max(attempts - 1, 0), cap))
+
+
+def _lease():
+    return timedelta(seconds=getattr(settings, 'EMAIL_OUTBOX_LEASE', 5 * 60))
+
+
+def enqueue_email(subject, message, recipient_list, html_message=None, from_email=None, category=''):
+    """
+    Queue an email for the outbox worker; mirrors send_mail()'s arguments.
+
+    The insert runs in a savepoint, so a database error rolls back only the
+    email and leaves the caller's transaction usable if it catches the error.
+    """
+    recipients = [email for email in recipient_list if email]
+    if not recipients:
+        return None
+    with transaction.atomic():
+        return OutboundEmail.objects.create(
+            category=category,
+            subject=subject,
+            body=message,
+            html_body=html_message or '',
+            from_email=from_email or settings.DEFAULT_FROM_EMAIL,
+            recipients=recipients,
+        )
+
+
+def claim_batch(batch_size):
+    """Lease up to ``batch_size`` due emails to this worker."""
+    now = timezone.now()
+    with transaction.atomic():
+        batch = list(
+            OutboundEmail.objects.select_for_update(skip_locked=True)
+            .filter(
+                status__in=[OutboundEmail.STATUS_PENDING, OutboundEmail.STATUS_SENDING],
+                next_attempt_at__lte=now,
+            )
+            .order_by('next_attempt_at', 'id')[:batch_size]
+        )
+        if batch:
+            # Rows stuck in "sending" after a crashed worker become due again
+            # once the lease runs out
+            OutboundEmail.objects.filter(id__in=[email.id for email in batch]).update(
+                status=OutboundEmail.STATUS_SENDING,
+                next_attempt_at=now + _lease(),
+            )
+    return batch
+
+
+def _send_chunk(emails):
+    """Send ``emails`` over one SMTP connection; return {id: error or None}."""
+    results = {}
+    try:
+        connection = get_connection()
+        connection.open()
+    except Exception as e:
+        return {email.id: f"Connection failed: {e}" for email in emails}
+
+    try:
+        for email in emails:
+            message = EmailMultiAlternatives(
+                subject=email.subject,
+                body=email.body,
+                from_email=email.from_email,
+                to=email.recipients,
+                connection=connection,
+            )
+            if email.html_body:
+                message.attach_alternative(email.html_body, 'text/html')
+            try:
+                message.send(fail_silently=False)
+                results[email.id] = None
+            except Exception as e:
+                results[email.id] = str(e) or e.__class__.__name__
+    finally:
+        try:
+            connection.close()
+        except Exception:
+            pass
+    return results
+
+
+def _record_results(emails, results):
+    now = timezone.now()
+    sent_ids = [email.id for email in emails if results.get(email.id) is None]
+    if sent_ids:
+        OutboundEmail.objects.filter(id__in=sent_ids).update(
+            status=OutboundEmail.STATUS_SENT,
+            attempts=F('attempts') + 1,
+            sent_at=now,
+            last_error='',
+        )
+
+    failed = []
+    max_attempts = _max_attempts()
+    for email in emails:
+        error = results.get(email.id)
+        if error is None:
+            continue
+        email.attempts += 1
+        email.last_error = error
+        if email.attempts >= max_attempts:
+            email.status = OutboundEmail.STATUS_FAILED
+        else:
+            email.status = OutboundEmail.STATUS_PENDING
+            email.next_attempt_at = now + _retry_delay(email.attempts)
+        logger.warning(f"Email #{email.id} attempt {email.attempts} failed: {error}")
+        failed.append(email)
+    if failed:
+        OutboundEmail.objects.bulk_update(failed, ['attempts', 'last_error', 'status', 'next_attempt_at'])
+
+    return len(sent_ids), len(failed)
+
+
+def send_queued_emails(batch_size=50, workers=4):
+    """
+    Claim and send one batch of due emails.
+
+    Returns (claimed, sent, failed). Database access stays on the calling
+    thread; the pool threads only talk to SMTP.
+    """
+    emails = claim_batch(batch_size)
+    if not emails:
+        return 0, 0, 0
+
+    workers = max(1, min(workers, len(emails)))
+    chunks = [emails[i::workers] for i in range(workers)]
+    results = {}
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for chunk_results in pool.map(_send_chunk, chunks):
+            results.update(chunk_results)
+
+    sent, failed = _record_results(emails, results)
+    return len(emails), sent, failed
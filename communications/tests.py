@@ -1,3 +1,117 @@
-from django.test import TestCase
+import threading
+from datetime import timedelta
+from smtplib import SMTPException
+from unittest import mock
 
-# Create your tests here.
+from django.core import mail
+from django.db import DatabaseError, connection, transaction
+from django.test import TestCase, TransactionTestCase, override_settings, skipUnlessDBFeature
+from django.utils import timezone
+
+from .models import OutboundEmail
+from .outbox import claim_batch, enqueue_email, send_queued_emails
+
+
+def queue(subject='Order Confirmation', recipients=('mona@example.com',)):
+    return enqueue_email(subject, 'Thanks for your order', list(recipients),
+                         html_message='<p>Thanks for your order</p>', category='order_confirmation')
+
+
+@override_settings(EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend')
+class OutboxTests(TestCase):
+    def test_enqueue_only_stores_the_email(self):
+        email = queue(recipients=['mona@example.com', '', None])
+
+        self.assertEqual(email.recipients, ['mona@example.com'])
+        self.assertEqual(email.status, OutboundEmail.STATUS_PENDING)
+        self.assertEqual(mail.outbox, [])
+        self.assertIsNone(queue(recipients=['']))
+
+    def test_database_error_rolls_back_only_the_email(self):
+        create = OutboundEmail.objects.create
+
+        def create_then_fail(**kwargs):
+            create(**kwargs)
+            raise DatabaseError('connection lost')
+
+        with transaction.atomic():
+            queue('Kept')
+            with mock.patch.object(OutboundEmail.objects, 'create', side_effect=create_then_fail):
+                with self.assertRaises(DatabaseError):
+                    queue('Lost')
+            self.assertEqual(list(OutboundEmail.objects.values_list('subject', flat=True)), ['Kept'])
+
+    def test_queue_is_drained(self):
+        for number in range(3):
+            queue(f'Order #{number}')
+
+        self.assertEqual(send_queued_emails(workers=2), (3, 3, 0))
+
+        self.assertEqual(sorted(message.subject for message in mail.outbox), ['Order #0', 'Order #1', 'Order #2'])
+        self.assertEqual(mail.outbox[0].alternatives[0][1], 'text/html')
+        self.assertFalse(OutboundEmail.objects.exclude(status=OutboundEmail.STATUS_SENT).exists())
+        self.assertEqual(send_queued_emails(), (0, 0, 0))
+
+    def test_failed_send_is_retried_with_backoff(self):
+        email = queue()
+
+        with mock.patch('communications.outbox.EmailMultiAlternatives.send', side_effect=SMTPException('refused')):
+            self.assertEqual(send_queued_emails(), (1, 0, 1))
+
+        email.refresh_from_db()
+        self.assertEqual((email.status, email.attempts, email.last_error),
+                         (OutboundEmail.STATUS_PENDING, 1, 'refused'))
+        self.assertGreater(email.next_attempt_at, timezone.now())
+        # Not due yet
+        self.assertEqual(send_queued_emails(), (0, 0, 0))
+
+        OutboundEmail.objects.update(next_attempt_at=timezone.now())
+        self.assertEqual(send_queued_emails(), (1, 1, 0))
+        self.assertEqual(len(mail.outbox), 1)
+
+    @override_settings(EMAIL_OUTBOX_MAX_ATTEMPTS=1)
+    def test_email_fails_after_max_attempts(self):
+        email = queue()
+
+        with mock.patch('communications.outbox.get_connection', side_effect=OSError('unreachable')):
+            send_queued_emails()
+
+        email.refresh_from_db()
+        self.assertEqual(email.status, OutboundEmail.STATUS_FAILED)
+        self.assertIn('unreachable', email.last_error)
+
+    def test_claimed_emails_are_leased(self):
+        email = queue()
+
+        self.assertEqual(claim_batch(10), [email])
+        self.assertEqual(claim_batch(10), [])
+
+        # A worker that crashed mid-send loses the lease
+        OutboundEmail.objects.update(next_attempt_at=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(claim_batch(10), [email])
+
+
+@skipUnlessDBFeature('has_select_for_update_skip_locked')
+class ConcurrentClaimTests(TransactionTestCase):
+    def test_locked_rows_are_skipped(self):
+        first, second = queue('First'), queue('Second')
+        locked = threading.Event()
+        release = threading.Event()
+
+        def hold_lock():
+            try:
+                with transaction.atomic():
+                    list(OutboundEmail.objects.select_for_update().filter(id=first.id))
+                    locked.set()
+                    release.wait(5)
+            finally:
+                connection.close()
+
+        holder = threading.Thread(target=hold_lock)
+        holder.start()
+        try:
+            locked.wait(5)
+            self.assertEqual(claim_batch(10), [second])
+        finally:
+            release.set()
+            holder.join()
@@ -57,6 +57,7 @@ INSTALLED_APPS = [
     'cart',
     'orders',
     'communications',
+    'storage',
 ]
 
 MIDDLEWARE = [
@@ -166,6 +167,33 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Cache
+# Local memory by default; set REDIS_URL (requires the redis package) to share
+# the cache between workers
+REDIS_URL = os.getenv('REDIS_URL')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'denimora-default',
+        }
+    }
+
+# Catalog response cache (products API)
+CATALOG_CACHE_ALIAS = 'default'
+CATALOG_CACHE_TIMEOUT = 60 * 60  # seconds
+
+# Seconds a process trusts its in-memory governorate rate table (orders.rates)
+# before checking the database for changes made by other processes
+GOVERNORATE_RATES_RECHECK = 5
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -178,6 +206,12 @@ LOGOUT_REDIRECT_URL = '/'
 # Cart session settings
 CART_SESSION_ID = 'cart'
 
+# Cart storage backend: cart.storage.SessionCartStorage (default),
+# cart.storage.DatabaseCartStorage or cart.storage.RedisCartStorage
+CART_STORAGE_BACKEND = os.getenv('CART_STORAGE_BACKEND', 'cart.storage.SessionCartStorage')
+CART_REDIS_URL = REDIS_URL
+CART_REDIS_TTL = 60 * 60 * 24 * 30  # seconds
+
 CSRF_TRUSTED_ORIGINS = ['https://8000-ira6yemvbu5x3gljn5cgk-1eb88f08.manusvm.computer']
 
 # REST Framework settings
@@ -235,3 +269,56 @@ EMAIL_HOST_USER = DENIMORA_EMAIL_USERNAME
 EMAIL_HOST_PASSWORD = DENIMORA_EMAIL_PASSWORD  # This should be your App Password
 DEFAULT_FROM_EMAIL = f"Denimora <{DENIMORA_EMAIL_USERNAME}>"
 SITE_URL = 'http://localhost:8000'  # Change this in production
+
+# Bosta API HTTP client (shipping.http)
+BOSTA_HTTP_POOL_SIZE = 10  # kept-alive connections per host
+BOSTA_HTTP_MAX_RETRIES = 3
+BOSTA_HTTP_BACKOFF_FACTOR = 0.5  # seconds, doubled on each retry
+BOSTA_HTTP_TIMEOUT = 30  # seconds
+BOSTA_SYNC_CONCURRENCY = 8  # parallel tracking requests (shipping.sync)
+BOSTA_SYNC_RATE_LIMIT = 10  # tracking requests per second, None for no limit
+# Minutes between tracking polls per shipment status (shipping.schedule);
+# doubled while the state is unchanged, up to BOSTA_SYNC_MAX_INTERVAL
+BOSTA_SYNC_INTERVALS = {
+    'pending': 60,
+    'pickup_requested': 60,
+    'picked_up': 30,
+    'in_transit': 15,
+    'exception': 30,
+}
+BOSTA_SYNC_MAX_INTERVAL = 6 * 60
+BOSTA_WEBHOOK_MAX_ATTEMPTS = 5  # process_bosta_webhooks tries before marking failed
+# In-process copy of the city/zone catalogue (shipping.catalogue): reused for
+# BOSTA_CATALOGUE_TTL seconds, then served stale for up to
+# BOSTA_CATALOGUE_STALE_TTL more while it reloads in the background
+BOSTA_CATALOGUE_TTL = 15 * 60
+BOSTA_CATALOGUE_STALE_TTL = 24 * 60 * 60
+
+# Bulk order status changes (orders.transitions, drained by process_order_transitions)
+ORDER_TRANSITION_MAX_ATTEMPTS = 5
+ORDER_TRANSITION_RETRY_DELAY = 60  # seconds before the first retry, doubled each time
+ORDER_TRANSITION_LEASE = 5 * 60  # seconds a worker may hold a claimed change
+
+# Outbound email queue (communications.outbox, drained by send_queued_emails)
+EMAIL_OUTBOX_MAX_ATTEMPTS = 5
+EMAIL_OUTBOX_RETRY_DELAY = 60  # seconds before the first retry, doubled each time
+EMAIL_OUTBOX_MAX_RETRY_DELAY = 60 * 60  # seconds
+EMAIL_OUTBOX_LEASE = 5 * 60  # seconds a worker may hold a claimed email
+
+# GitHub media storage metadata index (storage.index, rebuilt by refresh_github_index)
+GITHUB_STORAGE_INDEX = True
+GITHUB_STORAGE_INDEX_MAX_AGE = 24 * 60 * 60  # seconds a full refresh is trusted for files it didn't list
+GITHUB_STORAGE_BATCH_CONCURRENCY = 4  # parallel blob uploads in a batch commit (storage.batch)
+# Local blob cache for reads (storage.cache), keyed by indexed sha so it needs
+# GITHUB_STORAGE_INDEX; None to always download
+GITHUB_STORAGE_CACHE_DIR = os.getenv('GITHUB_STORAGE_CACHE_DIR', os.path.join(BASE_DIR, '.cache', 'github_media'))
+GITHUB_STORAGE_CACHE_MAX_SIZE = 512 * 1024 * 1024  # bytes
+GITHUB_STORAGE_CHUNK_SIZE = 64 * 1024  # download chunk size in bytes
+GITHUB_STORAGE_SPOOL_MAX_SIZE = 2 * 1024 * 1024  # uncached downloads larger than this go to a temp file
+
+# Product image renditions (products.renditions)
+PRODUCT_IMAGE_WIDTHS = (320, 640, 1024)
+PRODUCT_IMAGE_FORMATS = ('avif', 'webp', 'jpeg')  # formats Pillow can't encode here are skipped
+PRODUCT_IMAGE_RENDITIONS_ON_UPLOAD = True  # queue uploads for process_image_renditions; else only generate_image_renditions creates them
+PRODUCT_IMAGE_RENDITION_MAX_ATTEMPTS = 5
+PRODUCT_IMAGE_RENDITION_LEASE = 10 * 60  # seconds a worker may hold a claimed job
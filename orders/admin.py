@@ -3,7 +3,8 @@ from django.http import HttpResponse
 from django.template.loader import get_template
 from django.urls import reverse
 from django.utils.html import format_html
-from .models import Order, OrderItem, GovernorateShipping
+from .models import Order, OrderItem, GovernorateShipping, OrderStatusChange
+from .transitions import apply_transitions, transition_orders
 
 @admin.register(GovernorateShipping)
 class GovernorateShippingAdmin(admin.ModelAdmin):
@@ -54,6 +55,15 @@ def print_receipt(modeladmin, request, queryset):
 
 print_receipt.short_description = "Print receipt for selected order"
 
+
+def make_status_action(status, label):
+    def action(modeladmin, request, queryset):
+        result = transition_orders(list(queryset.values_list('pk', flat=True)), status)
+        modeladmin.message_user(request, f"{result.summary()}. Notifications are being sent in the background.")
+    action.__name__ = f'mark_{status}'
+    action.short_description = f"Mark selected orders as {label}"
+    return action
+
 @admin.register(Order)
 class OrderAdmin(admin.ModelAdmin):
     list_display = ['id', 'user', 'first_name', 'last_name', 'email',
@@ -61,10 +71,12 @@ class OrderAdmin(admin.ModelAdmin):
     list_filter = ['paid', 'status', 'governorate', 'created', 'updated']
     search_fields = ['first_name', 'last_name', 'email', 'address', 'governorate']
     inlines = [OrderItemInline]
+    # Totals are stored on Order, so the user is the only related row a list needs
+    list_select_related = ['user']
     list_editable = ['status', 'paid']
     date_hierarchy = 'created'
     ordering = ['-created']
-    actions = [print_receipt]
+    actions = [print_receipt] + [make_status_action(status, label) for status, label in Order.STATUS_CHOICES]
     readonly_fields = ['created', 'updated', 'items_total', 'shipping_cost', 'total_with_shipping', 'receipt_link']
     
     fieldsets = (
@@ -87,6 +99,24 @@ class OrderAdmin(admin.ModelAdmin):
         }),
     )
     
+    def changelist_view(self, request, extra_context=None):
+        # Status edits made through list_editable are collected by
+        # save_model() and applied together afterwards
+        request._status_transitions = {}
+        response = super().changelist_view(request, extra_context)
+        if request._status_transitions:
+            apply_transitions(request._status_transitions)
+        return response
+
+    def save_model(self, request, obj, form, change):
+        transitions = getattr(request, '_status_transitions', None)
+        if change and transitions is not None and 'status' in form.changed_data:
+            transitions[obj.pk] = obj.status
+            obj.status = obj.get_loaded_value('status')
+            if set(form.changed_data) == {'status'}:
+                return
+        super().save_model(request, obj, form, change)
+
     def items_total(self, obj):
         """Display the total cost of all items (subtotal)"""
         return f"{obj.get_total_cost()} LE"
@@ -117,3 +147,21 @@ class OrderAdmin(admin.ModelAdmin):
         return "-"
     receipt_link.short_description = "Receipt"
     receipt_link.allow_tags = True
+
+
+@admin.register(OrderStatusChange)
+class OrderStatusChangeAdmin(admin.ModelAdmin):
+    list_display = ['order', 'from_status', 'to_status', 'created', 'notified', 'processed_at', 'attempts']
+    list_filter = ['to_status', 'notified', 'created']
+    search_fields = ['order__id', 'order__email']
+    readonly_fields = ['order', 'from_status', 'to_status', 'created', 'notified', 'processed_at', 'attempts',
+                       'next_attempt_at', 'last_error']
+    actions = ['retry_changes']
+
+    def has_add_permission(self, request):
+        return False  # Recorded by bulk status transitions only
+
+    def retry_changes(self, request, queryset):
+        updated = queryset.filter(processed_at__isnull=True).update(attempts=0, next_attempt_at=None, last_error='')
+        self.message_user(request, f'{updated} status changes queued for retry.')
+    retry_changes.short_description = "Retry selected status changes"
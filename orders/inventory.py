@@ -0,0 +1,85 @@
+"""
+Stock decrements for order creation.
+
+commit_stock() takes stock for every line of an order with conditional
+``UPDATE ... SET stock = stock - n WHERE stock >= n`` statements, so two
+concurrent checkouts can never both take the last unit: the second UPDATE
+matches no row and the order is rejected with InsufficientStockError.
+
+Rows are updated in a fixed order (all ProductSize rows by product and size,
+then Product rows by id) so concurrent orders always lock rows in the same
+order and cannot deadlock. Call it inside the transaction that creates the
+order; raising rolls back the order together with any stock already taken.
+"""
+from django.db import transaction
+from django.db.models import F
+from products.cache import bump_catalog_version
+from products.models import Product, ProductSize, Size
+from .exceptions import InsufficientStockError
+
+
+def _take(queryset, quantity):
+    """Decrement ``stock`` by ``quantity`` if enough is left; True on success."""
+    return queryset.filter(stock__gte=quantity).update(stock=F('stock') - quantity) == 1
+
+
+def commit_stock(lines):
+    """
+    Take stock for order lines.
+
+    ``lines`` is an iterable of ``(product, size_id, quantity)``; ``size_id``
+    may be None. Lines for the same product and size are combined. Lines
+    whose size has no ProductSize row fall back to the product's own stock,
+    as order creation always has.
+    """
+    if not transaction.get_connection().in_atomic_block:
+        raise RuntimeError('commit_stock() must run inside transaction.atomic()')
+
+    products = {}
+    sized = {}
+    unsized = {}
+    for product, size_id, quantity in lines:
+        products[product.id] = product
+        if size_id:
+            key = (product.id, size_id)
+            sized[key] = sized.get(key, 0) + quantity
+        else:
+            unsized[product.id] = unsized.get(product.id, 0) + quantity
+
+    if not sized and not unsized:
+        return
+
+    for (product_id, size_id), quantity in sorted(sized.items()):
+        rows = ProductSize.objects.filter(product_id=product_id, size_id=size_id)
+        if _take(rows, quantity):
+            continue
+
+        available = rows.values_list('stock', flat=True).first()
+        if available is None:
+            print(f"Warning: ProductSize not found for product ID {product_id}, size ID {size_id}")
+            unsized[product_id] = unsized.get(product_id, 0) + quantity
+            continue
+
+        size = Size.objects.filter(id=size_id).first()
+        raise InsufficientStockError(
+            products[product_id].name,
+            size.name if size else size_id,
+            quantity,
+            available
+        )
+
+    for product_id, quantity in sorted(unsized.items()):
+        rows = Product.objects.filter(id=product_id)
+        if _take(rows, quantity):
+            continue
+        raise InsufficientStockError(
+            products[product_id].name,
+            None,
+            quantity,
+            rows.values_list('stock', flat=True).first() or 0
+        )
+
+    # Queryset updates bypass the post_save signals that normally
+    # invalidate cached catalog payloads. Robust: a failed bump is logged
+    # rather than failing an order that has already been committed
+    transaction.on_commit(bump_catalog_version, robust=True)
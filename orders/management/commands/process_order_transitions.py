@@ -0,0 +1,48 @@
+import time
+from django.core.management.base import BaseCommand
+from orders.transitions import process_status_changes
+
+
+class Command(BaseCommand):
+    help = 'Send notifications and Bosta cancellations for bulk order status changes'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=100,
+            help='Status changes handled per batch (default: 100)'
+        )
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Keep polling for new changes instead of exiting once the queue is empty'
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=5,
+            help='Seconds to sleep between polls when --loop is used (default: 5)'
+        )
+
+    def handle(self, *args, **options):
+        totals = {'processed': 0, 'retrying': 0, 'failed': 0}
+        while True:
+            counts = process_status_changes(batch_size=options['batch_size'])
+            for key, value in counts.items():
+                totals[key] += value
+            if counts['processed'] or counts['failed']:
+                self.stdout.write(
+                    f"Batch: {counts['processed']} processed, {counts['retrying']} to retry, {counts['failed']} failed"
+                )
+                continue
+            # Empty, or only changes waiting for a retry: wait for the next poll
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Done: {totals['processed']} processed, {totals['retrying']} to retry, {totals['failed']} failed"
+            )
+        )
@@ -0,0 +1,60 @@
+from datetime import timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from orders.models import Order
+from orders.transitions import transition_orders
+
+
+class Command(BaseCommand):
+    help = 'Change the status of many orders at once (notifications are sent by process_order_transitions)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'status',
+            choices=[status for status, _ in Order.STATUS_CHOICES],
+            help='New status'
+        )
+        parser.add_argument(
+            '--order-id',
+            type=int,
+            nargs='+',
+            dest='order_ids',
+            help='Orders to change'
+        )
+        parser.add_argument(
+            '--current-status',
+            choices=[status for status, _ in Order.STATUS_CHOICES],
+            help='Only orders currently in this status'
+        )
+        parser.add_argument(
+            '--older-than-days',
+            type=int,
+            help='Only orders created more than this many days ago'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Show how many orders would change without changing them'
+        )
+
+    def handle(self, *args, **options):
+        if not (options['order_ids'] or options['current_status']):
+            raise CommandError('Give --order-id or --current-status')
+
+        queryset = Order.objects.exclude(status=options['status'])
+        if options['order_ids']:
+            queryset = queryset.filter(pk__in=options['order_ids'])
+        if options['current_status']:
+            queryset = queryset.filter(status=options['current_status'])
+        if options['older_than_days'] is not None:
+            queryset = queryset.filter(created__lt=timezone.now() - timedelta(days=options['older_than_days']))
+
+        order_ids = list(queryset.values_list('pk', flat=True))
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING(f"DRY RUN - {len(order_ids)} orders would move to {options['status']}"))
+            return
+
+        result = transition_orders(order_ids, options['status'])
+        self.stdout.write(self.style.SUCCESS(result.summary()))
+        if result.total_changed:
+            self.stdout.write('Run process_order_transitions to send notifications and cancel shipments')
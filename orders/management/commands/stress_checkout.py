@@ -0,0 +1,83 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction, OperationalError
+from orders.exceptions import InsufficientStockError
+from orders.inventory import commit_stock
+from products.models import Category, Product, ProductSize, Size
+
+
+class Command(BaseCommand):
+    help = (
+        'Take stock for one product size from many threads at once and verify it is never '
+        'oversold. Creates a hidden product and deletes it afterwards, along with any category or '
+        'size it had to create (no orders are created). orders.tests.ConcurrentCheckoutTests '
+        'checks the same on a test database; run this against PostgreSQL for throughput numbers.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--stock', type=int, default=50, help='Starting stock (default: 50)')
+        parser.add_argument('--orders', type=int, default=200, help='Checkouts to attempt (default: 200)')
+        parser.add_argument('--threads', type=int, default=8, help='Concurrent workers (default: 8)')
+        parser.add_argument('--quantity', type=int, default=1, help='Units per checkout (default: 1)')
+
+    def handle(self, *args, **options):
+        product, size, created = self.create_fixtures(options['stock'])
+        counts = {'placed': 0, 'rejected': 0, 'errors': 0}
+        lock = threading.Lock()
+
+        def checkout(_):
+            outcome = 'placed'
+            try:
+                with transaction.atomic():
+                    commit_stock([(product, size.id, options['quantity'])])
+            except InsufficientStockError:
+                outcome = 'rejected'
+            except OperationalError:
+                # e.g. "database is locked" on SQLite
+                outcome = 'errors'
+            finally:
+                connection.close()
+            with lock:
+                counts[outcome] += 1
+
+        try:
+            start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=options['threads']) as pool:
+                list(pool.map(checkout, range(options['orders'])))
+            elapsed = time.perf_counter() - start
+
+            remaining = ProductSize.objects.get(product=product, size=size).stock
+        finally:
+            self.delete_fixtures(product, created)
+
+        self.stdout.write(
+            f"placed={counts['placed']} rejected={counts['rejected']} errors={counts['errors']} "
+            f"in {elapsed:.2f}s ({options['orders'] / elapsed:.1f} checkouts/s)"
+        )
+        sold = counts['placed'] * options['quantity']
+        self.stdout.write(f"stock: start={options['stock']} sold={sold} remaining={remaining}")
+
+        if sold + remaining != options['stock'] or sold > options['stock']:
+            raise CommandError('Stock oversold or lost')
+        self.stdout.write(self.style.SUCCESS('No overselling'))
+
+    def create_fixtures(self, stock):
+        """Returns the product, its size, and the rows created besides the product."""
+        category, category_created = Category.objects.get_or_create(slug='stress-test', defaults={'name': 'Stress test'})
+        size, size_created = Size.objects.get_or_create(name='STRESS')
+        product = Product.objects.create(
+            category=category, name='Stress test product', slug='stress-test-product',
+            price=Decimal('100.00'), stock=0, available=False,
+        )
+        ProductSize.objects.create(product=product, size=size, stock=stock)
+        created = [obj for obj, was_created in [(size, size_created), (category, category_created)] if was_created]
+        return product, size, created
+
+    def delete_fixtures(self, product, created):
+        # Rows that existed before the run are left alone
+        product.delete()
+        for obj in created:
+            obj.delete()
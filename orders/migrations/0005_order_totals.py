@@ -0,0 +1,28 @@
+# Generated by Django 5.2.3 on 2026-10-18 01:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0004_governorateshipping_order_governorate'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='shipping_amount',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, help_text='Shipping charged for the governorate', max_digits=10),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='subtotal',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, help_text='Sum of the order items', max_digits=10),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='total',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, help_text='Subtotal plus shipping', max_digits=10),
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 5.2.3 on 2026-10-18 01:07
+
+from decimal import Decimal
+
+from django.db import migrations
+from django.db.models import DecimalField, ExpressionWrapper, F, OuterRef, Subquery, Sum
+
+BATCH_SIZE = 1000
+DEFAULT_SHIPPING_FEE = Decimal('100')
+
+
+def backfill_totals(apps, schema_editor):
+    """
+    Store subtotal, shipping and total on existing orders. Shipping uses the
+    rate in effect now, which is what these orders were displayed with.
+    """
+    Order = apps.get_model('orders', 'Order')
+    OrderItem = apps.get_model('orders', 'OrderItem')
+    GovernorateShipping = apps.get_model('orders', 'GovernorateShipping')
+
+    money = DecimalField(max_digits=10, decimal_places=2)
+    rates = {
+        name.lower(): cost
+        for name, cost in GovernorateShipping.objects.filter(is_active=True).values_list('name', 'shipping_cost')
+    }
+    subtotals = (
+        OrderItem.objects.filter(order=OuterRef('pk'))
+        .values('order')
+        .annotate(total=Sum(ExpressionWrapper(F('price') * F('quantity'), output_field=money)))
+        .values('total')
+    )
+
+    queryset = Order.objects.annotate(items_subtotal=Subquery(subtotals, output_field=money)).order_by('pk')
+    batch = []
+    for order in queryset.only('pk', 'governorate').iterator(chunk_size=BATCH_SIZE):
+        order.subtotal = order.items_subtotal or Decimal('0')
+        order.shipping_amount = rates.get((order.governorate or '').lower(), DEFAULT_SHIPPING_FEE) if order.governorate else DEFAULT_SHIPPING_FEE
+        order.total = order.subtotal + order.shipping_amount
+        batch.append(order)
+        if len(batch) >= BATCH_SIZE:
+            Order.objects.bulk_update(batch, ['subtotal', 'shipping_amount', 'total'])
+            batch = []
+    if batch:
+        Order.objects.bulk_update(batch, ['subtotal', 'shipping_amount', 'total'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0005_order_totals'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_totals, migrations.RunPython.noop),
+    ]
@@ -1,4 +1,7 @@
-from django.db import models
+from decimal import Decimal
+from django.db import models, transaction
+from django.db.models import DecimalField, ExpressionWrapper, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
 from django.contrib.auth.models import User
 from products.models import Product
 
@@ -33,24 +36,55 @@ class GovernorateShipping(models.Model):
         """
         Get shipping cost for a governorate.
         Returns default fee if governorate not found or inactive.
+        Served from the in-process rate table (orders/rates.py), not the database.
         """
-        if not governorate_name:
-            return DEFAULT_SHIPPING_FEE
-        
-        try:
-            gov_shipping = cls.objects.get(name__iexact=governorate_name, is_active=True)
-            return gov_shipping.shipping_cost
-        except cls.DoesNotExist:
-            return DEFAULT_SHIPPING_FEE
+        from .rates import get_shipping_cost
+        return get_shipping_cost(governorate_name)
+
+MONEY = DecimalField(max_digits=10, decimal_places=2)
+
+
+def items_subtotal_subquery():
+    """Subquery: sum of price x quantity over the items of the outer Order."""
+    line_total = ExpressionWrapper(F('price') * F('quantity'), output_field=MONEY)
+    return Subquery(
+        OrderItem.objects.filter(order=OuterRef('pk'))
+        .values('order')
+        .annotate(total=Sum(line_total))
+        .values('total'),
+        output_field=MONEY,
+    )
+
+
+class OrderQuerySet(models.QuerySet):
+    def with_totals(self):
+        """
+        Annotate totals computed live from the items and rate table rows:
+        items_subtotal, shipping_rate and grand_total. The stored fields
+        (subtotal, shipping_amount, total) should match; these are for
+        reports and consistency checks.
+        """
+        rate = GovernorateShipping.objects.filter(
+            name__iexact=OuterRef('governorate'), is_active=True
+        ).values('shipping_cost')[:1]
+        return self.annotate(
+            items_subtotal=Coalesce(items_subtotal_subquery(), Value(Decimal('0')), output_field=MONEY),
+            shipping_rate=Coalesce(Subquery(rate, output_field=MONEY), Value(Decimal(DEFAULT_SHIPPING_FEE)), output_field=MONEY),
+        ).annotate(
+            grand_total=ExpressionWrapper(F('items_subtotal') + F('shipping_rate'), output_field=MONEY),
+        )
+
 
 class Order(models.Model):
     """
     Order model representing a customer's purchase.
     
-    Now includes methods to calculate:
-    - Item subtotal (get_total_cost)
-    - Dynamic shipping cost based on governorate (get_shipping_cost)
-    - Total with shipping (get_total_cost_with_shipping)
+    Totals are stored on the order so lists don't touch the items:
+    - Item subtotal (subtotal / get_total_cost), kept current by the
+      OrderItem signals in orders/signals.py
+    - Shipping cost (shipping_amount / get_shipping_cost), taken from the
+      governorate rate when the order is created or its governorate changes
+    - Total with shipping (total / get_total_cost_with_shipping)
     """
     STATUS_CHOICES = (
         ('pending', 'Pending'),
@@ -74,51 +108,142 @@ class Order(models.Model):
     updated = models.DateTimeField(auto_now=True)
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
     paid = models.BooleanField(default=False)
+    subtotal = models.DecimalField(max_digits=10, decimal_places=2, default=0, editable=False, help_text="Sum of the order items")
+    shipping_amount = models.DecimalField(max_digits=10, decimal_places=2, default=0, editable=False, help_text="Shipping charged for the governorate")
+    total = models.DecimalField(max_digits=10, decimal_places=2, default=0, editable=False, help_text="Subtotal plus shipping")
+
+    objects = OrderQuerySet.as_manager()
+
+    # Fields whose loaded values are remembered so save() can tell what
+    # changed without re-reading the row
+    TRACKED_FIELDS = ('status', 'governorate')
+    # Written only by update_totals() (and by save() through an expression)
+    COMPUTED_FIELDS = ('subtotal', 'total')
 
     class Meta:
         ordering = ('-created',)
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._loaded_values = {}
+
     def __str__(self):
         return f'Order {self.id}'
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._snapshot()
+        return instance
+
+    def refresh_from_db(self, using=None, fields=None, **kwargs):
+        super().refresh_from_db(using=using, fields=fields, **kwargs)
+        self._snapshot(fields)
+
+    def _snapshot(self, fields=None):
+        deferred = self.get_deferred_fields()
+        for name in self.TRACKED_FIELDS:
+            if name not in deferred and (fields is None or name in fields):
+                self._loaded_values[name] = getattr(self, name)
+
+    def get_loaded_value(self, field_name):
+        """Value of a tracked field as loaded from (or last saved to) the database."""
+        if field_name not in self._loaded_values:
+            # Deferred when loaded, or built by hand with an existing pk
+            self._loaded_values[field_name] = (
+                Order.objects.filter(pk=self.pk).values_list(field_name, flat=True).first()
+            )
+        return self._loaded_values[field_name]
+
+    def has_changed(self, field_name):
+        """True if a tracked field differs from its loaded value (False for new orders)."""
+        if self.pk is None or field_name in self.get_deferred_fields():
+            # A deferred field that was never loaded can't have been assigned
+            return False
+        return getattr(self, field_name) != self.get_loaded_value(field_name)
+
     def get_total_cost(self):
-        """Calculate subtotal of all order items"""
-        return sum(item.get_cost() for item in self.items.all())
+        """Subtotal of all order items"""
+        return self.subtotal
 
     def get_shipping_cost(self):
         """
-        Return shipping cost based on governorate.
-        Uses GovernorateShipping model or defaults to DEFAULT_SHIPPING_FEE.
+        Shipping cost for the order's governorate (GovernorateShipping rate
+        or DEFAULT_SHIPPING_FEE), as charged when the order was placed.
         """
-        return GovernorateShipping.get_shipping_cost(self.governorate)
+        return self.shipping_amount
     
     def get_total_cost_with_shipping(self):
         """Return total cost including shipping"""
-        return self.get_total_cost() + self.get_shipping_cost()
+        return self.total
+
+    def update_totals(self):
+        """
+        Recompute subtotal and total from the items in one UPDATE and
+        refresh them on this instance. Runs in the caller's transaction.
+        """
+        subtotal = Coalesce(items_subtotal_subquery(), Value(Decimal('0')), output_field=MONEY)
+        Order.objects.filter(pk=self.pk).update(
+            subtotal=subtotal,
+            total=ExpressionWrapper(subtotal + F('shipping_amount'), output_field=MONEY),
+        )
+        self.refresh_from_db(fields=['subtotal', 'total'])
     
     def save(self, *args, **kwargs):
         """
         Override save method to send emails on order status updates only.
         Confirmation email should be sent after all OrderItems are created (in the order creation logic, not here).
+        
+        Changes are detected against the values loaded with the instance, so
+        saving an existing order is a single UPDATE. That UPDATE leaves
+        subtotal/total alone (a stale instance can't overwrite what
+        update_totals() wrote), except that a governorate change recomputes
+        total from the stored subtotal in SQL.
         """
         is_new = self.pk is None
-        if not is_new:
-            old_instance = Order.objects.get(pk=self.pk)
-            status_changed = old_instance.status != self.status
+        status_changed = self.has_changed('status')
+        governorate_changed = is_new or self.has_changed('governorate')
+
+        if governorate_changed:
+            self.shipping_amount = GovernorateShipping.get_shipping_cost(self.governorate)
+
+        if is_new:
+            self.total = self.subtotal + self.shipping_amount
         else:
-            status_changed = False
+            update_fields = kwargs.get('update_fields')
+            if update_fields is None:
+                deferred = self.get_deferred_fields()
+                update_fields = [
+                    field.name for field in self._meta.concrete_fields
+                    if not field.primary_key and field.attname not in deferred
+                    and field.name not in self.COMPUTED_FIELDS
+                ]
+            else:
+                update_fields = [name for name in update_fields if name not in self.COMPUTED_FIELDS]
+            if governorate_changed:
+                self.total = ExpressionWrapper(F('subtotal') + self.shipping_amount, output_field=MONEY)
+                update_fields = [*update_fields, 'shipping_amount', 'total']
+            kwargs['update_fields'] = list(dict.fromkeys(update_fields))
 
         # Save the order
         super().save(*args, **kwargs)
 
+        if not is_new and governorate_changed:
+            # Computed by the database; loaded again on first access
+            del self.total
+        self._snapshot()
+
         # Send status update email only (not confirmation email)
         try:
             from .utils import send_order_status_update_email
             # Send status update email when status changes
             if not is_new and status_changed:
-                print(f"Attempting to send status update email to {self.email} for order #{self.id}")
-                send_order_status_update_email(self)
-                print("Status update email sent successfully")
+                print(f"Queueing status update email to {self.email} for order #{self.id}")
+                # Savepoint: a swallowed database error must not abort
+                # the caller's transaction
+                with transaction.atomic():
+                    send_order_status_update_email(self)
+                print("Status update email queued")
         except Exception as e:
             # Log the error but don't prevent the order from being saved
             print(f"Error sending order email: {str(e)}")
@@ -148,3 +273,31 @@ class OrderItem(models.Model):
     def get_cost(self):
         """Calculate total cost for this item (price × quantity)"""
         return self.price * self.quantity
+
+
+class OrderStatusChange(models.Model):
+    """
+    Queue of status transitions applied in bulk (orders/transitions.py).
+    The process_order_transitions worker sends their notifications and
+    Bosta cancellations, which a single Order.save() does inline.
+    """
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='status_changes')
+    from_status = models.CharField(max_length=10, choices=Order.STATUS_CHOICES)
+    to_status = models.CharField(max_length=10, choices=Order.STATUS_CHOICES)
+    created = models.DateTimeField(auto_now_add=True)
+    # Emails are queued once even if the Bosta cancellation needs retries
+    notified = models.BooleanField(default=False)
+    # Null until the worker has handled the change
+    processed_at = models.DateTimeField(null=True, blank=True, db_index=True)
+    attempts = models.PositiveIntegerField(default=0)
+    # Set after a failed attempt; the worker skips the change until then
+    next_attempt_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+
+    class Meta:
+        ordering = ('-created',)
+        verbose_name = "Order Status Change"
+        verbose_name_plural = "Order Status Changes"
+
+    def __str__(self):
+        return f"Order #{self.order_id}: {self.from_status} -> {self.to_status}"
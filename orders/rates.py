@@ -0,0 +1,109 @@
+"""
+In-process table of governorate shipping rates.
+
+Every shipping cost lookup (Order.get_shipping_cost, serializers, the admin
+changelist, the shipping-cost API) reads this table instead of querying
+GovernorateShipping, so a lookup is a dict access keyed by the normalized
+governorate name.
+
+The table is loaded once per process and versioned by the row count and
+latest GovernorateShipping.updated, read from the database so every process
+sees the same version whatever cache backend is configured. A process
+compares its copy's version with the database at most every
+GOVERNORATE_RATES_RECHECK seconds; saving or deleting a row (see
+orders/signals.py) also drops the saving process's copy at once. Queryset
+.update() calls bypass auto_now, so they must set ``updated`` themselves.
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.db.models import Count, Max
+
+
+def normalize_governorate(name):
+    """Lookup key for a governorate name: case and spacing don't matter."""
+    return ' '.join(str(name or '').split()).casefold()
+
+
+class Rate:
+    __slots__ = ('name', 'shipping_cost')
+
+    def __init__(self, name, shipping_cost):
+        self.name = name
+        self.shipping_cost = shipping_cost
+
+    def __repr__(self):
+        return f'<Rate {self.name} {self.shipping_cost}>'
+
+
+class RateTable:
+    """Active rates keyed by normalized name."""
+
+    def __init__(self, rows, version):
+        self.rates = {normalize_governorate(name): Rate(name, cost) for name, cost in rows}
+        self.version = version
+        self.checked_at = time.monotonic()
+
+    def get(self, governorate_name):
+        """The active Rate for a governorate, or None."""
+        if not governorate_name:
+            return None
+        return self.rates.get(normalize_governorate(governorate_name))
+
+    def shipping_cost(self, governorate_name):
+        from .models import DEFAULT_SHIPPING_FEE
+
+        rate = self.get(governorate_name)
+        return rate.shipping_cost if rate else DEFAULT_SHIPPING_FEE
+
+    def active(self):
+        """Active rates sorted by name."""
+        return sorted(self.rates.values(), key=lambda rate: rate.name)
+
+
+def _get_version():
+    from .models import GovernorateShipping
+
+    # The count catches deletes, which leave the latest updated unchanged
+    state = GovernorateShipping.objects.aggregate(last_updated=Max('updated'), count=Count('id'))
+    return state['count'], state['last_updated']
+
+
+_lock = threading.Lock()
+_table = None
+
+
+def get_rate_table():
+    """The current RateTable, loading it on first use or after a change."""
+    global _table
+    table = _table
+    if table is not None and time.monotonic() - table.checked_at < getattr(settings, 'GOVERNORATE_RATES_RECHECK', 5):
+        return table
+
+    from .models import GovernorateShipping
+
+    version = _get_version()
+    if table is not None and table.version == version:
+        table.checked_at = time.monotonic()
+        return table
+
+    with _lock:
+        if _table is table:
+            rows = GovernorateShipping.objects.filter(is_active=True).values_list('name', 'shipping_cost')
+            _table = RateTable(list(rows), version)
+        return _table
+
+
+def get_shipping_cost(governorate_name):
+    """Shipping cost for a governorate, or DEFAULT_SHIPPING_FEE."""
+    return get_rate_table().shipping_cost(governorate_name)
+
+
+def invalidate_rates():
+    """
+    Drop this process's table. Other processes notice the change from the
+    database on their next recheck.
+    """
+    global _table
+    _table = None
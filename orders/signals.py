@@ -0,0 +1,33 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import Signal, receiver
+from .models import GovernorateShipping, Order, OrderItem
+from .rates import invalidate_rates
+
+# Sent by orders.transitions with ``orders``, a list of orders that were
+# cancelled in bulk. Receivers return {order_id: error} for any order they
+# could not handle, so the change is retried.
+orders_cancelled = Signal()
+
+
+@receiver(post_save, sender=GovernorateShipping)
+@receiver(post_delete, sender=GovernorateShipping)
+def invalidate_governorate_rates(sender, **kwargs):
+    """Reload this process's rate table once the change is committed."""
+    transaction.on_commit(invalidate_rates)
+
+
+@receiver(post_save, sender=OrderItem)
+@receiver(post_delete, sender=OrderItem)
+def update_order_totals(sender, instance, raw=False, **kwargs):
+    """
+    Keep Order.subtotal/total in step with its items, in the same
+    transaction. bulk_create() sends no signal; call order.update_totals()
+    after it.
+    """
+    if raw:
+        return
+    try:
+        instance.order.update_totals()
+    except Order.DoesNotExist:
+        pass  # Deleted along with its order
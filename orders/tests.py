@@ -1,3 +1,391 @@
-from django.test import TestCase
+import importlib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.apps import apps
+from django.contrib.auth.models import User
+from django.db import OperationalError, connection, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from communications.models import OutboundEmail
+from products.models import Category, Product, ProductSize, Size
+from . import rates
+from .exceptions import InsufficientStockError
+from .inventory import commit_stock
+from .models import DEFAULT_SHIPPING_FEE, GovernorateShipping, Order, OrderItem, OrderStatusChange
+from .signals import orders_cancelled
+from .transitions import process_status_changes
+
+
+def create_product(stock, sizes=()):
+    category = Category.objects.create(name='Jeans', slug='jeans')
+    product = Product.objects.create(category=category, name='Slim jeans', slug='slim-jeans',
+                                     price=Decimal('100.00'), stock=0)
+    for size in sizes:
+        ProductSize.objects.create(product=product, size=size, stock=stock)
+    return product
+
+
+def create_order(**kwargs):
+    fields = dict(first_name='Mona', last_name='Adel', email='mona@example.com', address='12 Tahrir St',
+                  city='Dokki', postal_code='12611', phone='01000000000', governorate='Giza')
+    fields.update(kwargs)
+    return Order.objects.create(**fields)
+
+
+class CommitStockTests(TestCase):
+    def setUp(self):
+        self.small = Size.objects.create(name='S')
+        self.large = Size.objects.create(name='L')
+        self.product = create_product(2, [self.small, self.large])
+
+    def stock(self, size):
+        return ProductSize.objects.get(product=self.product, size=size).stock
+
+    def test_takes_stock_of_each_line(self):
+        with transaction.atomic():
+            commit_stock([(self.product, self.small.id, 1), (self.product, self.small.id, 1),
+                          (self.product, self.large.id, 1)])
+
+        self.assertEqual((self.stock(self.small), self.stock(self.large)), (0, 1))
+
+    def test_insufficient_stock_rolls_back_the_whole_order(self):
+        with self.assertRaises(InsufficientStockError) as raised:
+            with transaction.atomic():
+                commit_stock([(self.product, self.small.id, 1), (self.product, self.large.id, 3)])
+
+        self.assertEqual(raised.exception.available_quantity, 2)
+        self.assertEqual((self.stock(self.small), self.stock(self.large)), (2, 2))
+
+
+class ConcurrentCheckoutTests(TransactionTestCase):
+    """The last units of a size can't be sold twice, however checkouts interleave."""
+
+    stock = 20
+    checkouts = 60
+    threads = 8
+
+    def test_concurrent_checkouts_never_oversell(self):
+        size = Size.objects.create(name='M')
+        product = create_product(self.stock, [size])
+        outcomes = []
+        lock = threading.Lock()
+
+        def checkout(_):
+            try:
+                while True:
+                    try:
+                        with transaction.atomic():
+                            commit_stock([(product, size.id, 1)])
+                        outcome = 'placed'
+                        break
+                    except InsufficientStockError:
+                        outcome = 'rejected'
+                        break
+                    except OperationalError:
+                        # SQLite allows one writer at a time ("database is locked")
+                        time.sleep(0.001)
+            finally:
+                connection.close()
+            with lock:
+                outcomes.append(outcome)
+
+        with ThreadPoolExecutor(max_workers=self.threads) as pool:
+            list(pool.map(checkout, range(self.checkouts)))
+
+        remaining = ProductSize.objects.get(product=product, size=size).stock
+        self.assertEqual(outcomes.count('placed'), self.stock)
+        self.assertEqual(outcomes.count('rejected'), self.checkouts - self.stock)
+        self.assertEqual(remaining, 0)
+
+
+class RateTableTests(TestCase):
+    def setUp(self):
+        rates.invalidate_rates()
+        self.addCleanup(rates.invalidate_rates)
+        self.giza = GovernorateShipping.objects.create(name='Giza', shipping_cost=Decimal('60.00'))
+        GovernorateShipping.objects.create(name='Red Sea', shipping_cost=Decimal('120.00'))
+        GovernorateShipping.objects.create(name='Siwa', shipping_cost=Decimal('200.00'), is_active=False)
+
+    def test_lookup(self):
+        self.assertEqual(rates.get_shipping_cost('giza'), Decimal('60.00'))
+        self.assertEqual(rates.get_shipping_cost('  red   SEA '), Decimal('120.00'))
+        self.assertEqual(rates.get_shipping_cost('Siwa'), DEFAULT_SHIPPING_FEE)
+        self.assertEqual(rates.get_shipping_cost('Atlantis'), DEFAULT_SHIPPING_FEE)
+        self.assertEqual(rates.get_shipping_cost(''), DEFAULT_SHIPPING_FEE)
+        self.assertEqual([rate.name for rate in rates.get_rate_table().active()], ['Giza', 'Red Sea'])
+
+    @override_settings(GOVERNORATE_RATES_RECHECK=60)
+    def test_table_is_served_from_memory(self):
+        rates.get_rate_table()
+
+        with self.assertNumQueries(0):
+            self.assertEqual(rates.get_shipping_cost('Giza'), Decimal('60.00'))
+
+    def test_save_invalidates_this_process(self):
+        rates.get_rate_table()
+        self.giza.shipping_cost = Decimal('75.00')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.giza.save()
+
+        self.assertEqual(rates.get_shipping_cost('Giza'), Decimal('75.00'))
+
+    @override_settings(GOVERNORATE_RATES_RECHECK=0)
+    def test_changes_made_elsewhere_are_seen_on_recheck(self):
+        # Queryset writes fire no signals, like a save in another process
+        rates.get_rate_table()
+        GovernorateShipping.objects.filter(pk=self.giza.pk).update(
+            shipping_cost=Decimal('80.00'), updated=timezone.now())
+        self.assertEqual(rates.get_shipping_cost('Giza'), Decimal('80.00'))
+
+        GovernorateShipping.objects.filter(pk=self.giza.pk).delete()
+        self.assertEqual(rates.get_shipping_cost('Giza'), DEFAULT_SHIPPING_FEE)
+
+    @override_settings(GOVERNORATE_RATES_RECHECK=0)
+    def test_unchanged_table_is_not_reloaded(self):
+        table = rates.get_rate_table()
+
+        with self.assertNumQueries(1):
+            self.assertIs(rates.get_rate_table(), table)
+
+
+@override_settings(ADMIN_NOTIFICATION_EMAILS=['admin@denimora.com'])
+class StatusTransitionTests(TestCase):
+    def setUp(self):
+        self.orders = [create_order(), create_order(email='omar@example.com')]
+
+    def cancel_handler(self, response):
+        handler = mock.Mock(return_value=response)
+        orders_cancelled.connect(handler, dispatch_uid='test-cancel-handler')
+        self.addCleanup(orders_cancelled.disconnect, dispatch_uid='test-cancel-handler')
+        return handler
+
+    def emails(self):
+        return sorted(OutboundEmail.objects.values_list('category', flat=True))
+
+    def test_admin_action_queues_changes_without_sending(self):
+        admin = User.objects.create_superuser('admin', 'admin@denimora.com', 'password')
+        self.client.force_login(admin)
+
+        self.client.post(reverse('admin:orders_order_changelist'), {
+            'action': 'mark_shipped',
+            '_selected_action': [order.pk for order in self.orders],
+        })
+
+        self.assertEqual(set(Order.objects.values_list('status', flat=True)), {'shipped'})
+        self.assertEqual(OrderStatusChange.objects.filter(from_status='pending', to_status='shipped').count(), 2)
+        self.assertEqual(self.emails(), [])
+
+    def test_changes_are_notified_once_per_order(self):
+        order = self.orders[0]
+        Order.objects.filter(pk=order.pk).update(status='shipped')
+        OrderStatusChange.objects.create(order=order, from_status='pending', to_status='processing')
+        OrderStatusChange.objects.create(order=order, from_status='processing', to_status='shipped')
+
+        self.assertEqual(process_status_changes(), {'processed': 2, 'retrying': 0, 'failed': 0})
+
+        self.assertEqual(self.emails(), ['admin_order_status_update', 'order_status_update'])
+        self.assertIn('Shipped', OutboundEmail.objects.get(category='admin_order_status_update').subject)
+        self.assertEqual(process_status_changes(), {'processed': 0, 'retrying': 0, 'failed': 0})
+
+    def test_failed_notification_queues_nothing_and_is_retried(self):
+        OrderStatusChange.objects.create(order=self.orders[0], from_status='pending', to_status='shipped')
+
+        with mock.patch('orders.utils.render_to_string', side_effect=['<p>Shipped</p>', Exception('bad template')]):
+            self.assertEqual(process_status_changes()['retrying'], 1)
+
+        change = OrderStatusChange.objects.get()
+        self.assertFalse(change.notified)
+        self.assertEqual(change.last_error, 'Notification failed: bad template')
+        self.assertEqual(self.emails(), [])
+
+        OrderStatusChange.objects.update(next_attempt_at=timezone.now())
+        self.assertEqual(process_status_changes()['processed'], 1)
+        self.assertEqual(len(self.emails()), 2)
+
+    def test_failed_cancellation_is_retried_without_notifying_again(self):
+        order = self.orders[0]
+        OrderStatusChange.objects.create(order=order, from_status='pending', to_status='cancelled')
+        handler = self.cancel_handler({order.id: 'Bosta cancellation failed'})
+
+        self.assertEqual(process_status_changes()['retrying'], 1)
+        self.assertEqual([list(call.kwargs['orders']) for call in handler.call_args_list], [[order]])
+        change = OrderStatusChange.objects.get()
+        self.assertTrue(change.notified)
+        self.assertEqual(change.last_error, 'Bosta cancellation failed')
+
+        handler.return_value = {}
+        OrderStatusChange.objects.update(next_attempt_at=timezone.now())
+        self.assertEqual(process_status_changes()['processed'], 1)
+        self.assertEqual(len(self.emails()), 2)
+
+    def test_claimed_changes_are_leased(self):
+        OrderStatusChange.objects.create(order=self.orders[0], from_status='pending', to_status='shipped')
+
+        with mock.patch('orders.transitions._notify', side_effect=SystemExit):
+            with self.assertRaises(SystemExit):
+                process_status_changes()
+        # The crashed worker's lease has to run out first
+        self.assertEqual(process_status_changes()['processed'], 0)
+
+        OrderStatusChange.objects.update(next_attempt_at=timezone.now())
+        self.assertEqual(process_status_changes()['processed'], 1)
+
+
+class CancellationLockTests(TransactionTestCase):
+    def test_cancellation_handlers_run_without_row_locks(self):
+        order = create_order()
+        OrderStatusChange.objects.create(order=order, from_status='pending', to_status='cancelled')
+        in_transaction = []
+
+        def handler(sender, orders, **kwargs):
+            in_transaction.append(connection.in_atomic_block)
+            return {}
+
+        orders_cancelled.connect(handler, dispatch_uid='test-lock-handler')
+        self.addCleanup(orders_cancelled.disconnect, dispatch_uid='test-lock-handler')
+
+        self.assertEqual(process_status_changes()['processed'], 1)
+        self.assertEqual(in_transaction, [False])
+
+
+class OrderSaveTests(TestCase):
+    def setUp(self):
+        rates.invalidate_rates()
+        self.addCleanup(rates.invalidate_rates)
+        GovernorateShipping.objects.create(name='Giza', shipping_cost=Decimal('60.00'))
+        GovernorateShipping.objects.create(name='Cairo', shipping_cost=Decimal('50.00'))
+        self.order = Order.objects.get(pk=create_order().pk)
+        # Warm the rate table so only the save's own queries are counted
+        rates.get_rate_table()
+
+    def order_queries(self, queries):
+        return [query['sql'].split(' ', 1)[0] for query in queries if '"orders_order"' in query['sql']]
+
+    def test_unchanged_save_is_one_update(self):
+        with self.assertNumQueries(1):
+            self.order.save()
+
+    def test_status_change_is_detected_without_reading_the_order(self):
+        self.order.status = 'shipped'
+
+        with mock.patch('orders.utils.send_order_status_update_email') as send, \
+                CaptureQueriesContext(connection) as queries:
+            self.order.save()
+
+        send.assert_called_once_with(self.order)
+        self.assertEqual(self.order_queries(queries), ['UPDATE'])
+        # The savepoint around the email and the Bosta shipment lookup
+        # (shipping/signals.py) are the only other queries
+        self.assertEqual(len(queries), 4)
+
+        with mock.patch('orders.utils.send_order_status_update_email') as send:
+            self.order.save()
+        send.assert_not_called()
+
+    def test_governorate_change_recomputes_shipping_in_the_update(self):
+        self.order.governorate = 'Cairo'
+
+        with self.assertNumQueries(1):
+            self.order.save()
+
+        self.order.refresh_from_db()
+        self.assertEqual((self.order.shipping_amount, self.order.total), (Decimal('50.00'), Decimal('50.00')))
+
+    def test_refresh_from_db_takes_a_new_snapshot(self):
+        Order.objects.filter(pk=self.order.pk).update(status='shipped')
+        self.order.refresh_from_db(fields=['status'])
+
+        self.assertFalse(self.order.has_changed('status'))
+        with mock.patch('orders.utils.send_order_status_update_email') as send, self.assertNumQueries(1):
+            self.order.save()
+        send.assert_not_called()
+
+    def test_deferred_status_is_read_once_when_assigned(self):
+        order = Order.objects.only('id', 'email').get(pk=self.order.pk)
+        with self.assertNumQueries(0):
+            self.assertFalse(order.has_changed('status'))
+
+        order.status = 'shipped'
+        with self.assertNumQueries(1):
+            self.assertTrue(order.has_changed('status'))
+            self.assertTrue(order.has_changed('status'))
+
+
+class StoredTotalsTests(TestCase):
+    def setUp(self):
+        rates.invalidate_rates()
+        self.addCleanup(rates.invalidate_rates)
+        GovernorateShipping.objects.create(name='Giza', shipping_cost=Decimal('60.00'))
+        GovernorateShipping.objects.create(name='Cairo', shipping_cost=Decimal('50.00'))
+        self.size = Size.objects.create(name='M')
+        self.product = create_product(10, [self.size])
+        self.order = create_order()
+
+    def assertTotals(self, order, subtotal, shipping):
+        order.refresh_from_db()
+        self.assertEqual((order.subtotal, order.shipping_amount, order.total),
+                         (Decimal(subtotal), Decimal(shipping), Decimal(subtotal) + Decimal(shipping)))
+        live = Order.objects.with_totals().get(pk=order.pk)
+        self.assertEqual((live.items_subtotal, live.shipping_rate, live.grand_total),
+                         (order.subtotal, order.shipping_amount, order.total))
+
+    def test_new_order_is_charged_its_governorate_rate(self):
+        self.assertTotals(self.order, '0', '60.00')
+        self.assertTotals(create_order(governorate='Atlantis'), '0', DEFAULT_SHIPPING_FEE)
+
+    def test_items_keep_the_totals_current(self):
+        item = OrderItem.objects.create(order=self.order, product=self.product, price=Decimal('100.00'), quantity=2)
+        OrderItem.objects.create(order=self.order, product=self.product, price=Decimal('25.50'), quantity=1)
+        self.assertTotals(self.order, '225.50', '60.00')
+
+        item.quantity = 3
+        item.save()
+        self.assertTotals(self.order, '325.50', '60.00')
+
+        item.delete()
+        self.assertTotals(self.order, '25.50', '60.00')
+
+    def test_governorate_change_keeps_the_subtotal(self):
+        OrderItem.objects.create(order=self.order, product=self.product, price=Decimal('100.00'), quantity=1)
+        # A stale instance must not overwrite the subtotal the item signal wrote
+        order = Order.objects.get(pk=self.order.pk)
+        OrderItem.objects.create(order=self.order, product=self.product, price=Decimal('40.00'), quantity=1)
+
+        order.governorate = 'Cairo'
+        order.save()
+
+        self.assertTotals(order, '140.00', '50.00')
+
+    def test_checkout_stores_totals(self):
+        response = self.client.post(reverse('api_order_create'), {
+            'first_name': 'Mona', 'last_name': 'Adel', 'email': 'mona@example.com', 'address': '12 Tahrir St',
+            'city': 'Dokki', 'postal_code': '12611', 'phone': '01000000000', 'governorate': 'Giza',
+            'items': [
+                {'product_id': self.product.id, 'name': 'Slim jeans', 'price': 100, 'quantity': 2,
+                 'size': 'M', 'size_id': self.size.id},
+                {'name': 'Gift wrap', 'price': 15, 'quantity': 1},
+            ],
+        }, content_type='application/json')
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['total_cost_with_shipping'], '275.00')
+        self.assertTotals(Order.objects.get(pk=response.json()['id']), '215.00', '60.00')
+
+    def test_backfill_migration(self):
+        backfill = importlib.import_module('orders.migrations.0006_backfill_order_totals')
+        OrderItem.objects.create(order=self.order, product=self.product, price=Decimal('100.00'), quantity=2)
+        empty = create_order(governorate=None)
+        Order.objects.update(subtotal=0, shipping_amount=0, total=0)
+
+        backfill.backfill_totals(apps, None)
+
+        self.assertTotals(self.order, '200.00', '60.00')
+        self.assertTotals(empty, '0', DEFAULT_SHIPPING_FEE)
@@ -0,0 +1,200 @@
+"""
+Bulk order status transitions.
+
+apply_transitions() changes the status of many orders at once: the rows
+are locked, compared with their current status, and written with one
+UPDATE per target status. It does not call Order.save(), so nothing is
+sent inline; each real change is recorded as an OrderStatusChange row
+instead (one bulk_create).
+
+process_status_changes(), run by the process_order_transitions command,
+drains that queue in batches. A batch is claimed with SELECT ... FOR UPDATE
+SKIP LOCKED and leased (ORDER_TRANSITION_LEASE), and the claim is committed
+before any work starts, so no row locks are held during it:
+
+- the customer/admin status emails are queued through the email outbox,
+  once per order for its latest change in the batch;
+- orders that were cancelled are handed to the orders_cancelled signal in
+  one call (shipping/signals.py cancels their Bosta shipments).
+
+A change whose work fails is retried with exponential backoff (from
+ORDER_TRANSITION_RETRY_DELAY seconds) up to ORDER_TRANSITION_MAX_ATTEMPTS,
+then left with its last error.
+"""
+import logging
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from .models import Order, OrderStatusChange
+from .signals import orders_cancelled
+
+logger = logging.getLogger(__name__)
+
+VALID_STATUSES = {status for status, _ in Order.STATUS_CHOICES}
+
+
+class TransitionResult:
+    """Counts from one apply_transitions() call."""
+
+    def __init__(self):
+        self.changed = defaultdict(int)  # target status -> orders moved
+        self.unchanged = 0
+        self.missing = 0
+
+    @property
+    def total_changed(self):
+        return sum(self.changed.values())
+
+    def summary(self):
+        moved = ', '.join(f'{count} to {status}' for status, count in sorted(self.changed.items())) or 'none'
+        return f'{self.total_changed} orders changed ({moved}), {self.unchanged} already in that status, {self.missing} not found'
+
+
+def apply_transitions(changes):
+    """
+    Apply ``changes`` ({order_id: new_status}) and queue their side effects.
+    Raises ValueError for an unknown status. Returns a TransitionResult.
+    """
+    unknown = set(changes.values()) - VALID_STATUSES
+    if unknown:
+        raise ValueError(f"Unknown order status: {', '.join(sorted(unknown))}")
+
+    result = TransitionResult()
+    with transaction.atomic():
+        current = dict(
+            Order.objects.select_for_update().filter(pk__in=list(changes)).values_list('pk', 'status')
+        )
+        by_status = defaultdict(list)
+        records = []
+        for order_id, status in changes.items():
+            old_status = current.get(order_id)
+            if old_status is None:
+                result.missing += 1
+            elif old_status == status:
+                result.unchanged += 1
+            else:
+                by_status[status].append(order_id)
+                records.append(OrderStatusChange(order_id=order_id, from_status=old_status, to_status=status))
+
+        now = timezone.now()
+        for status, order_ids in by_status.items():
+            Order.objects.filter(pk__in=order_ids).update(status=status, updated=now)
+            result.changed[status] = len(order_ids)
+        OrderStatusChange.objects.bulk_create(records)
+    return result
+
+
+def _retry_delay(attempts):
+    """Backoff before the next try: base * 2 ** (attempts - 1)."""
+    base = getattr(settings, 'ORDER_TRANSITION_RETRY_DELAY', 60)
+    return timedelta(seconds=base * 2 ** max(attempts - 1, 0))
+
+
+def _lease():
+    return timedelta(seconds=getattr(settings, 'ORDER_TRANSITION_LEASE', 5 * 60))
+
+
+def transition_orders(order_ids, status):
+    """Move every order in ``order_ids`` to ``status``."""
+    return apply_transitions({order_id: status for order_id in order_ids})
+
+
+def claim_changes(batch_size, max_attempts):
+    """
+    Lease up to ``batch_size`` due changes to this worker. The row locks
+    are released on return, so the work (emails, Bosta calls) runs without
+    them; a worker that dies mid-batch loses the lease and the changes
+    become due again.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        batch = list(
+            OrderStatusChange.objects.select_for_update(skip_locked=True)
+            .filter(processed_at__isnull=True, attempts__lt=max_attempts)
+            .filter(Q(next_attempt_at__isnull=True) | Q(next_attempt_at__lte=now))
+            .order_by('id')[:batch_size]
+        )
+        if batch:
+            OrderStatusChange.objects.filter(id__in=[change.id for change in batch]).update(
+                next_attempt_at=now + _lease()
+            )
+    return batch
+
+
+def _notify(order, change):
+    from communications.outbox import enqueue_email
+    from .utils import order_status_update_emails
+
+    # Renders from the order as it is now, i.e. its latest status. Errors
+    # propagate, so nothing is marked notified unless every email is queued
+    with transaction.atomic():
+        for email in order_status_update_emails(order):
+            enqueue_email(**email)
+        OrderStatusChange.objects.filter(pk=change.pk).update(notified=True)
+    change.notified = True
+
+
+def process_status_changes(batch_size=100):
+    """
+    Handle up to ``batch_size`` queued changes.
+    Returns a dict of counts: processed, retrying, failed.
+    """
+    counts = {'processed': 0, 'retrying': 0, 'failed': 0}
+    max_attempts = getattr(settings, 'ORDER_TRANSITION_MAX_ATTEMPTS', 5)
+
+    batch = claim_changes(batch_size, max_attempts)
+    if not batch:
+        return counts
+
+    # Only the latest change per order is acted on; earlier ones in the
+    # same batch are superseded
+    latest = {}
+    for change in batch:
+        latest[change.order_id] = change
+    orders = Order.objects.prefetch_related('items', 'items__product').in_bulk(list(latest))
+
+    errors = {}
+    for order_id, change in latest.items():
+        order = orders.get(order_id)
+        if order is None or change.notified:
+            continue
+        try:
+            _notify(order, change)
+        except Exception as e:
+            errors[order_id] = f'Notification failed: {str(e)}'
+
+    cancelled = [orders[order_id] for order_id, change in latest.items()
+                 if change.to_status == 'cancelled' and order_id in orders]
+    if cancelled:
+        for receiver, response in orders_cancelled.send_robust(sender=Order, orders=cancelled):
+            if isinstance(response, Exception):
+                logger.error(f"Cancellation handler {receiver} failed: {str(response)}")
+                for order in cancelled:
+                    errors.setdefault(order.id, f'Cancellation failed: {str(response)}')
+            else:
+                # Handlers return {order_id: error} for the orders they couldn't handle
+                for order_id, error in (response or {}).items():
+                    errors.setdefault(order_id, error)
+
+    now = timezone.now()
+    for change in batch:
+        change.attempts += 1
+        error = errors.get(change.order_id) if latest[change.order_id] is change else None
+        change.last_error = error or ''
+        if error is None:
+            change.processed_at = now
+            counts['processed'] += 1
+        elif change.attempts >= max_attempts:
+            counts['failed'] += 1
+            logger.error(f"Giving up on {change}: {error}")
+        else:
+            change.next_attempt_at = now + _retry_delay(change.attempts)
+            counts['retrying'] += 1
+    OrderStatusChange.objects.bulk_update(
+        batch, ['notified', 'attempts', 'next_attempt_at', 'last_error', 'processed_at']
+    )
+    return counts
@@ -1,9 +1,9 @@
-from django.core.mail import send_mail
 from django.template.loader import render_to_string
 from django.conf import settings
 from django.urls import reverse
 from django.utils.html import strip_tags
 from orders.models import Order
+from communications.outbox import enqueue_email
 import logging
 
 logger = logging.getLogger(__name__)
@@ -30,7 +30,7 @@ def _get_admin_emails():
 
 def send_order_confirmation_email(order):
     """
-    Send order confirmation email to customer
+    Queue order confirmation email to customer (sent by send_queued_emails)
     """
 
     # Reload order with items
@@ -51,19 +51,18 @@ def send_order_confirmation_email(order):
         # Create plain text version
         plain_message = strip_tags(html_message)
         
-        print(f"Sending confirmation email to {order.email}")
-        print(f"Email settings: HOST={settings.EMAIL_HOST}, PORT={settings.EMAIL_PORT}, USER={settings.EMAIL_HOST_USER}")
+        print(f"Queueing confirmation email to {order.email}")
         
-        # Send the email to customer
-        send_mail(
+        # Queue the email to customer
+        enqueue_email(
             subject=subject,
             message=plain_message,
             from_email=settings.DEFAULT_FROM_EMAIL,
             recipient_list=[order.email],
             html_message=html_message,
-            fail_silently=False,
+            category='order_confirmation',
         )
-        print("Confirmation email sent successfully")
+        print("Confirmation email queued")
 
         # Send admin notification (HTML template + plain text fallback)
         try:
@@ -75,15 +74,15 @@ def send_order_confirmation_email(order):
                     'site_url': settings.SITE_URL,
                 })
                 admin_plain = strip_tags(admin_html)
-                send_mail(
+                enqueue_email(
                     subject=admin_subject,
                     message=admin_plain,
                     from_email=settings.DEFAULT_FROM_EMAIL,
                     recipient_list=admin_recipients,
                     html_message=admin_html,
-                    fail_silently=False,
+                    category='admin_new_order',
                 )
-                print("Admin new-order notification sent successfully")
+                print("Admin new-order notification queued")
         except Exception as admin_ex:
             print(f"Error sending admin new-order notification: {str(admin_ex)}")
     except Exception as e:
@@ -92,9 +91,45 @@ def send_order_confirmation_email(order):
         print(traceback.format_exc())
         raise
 
+def order_status_update_emails(order):
+    """
+    enqueue_email() arguments for an order's status update emails: one to
+    the customer and, if there are admin recipients, one to them. Rendering
+    errors propagate.
+    """
+    logo_url = f"{settings.SITE_URL}/static/Assets/Logos&Icons/DenimaraLogoNavyNg.svg"
+    html_message = render_to_string('orders/email/order_status_update.html', {
+        'order': order,
+        'logo_url': logo_url,
+    })
+    emails = [{
+        'subject': f'Order Status Update - DENIMORA Order #{order.id}',
+        'message': strip_tags(html_message),
+        'from_email': settings.DEFAULT_FROM_EMAIL,
+        'recipient_list': [order.email],
+        'html_message': html_message,
+        'category': 'order_status_update',
+    }]
+
+    admin_recipients = _get_admin_emails()
+    if admin_recipients:
+        admin_html = render_to_string('orders/email/admin_order_status_update.html', {
+            'order': order,
+            'site_url': settings.SITE_URL,
+        })
+        emails.append({
+            'subject': f"Order #{order.id} status: {order.get_status_display()}",
+            'message': strip_tags(admin_html),
+            'from_email': settings.DEFAULT_FROM_EMAIL,
+            'recipient_list': admin_recipients,
+            'html_message': admin_html,
+            'category': 'admin_order_status_update',
+        })
+    return emails
+
 def send_order_status_update_email(order):
     """
-    Send order status update email to customer
+    Queue order status update email to customer (sent by send_queued_emails)
     """
 
     # Reload order with items
@@ -116,19 +151,18 @@ def send_order_status_update_email(order):
         # Create plain text version
         plain_message = strip_tags(html_message)
         
-        print(f"Sending status update email to {order.email}")
-        print(f"Email settings: HOST={settings.EMAIL_HOST}, PORT={settings.EMAIL_PORT}, USER={settings.EMAIL_HOST_USER}")
+        print(f"Queueing status update email to {order.email}")
         
-        # Send the email to customer
-        send_mail(
+        # Queue the email to customer
+        enqueue_email(
             subject=subject,
             message=plain_message,
             from_email=settings.DEFAULT_FROM_EMAIL,
             recipient_list=[order.email],
             html_message=html_message,
-            fail_silently=False,
+            category='order_status_update',
         )
-        print("Status update email sent successfully")
+        print("Status update email queued")
 
         # Send admin notification of status change (HTML template + plain text fallback)
         try:
@@ -140,15 +174,15 @@ def send_order_status_update_email(order):
                     'site_url': settings.SITE_URL,
                 })
                 admin_plain = strip_tags(admin_html)
-                send_mail(
+                enqueue_email(
                     subject=admin_subject,
                     message=admin_plain,
                     from_email=settings.DEFAULT_FROM_EMAIL,
                     recipient_list=admin_recipients,
                     html_message=admin_html,
-                    fail_silently=False,
+                    category='admin_order_status_update',
                 )
-                print("Admin status-update notification sent successfully")
+                print("Admin status-update notification queued")
         except Exception as admin_ex:
             print(f"Error sending admin status-update notification: {str(admin_ex)}")
     except Exception as e:
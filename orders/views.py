@@ -23,13 +23,18 @@ def order_create(request):
                 order.user = request.user
             order.save()
             
-            for item in cart:
-                OrderItem.objects.create(
+            OrderItem.objects.bulk_create([
+                OrderItem(
                     order=order,
-                    product=item['product'],
-                    price=item['price'],
-                    quantity=item['quantity']
+                    product=item.product,
+                    price=item.price,
+                    quantity=item.quantity,
+                    size_name=item.size_name,
+                    size_id=item.size_id
                 )
+                for item in cart
+            ])
+            order.update_totals()
             
             # Clear the cart
             cart.clear()
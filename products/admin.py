@@ -1,5 +1,8 @@
-from django.contrib import admin
-from .models import Category, Product, Size, ProductSize, ProductImage 
+from django.contrib import admin, messages
+from django.http import HttpResponseRedirect
+from django.utils import timezone
+from storage.batch import BatchUploadError, active_batch
+from .models import Category, Product, Size, ProductSize, ProductImage, RenditionJob
 
 admin.site.site_header = "DENIMORA Admin Dashboard"
 admin.site.index_title = "Admin Settings"
@@ -36,9 +39,45 @@ class ProductAdmin(admin.ModelAdmin):
     inlines = [ProductSizeInline, ProductImageInline]
     filter_horizontal = ['sizes']
 
+    def changeform_view(self, request, object_id=None, form_url='', extra_context=None):
+        # The product image and every detail image uploaded with the form
+        # are pushed as one GitHub commit (see save_related)
+        storage = Product._meta.get_field('image').storage
+        try:
+            with storage.batch(message='Upload product images via Django admin'):
+                return super().changeform_view(request, object_id, form_url, extra_context)
+        except BatchUploadError as e:
+            self.message_user(request, f'Product not saved: {str(e)}', messages.ERROR)
+            return HttpResponseRedirect(request.get_full_path())
+
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        # Commit while the admin's transaction is open, so a failed upload
+        # rolls the product back
+        batch = active_batch(Product._meta.get_field('image').storage)
+        if batch is not None:
+            batch.commit()
+
 @admin.register(ProductSize)
 class ProductSizeAdmin(admin.ModelAdmin):
     list_display = ['product', 'size', 'stock']
     list_filter = ['product', 'size']
     list_editable = ['stock']
     search_fields = ['product__name', 'size__name']
+
+@admin.register(RenditionJob)
+class RenditionJobAdmin(admin.ModelAdmin):
+    list_display = ['source', 'status', 'attempts', 'next_attempt_at', 'created']
+    list_filter = ['status']
+    search_fields = ['source']
+    readonly_fields = ['created', 'attempts', 'last_error']
+    actions = ['retry_jobs']
+
+    def retry_jobs(self, request, queryset):
+        updated = queryset.update(
+            status=RenditionJob.STATUS_PENDING,
+            attempts=0,
+            next_attempt_at=timezone.now()
+        )
+        self.message_user(request, f'{updated} images queued for rendering.')
+    retry_jobs.short_description = "Retry selected jobs"
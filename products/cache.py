@@ -0,0 +1,120 @@
+"""
+Versioned cache for serialized catalog payloads.
+
+Every cached payload key embeds the current catalog version. Saving or
+deleting any catalog model bumps the version once the change commits (see
+products/signals.py), so stale entries are never read again and simply
+expire. The version is a row in the database (CatalogVersion), not a cache
+key: with a per-process cache such as the local-memory backend, a bump is
+still seen by every process, each of which just fills its own cache.
+
+The cache alias is configurable through CATALOG_CACHE_ALIAS, so the same
+code runs against the local-memory backend in development and a Redis
+backend in production.
+"""
+import hashlib
+import time
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import F
+
+VERSION_PK = 1
+HITS_KEY = 'catalog:stats:hits'
+MISSES_KEY = 'catalog:stats:misses'
+
+_MISSING = object()
+
+
+def _get_cache():
+    return caches[getattr(settings, 'CATALOG_CACHE_ALIAS', 'default')]
+
+
+def _get_timeout():
+    return getattr(settings, 'CATALOG_CACHE_TIMEOUT', 60 * 60)
+
+
+def _incr(cache, key, delta=1):
+    try:
+        return cache.incr(key, delta)
+    except ValueError:
+        # Key is missing (first use or evicted)
+        cache.add(key, 0, None)
+        return cache.incr(key, delta)
+
+
+def _create_version():
+    from .models import CatalogVersion
+
+    # Seed from the clock so a lost row never reuses a version still cached
+    row, _ = CatalogVersion.objects.get_or_create(pk=VERSION_PK, defaults={'version': time.time_ns()})
+    return row.version
+
+
+def get_catalog_version():
+    """Return the current catalog version, initialising it if needed."""
+    from .models import CatalogVersion
+
+    version = CatalogVersion.objects.filter(pk=VERSION_PK).values_list('version', flat=True).first()
+    if version is None:
+        version = _create_version()
+    return version
+
+
+def bump_catalog_version():
+    """
+    Invalidate every cached catalog payload. The update locks the version
+    row until the transaction ends, so call it outside one or on commit.
+    """
+    from .models import CatalogVersion
+
+    if not CatalogVersion.objects.filter(pk=VERSION_PK).update(version=F('version') + 1):
+        _create_version()
+
+
+def make_cache_key(name, params=None):
+    """Build the payload key for a view name and its query parameters."""
+    query = urlencode(sorted((params or {}).items()))
+    digest = hashlib.md5(query.encode('utf-8')).hexdigest()
+    return f'catalog:{get_catalog_version()}:{name}:{digest}'
+
+
+def get_or_build(name, params, builder):
+    """
+    Return the cached payload for ``name``/``params`` or build and store it.
+
+    ``builder`` is called on a miss and must return data that can be pickled.
+    Exceptions raised by ``builder`` propagate and nothing is cached.
+    """
+    cache = _get_cache()
+    key = make_cache_key(name, params)
+
+    data = cache.get(key, _MISSING)
+    if data is not _MISSING:
+        _incr(cache, HITS_KEY)
+        return data
+
+    _incr(cache, MISSES_KEY)
+    data = builder()
+    cache.set(key, data, _get_timeout())
+    return data
+
+
+def get_cache_stats():
+    """Return hit/miss counters and the current catalog version."""
+    cache = _get_cache()
+    hits = cache.get(HITS_KEY) or 0
+    misses = cache.get(MISSES_KEY) or 0
+    total = hits + misses
+    return {
+        'version': get_catalog_version(),
+        'hits': hits,
+        'misses': misses,
+        'hit_ratio': round(hits / total, 4) if total else 0.0,
+    }
+
+
+def reset_cache_stats():
+    cache = _get_cache()
+    cache.delete_many([HITS_KEY, MISSES_KEY])
@@ -0,0 +1,46 @@
+"""
+URLs of stored catalog images.
+
+An image's URL is BACKEND_URL (when set) followed by its storage's URL for
+the file name. The function that builds it is made once per storage and
+reused, so the URL of each object is a dict lookup and, for GitHubStorage,
+a string join (see GitHubStorage.url). image_urls() builds the URLs of many
+files at once for serializers.
+"""
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+_builders = {}
+
+
+@receiver(setting_changed)
+def _reset_builders(setting, **kwargs):
+    if setting == 'BACKEND_URL' or setting.startswith('GITHUB_'):
+        _builders.clear()
+
+
+def url_builder(storage):
+    """Function from a file name in ``storage`` to its URL."""
+    builder = _builders.get(storage)
+    if builder is None:
+        backend_url = (getattr(settings, 'BACKEND_URL', '') or '').rstrip('/')
+        url = storage.url
+        builder = _builders[storage] = (lambda name: backend_url + url(name)) if backend_url else url
+    return builder
+
+
+def image_url(field_file, default=''):
+    """URL of ``field_file`` (a FieldFile), or ``default`` if it's empty."""
+    if not field_file:
+        return default
+    return url_builder(field_file.storage)(field_file.name)
+
+
+def image_urls(field_files):
+    """{name: URL} for the non-empty files in ``field_files``."""
+    urls = {}
+    for field_file in field_files:
+        if field_file and field_file.name not in urls:
+            urls[field_file.name] = url_builder(field_file.storage)(field_file.name)
+    return urls
@@ -0,0 +1,112 @@
+import io
+import random
+from django.core.management.base import BaseCommand
+from PIL import Image, ImageDraw
+from products.models import ImageRendition, Product
+from products.renditions import encode, get_formats, target_widths
+
+
+def _photo(rng, width, height):
+    """A photo-like test image: soft gradients, shapes and sensor noise."""
+    image = Image.linear_gradient('L').resize((width, height)).convert('RGB')
+    tint = Image.new('RGB', (width, height), tuple(rng.randrange(40, 220) for _ in range(3)))
+    image = Image.blend(image, tint, 0.6)
+    draw = ImageDraw.Draw(image)
+    for _ in range(12):
+        x, y = rng.randrange(width), rng.randrange(height)
+        r = rng.randrange(width // 20, width // 4)
+        draw.ellipse((x - r, y - r, x + r, y + r), fill=tuple(rng.randrange(256) for _ in range(3)))
+    noise = Image.effect_noise((width, height), 12).convert('RGB')
+    return Image.blend(image, noise, 0.08)
+
+
+def _pick(widths, slot):
+    """The rendition a browser picks from srcset for a ``slot``-pixel slot."""
+    larger = [width for width in widths if width >= slot]
+    return min(larger) if larger else max(widths)
+
+
+class Command(BaseCommand):
+    help = 'Compare bytes transferred per catalog page for original images and renditions'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--page-size',
+            type=int,
+            default=24,
+            help='Products per catalog page (default: 24)'
+        )
+        parser.add_argument(
+            '--slot',
+            type=int,
+            default=640,
+            help='Rendered image width in device pixels (default: 640, a 320px card at 2x)'
+        )
+        parser.add_argument(
+            '--catalog',
+            action='store_true',
+            help='Use the first page of the stored catalog instead of generated photos'
+        )
+        parser.add_argument(
+            '--size',
+            default='2400x3200',
+            help='Generated photo size (default: 2400x3200)'
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=42,
+            help='Random seed for generated photos (default: 42)'
+        )
+
+    def handle(self, *args, **options):
+        if options['catalog']:
+            originals, renditions = self.from_catalog(options['page_size'])
+        else:
+            originals, renditions = self.generate(options)
+
+        pages = len(originals)
+        if not pages:
+            self.stdout.write(self.style.WARNING('No product images to measure'))
+            return
+
+        original_total = sum(originals)
+        self.stdout.write(f'{pages} images, slot {options["slot"]}px')
+        self.stdout.write(f'  original  {original_total / 1024:9.1f} KiB')
+        for fmt in ['avif', 'webp', 'jpeg']:
+            sizes = [widths for widths in (by_format.get(fmt) for by_format in renditions) if widths]
+            if len(sizes) < pages:
+                continue
+            total = sum(widths[_pick(list(widths), options['slot'])] for widths in sizes)
+            self.stdout.write(
+                f'  {fmt:<9} {total / 1024:9.1f} KiB  ({total / original_total:.1%} of original)'
+            )
+
+    def generate(self, options):
+        width, height = (int(value) for value in options['size'].lower().split('x'))
+        rng = random.Random(options['seed'])
+        originals, renditions = [], []
+        for _ in range(options['page_size']):
+            photo = _photo(rng, width, height)
+            buffer = io.BytesIO()
+            # What a phone or camera export typically uploads
+            photo.save(buffer, 'JPEG', quality=92)
+            originals.append(buffer.tell())
+
+            by_format = {}
+            for target in target_widths(width):
+                resized = photo.resize((target, round(height * target / width)), Image.LANCZOS)
+                for fmt in get_formats():
+                    by_format.setdefault(fmt, {})[target] = len(encode(resized, fmt))
+            renditions.append(by_format)
+        return originals, renditions
+
+    def from_catalog(self, page_size):
+        products = list(Product.objects.filter(available=True).exclude(image='').only('id', 'image')[:page_size])
+        names = [product.image.name for product in products]
+        by_source = {}
+        for rendition in ImageRendition.objects.filter(source__in=names):
+            by_source.setdefault(rendition.source, {}).setdefault(rendition.format, {})[rendition.width] = rendition.size
+        # Sizes come from the storage's metadata index, not downloads
+        originals = [product.image.size for product in products]
+        return originals, [by_source.get(name, {}) for name in names]
@@ -0,0 +1,138 @@
+import cProfile
+import pstats
+import time
+from decimal import Decimal
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from api.products.serializers import ProductSerializer
+from products.images import image_urls
+from products.models import Category, ImageRendition, Product, ProductImage
+
+# Functions that build image URLs, by (file suffix, function name); None
+# matches every function in the file
+URL_FUNCTIONS = [
+    ('products/images.py', None),
+    ('storage/github_storage.py', 'url'),
+    ('storage/github_storage.py', 'url_prefix'),
+    ('storage/github_storage.py', '_get_raw_url'),
+    ('storage/github_storage.py', '_normalize_name'),
+    ('api/products/serializers.py', 'get_image_url'),
+    ('products/renditions.py', '<lambda>'),
+]
+
+
+def _is_url_function(filename, name):
+    filename = filename.replace('\\', '/')
+    return any(filename.endswith(suffix) and (function is None or function == name)
+               for suffix, function in URL_FUNCTIONS)
+
+
+class Command(BaseCommand):
+    help = 'Profile catalog serialization and the share spent building image URLs (runs in a rolled-back transaction)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--products',
+            type=int,
+            default=200,
+            help='Products in the catalog (default: 200)'
+        )
+        parser.add_argument(
+            '--detail-images',
+            type=int,
+            default=4,
+            help='Detail images per product (default: 4)'
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=20,
+            help='Timed serializations (default: 20)'
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            self.create_fixtures(options['products'], options['detail_images'])
+            queryset = Product.objects.with_catalog_relations()
+
+            def serialize():
+                return ProductSerializer(queryset.all(), many=True).data
+
+            with CaptureQueriesContext(connection) as queries:
+                data = serialize()
+
+            start = time.perf_counter()
+            for _ in range(options['repeat']):
+                serialize()
+            elapsed = (time.perf_counter() - start) / options['repeat']
+
+            profiler = cProfile.Profile()
+            profiler.runcall(serialize)
+            stats = pstats.Stats(profiler)
+            total = stats.total_tt
+            url_time = sum(
+                tottime for (filename, _, name), (_, _, tottime, _, _) in stats.stats.items()
+                if _is_url_function(filename, name)
+            )
+
+            files = []
+            for product in queryset.all():
+                files.append(product.image)
+                files.extend(image.image for image in product.detail_images.all())
+            renditions = list(ImageRendition.objects.values_list('file', flat=True))
+
+            self.stdout.write(f'{len(data)} products, {len(files)} images, {len(renditions)} renditions, '
+                              f'{len(queries)} queries')
+            self.stdout.write(f'Serialize: {elapsed * 1000:.1f}ms ({elapsed * 1e6 / len(data):.0f}us per product)')
+            self.stdout.write(
+                f'URL building in profile: {url_time * 1000:.2f}ms of {total * 1000:.1f}ms ({url_time / total:.1%})'
+            )
+            self.stdout.write(
+                f'image_url, bulk:          {self.bulk_url_time(files) * 1000:.2f}ms for {len(files)} images'
+            )
+            self.stdout.write(
+                f'image_url, per object:    {self.legacy_url_time(files) * 1000:.2f}ms (settings lookup and '
+                f'name normalization per object, as before)'
+            )
+
+            transaction.set_rollback(True)
+
+    def bulk_url_time(self, files):
+        start = time.perf_counter()
+        image_urls(files)
+        return time.perf_counter() - start
+
+    def legacy_url_time(self, files):
+        start = time.perf_counter()
+        for field_file in files:
+            if field_file:
+                backend_url = getattr(settings, 'BACKEND_URL', '')
+                url = field_file.storage._get_raw_url(field_file.name)
+                if backend_url:
+                    url = f"{backend_url.rstrip('/')}{url}"
+        return time.perf_counter() - start
+
+    def create_fixtures(self, count, detail_images):
+        category = Category.objects.create(name='Benchmark', slug='benchmark-catalog-images')
+        products = Product.objects.bulk_create([
+            Product(
+                category=category,
+                name=f'Benchmark product {i}',
+                slug=f'benchmark-product-{i}',
+                price=Decimal('100.00') + i,
+                image=f'products/2026/01/01/benchmark-{i}.jpg',
+            )
+            for i in range(count)
+        ])
+        images = ProductImage.objects.bulk_create([
+            ProductImage(product=product, image=f'products/details/2026/01/01/benchmark-{product.id}-{j}.jpg')
+            for product in products for j in range(detail_images)
+        ])
+        sources = [product.image.name for product in products] + [image.image.name for image in images]
+        ImageRendition.objects.bulk_create([
+            ImageRendition(source=source, width=width, height=width * 4 // 3, format=fmt,
+                           file=f'{source}-{width}w.{fmt}', size=width * 50)
+            for source in sources for width in (320, 640, 1024) for fmt in ('avif', 'webp', 'jpeg')
+        ])
@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand
+from products.models import Product, ProductImage
+from products.renditions import generate_renditions
+
+
+class Command(BaseCommand):
+    help = 'Generate the missing responsive renditions of product images'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--product-id',
+            type=int,
+            action='append',
+            help='Only this product and its detail images (repeatable)'
+        )
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Regenerate renditions that already exist'
+        )
+
+    def handle(self, *args, **options):
+        products = Product.objects.exclude(image='')
+        images = ProductImage.objects.exclude(image='')
+        if options['product_id']:
+            products = products.filter(id__in=options['product_id'])
+            images = images.filter(product_id__in=options['product_id'])
+
+        files = [product.image for product in products.only('id', 'image')]
+        files += [image.image for image in images.only('id', 'image')]
+
+        rendered = failed = created = 0
+        for field_file in files:
+            try:
+                rows = generate_renditions(field_file, force=options['force'])
+            except Exception as e:
+                failed += 1
+                self.stdout.write(self.style.ERROR(f'{field_file.name}: {str(e)}'))
+                continue
+            if rows:
+                rendered += 1
+                created += len(rows)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'{rendered} of {len(files)} images rendered ({created} renditions), {failed} failed'
+        ))
@@ -0,0 +1,42 @@
+import time
+from django.core.management.base import BaseCommand
+from products.renditions import process_rendition_jobs
+
+class Command(BaseCommand):
+    help = 'Render the product images queued by uploads (RenditionJob)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=10,
+            help='Jobs claimed per batch (default: 10)'
+        )
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Keep polling for new jobs instead of exiting once the queue is empty'
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=5,
+            help='Seconds to sleep between polls when --loop is used (default: 5)'
+        )
+
+    def handle(self, *args, **options):
+        total_done = total_failed = 0
+        while True:
+            claimed, done, failed = process_rendition_jobs(batch_size=options['batch_size'])
+            total_done += done
+            total_failed += failed
+            if claimed:
+                self.stdout.write(f'Batch: {done} rendered, {failed} failed')
+                continue
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Done: {total_done} rendered, {total_failed} failed')
+        )
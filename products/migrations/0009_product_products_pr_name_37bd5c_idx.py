@@ -0,0 +1,17 @@
+# Generated by Django 5.2.3 on 2026-10-18 00:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0008_alter_product_image_alter_productimage_image'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['name', 'id'], name='products_pr_name_37bd5c_idx'),
+        ),
+    ]
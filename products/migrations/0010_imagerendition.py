@@ -0,0 +1,31 @@
+# Generated by Django 5.2.3 on 2026-10-18 01:19
+
+import storage.github_storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0009_product_products_pr_name_37bd5c_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImageRendition',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(help_text='Name of the original image in storage', max_length=255)),
+                ('width', models.PositiveIntegerField()),
+                ('height', models.PositiveIntegerField()),
+                ('format', models.CharField(choices=[('avif', 'AVIF'), ('webp', 'WebP'), ('jpeg', 'JPEG')], max_length=4)),
+                ('file', models.FileField(max_length=255, storage=storage.github_storage.GitHubMediaStorage(), upload_to='')),
+                ('size', models.PositiveIntegerField(help_text='Bytes')),
+                ('created', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ('source', 'format', 'width'),
+                'constraints': [models.UniqueConstraint(fields=('source', 'width', 'format'), name='unique_image_rendition')],
+            },
+        ),
+    ]
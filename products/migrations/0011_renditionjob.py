@@ -0,0 +1,30 @@
+# Generated by Django 5.2.3 on 2026-10-18 01:41
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0010_imagerendition'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RenditionJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(help_text='Name of the original image in storage', max_length=255, unique=True)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('failed', 'Failed')], default='pending', max_length=20)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('next_attempt_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('last_error', models.TextField(blank=True)),
+                ('created', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ('next_attempt_at',),
+                'indexes': [models.Index(fields=['status', 'next_attempt_at'], name='products_re_status_48851f_idx')],
+            },
+        ),
+    ]
@@ -1,9 +1,12 @@
 from django.db import models
 from django.urls import reverse
+from django.utils import timezone
 from django.utils.text import slugify
 from rest_framework import viewsets
-from django.conf import settings
 from storage.github_storage import GitHubMediaStorage
+from .images import image_url
+
+DEFAULT_PRODUCT_IMAGE = '/static/Assets/Shop/default-product.jpg'
 
 
 class Category(models.Model):
@@ -41,6 +44,27 @@ class Size(models.Model):
         return self.name
 
 
+class ProductQuerySet(models.QuerySet):
+    def with_catalog_relations(self, detail_images=True):
+        """
+        Load everything the catalog serializers read in a fixed number of queries:
+        category via JOIN, then sizes, detail images and in-stock product sizes
+        via prefetches. In-stock sizes land on ``in_stock_sizes``.
+        Pass ``detail_images=False`` for listings that don't render them.
+        """
+        lookups = [
+            'sizes',
+            models.Prefetch(
+                'product_sizes',
+                queryset=ProductSize.objects.filter(stock__gt=0).select_related('size'),
+                to_attr='in_stock_sizes',
+            ),
+        ]
+        if detail_images:
+            lookups.append('detail_images')
+        return self.select_related('category').prefetch_related(*lookups)
+
+
 class Product(models.Model):
     category = models.ForeignKey(Category, related_name='products', on_delete=models.CASCADE)
     name = models.CharField(max_length=200)
@@ -54,11 +78,15 @@ class Product(models.Model):
     created = models.DateTimeField(auto_now_add=True)
     updated = models.DateTimeField(auto_now=True)
     is_featured = models.BooleanField(default=False)  
+
+    objects = ProductQuerySet.as_manager()
     
     class Meta:
         ordering = ('name',)
         indexes = [
-            models.Index(fields=['id', 'slug'])
+            models.Index(fields=['id', 'slug']),
+            # Keyset pagination in the product list API
+            models.Index(fields=['name', 'id']),
         ]
     
     def __str__(self):
@@ -74,13 +102,7 @@ class Product(models.Model):
         
     @property
     def image_url(self):
-        if self.image and hasattr(self.image, 'url'):
-            # Get the backend URL from settings
-            backend_url = getattr(settings, 'BACKEND_URL', '')
-            if backend_url:
-                return f"{backend_url.rstrip('/')}{self.image.url}"
-            return self.image.url
-        return '/static/Assets/Shop/default-product.jpg'
+        return image_url(self.image, DEFAULT_PRODUCT_IMAGE)
 
 
 class ProductSize(models.Model):
@@ -108,12 +130,84 @@ class ProductImage(models.Model):
 
     @property
     def image_url(self):
-        if self.image and hasattr(self.image, 'url'):
-            # Get the backend URL from settings
-            backend_url = getattr(settings, 'BACKEND_URL', '')
-            if backend_url:
-                return f"{backend_url.rstrip('/')}{self.image.url}"
-            return self.image.url
-        return ''
+        return image_url(self.image)
+
+
+
 
+class ImageRendition(models.Model):
+    """
+    A resized, re-encoded copy of a product image (see products.renditions).
+    Keyed by the source file name, so Product.image and ProductImage.image
+    share it and a re-upload (a new name) gets new renditions.
+    """
+    FORMAT_CHOICES = [
+        ('avif', 'AVIF'),
+        ('webp', 'WebP'),
+        ('jpeg', 'JPEG'),
+    ]
+
+    source = models.CharField(max_length=255, help_text="Name of the original image in storage")
+    width = models.PositiveIntegerField()
+    height = models.PositiveIntegerField()
+    format = models.CharField(max_length=4, choices=FORMAT_CHOICES)
+    file = models.FileField(max_length=255, storage=GitHubMediaStorage())
+    size = models.PositiveIntegerField(help_text="Bytes")
+    created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ('source', 'format', 'width')
+        constraints = [
+            models.UniqueConstraint(fields=['source', 'width', 'format'], name='unique_image_rendition'),
+        ]
+
+    def __str__(self):
+        return f"{self.source} {self.width}w {self.format}"
 
+
+class RenditionJob(models.Model):
+    """
+    An uploaded image waiting for its renditions, rendered by the
+    process_image_renditions worker. Saving an image only inserts this row
+    (inside the save's transaction), so uploads never wait for resizing,
+    encoding or the GitHub commit. A job is deleted once every rendition of
+    its image exists and retried with backoff while some are missing.
+    """
+    STATUS_PENDING = 'pending'
+    STATUS_RUNNING = 'running'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
+    source = models.CharField(max_length=255, unique=True, help_text="Name of the original image in storage")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    # When the job may next be picked up: the retry time for pending jobs,
+    # the lease expiry for running ones
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ('next_attempt_at',)
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.source} ({self.status})"
+
+
+class CatalogVersion(models.Model):
+    """
+    The single row holding the catalog version that keys cached catalog
+    payloads (see products.cache). It lives in the database rather than the
+    cache so every process sees a bump, whichever cache backend is in use.
+    """
+    version = models.PositiveBigIntegerField()
+
+    def __str__(self):
+        return str(self.version)
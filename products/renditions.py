@@ -0,0 +1,251 @@
+"""
+Responsive renditions of product images.
+
+generate_renditions() resizes an uploaded Product.image / ProductImage.image
+to each width in PRODUCT_IMAGE_WIDTHS (never upscaling) and encodes every
+width in each of PRODUCT_IMAGE_FORMATS that Pillow supports here (AVIF and
+WebP, with JPEG as the fallback every browser reads). Only the (width,
+format) pairs the image doesn't have yet are rendered. The files are saved
+next to the original, under ``renditions/``, through the image's storage as
+one GitHub commit, and recorded as ImageRendition rows.
+
+Saving an image queues a RenditionJob (products/signals.py, when
+PRODUCT_IMAGE_RENDITIONS_ON_UPLOAD is set); the process_image_renditions
+worker calls process_rendition_jobs() to render them:
+
+- a batch of due jobs is claimed with SELECT ... FOR UPDATE SKIP LOCKED and
+  leased, so several workers can run side by side;
+- a job whose renditions all exist is deleted; one with renditions that
+  failed to upload is retried with exponential backoff until
+  PRODUCT_IMAGE_RENDITION_MAX_ATTEMPTS, then marked failed.
+
+The generate_image_renditions command fills in missing renditions of
+existing images directly.
+
+load_srcsets() reads the renditions of many images in one query and
+returns them as srcset strings per format, which the catalog serializers
+expose next to image_url.
+"""
+import io
+import logging
+import os
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.utils import timezone
+from PIL import Image, ImageOps, features
+from .cache import bump_catalog_version
+from .images import url_builder
+from .models import ImageRendition, Product, RenditionJob
+
+logger = logging.getLogger(__name__)
+
+# Pillow save() arguments per format
+ENCODERS = {
+    'avif': ('AVIF', {'quality': 50}),
+    'webp': ('WEBP', {'quality': 75, 'method': 4}),
+    'jpeg': ('JPEG', {'quality': 80, 'optimize': True, 'progressive': True}),
+}
+
+
+def get_widths():
+    return sorted(getattr(settings, 'PRODUCT_IMAGE_WIDTHS', (320, 640, 1024)))
+
+
+def get_formats():
+    """Configured formats this Pillow build can encode."""
+    return [fmt for fmt in getattr(settings, 'PRODUCT_IMAGE_FORMATS', ('avif', 'webp', 'jpeg'))
+            if fmt == 'jpeg' or features.check(fmt)]
+
+
+def target_widths(original_width):
+    """Widths to render for an image ``original_width`` pixels wide."""
+    widths = [width for width in get_widths() if width < original_width]
+    # An image narrower than every width still gets re-encoded once
+    return widths or [original_width]
+
+
+def rendition_name(source, width, fmt):
+    directory, filename = os.path.split(source)
+    stem = os.path.splitext(filename)[0]
+    return f'{directory}/renditions/{stem}-{width}w.{fmt}'
+
+
+class RenditionError(Exception):
+    """Some renditions of an image couldn't be uploaded; the others were kept."""
+
+
+def encode(image, fmt):
+    encoder, options = ENCODERS[fmt]
+    if fmt == 'jpeg' and image.mode != 'RGB':
+        image = image.convert('RGB')
+    buffer = io.BytesIO()
+    image.save(buffer, encoder, **options)
+    return buffer.getvalue()
+
+
+def generate_renditions(field_file, force=False):
+    """
+    Render ``field_file`` (an ImageFieldFile) at every width and format it
+    has no rendition for yet and return the ImageRendition rows created.
+    With ``force`` every rendition is made again. Raises RenditionError,
+    after recording the rest, if some renditions couldn't be uploaded.
+    """
+    source = field_file.name
+    if not source:
+        return []
+    existing = set() if force else set(
+        ImageRendition.objects.filter(source=source).values_list('width', 'format'))
+    formats = get_formats()
+    # Complete for every configured width: no need to download the original
+    if existing and all((width, fmt) in existing for width in get_widths() for fmt in formats):
+        return []
+
+    storage = field_file.storage
+    with storage.open(source) as f:
+        original = Image.open(f)
+        original = ImageOps.exif_transpose(original)
+        original.load()
+    if original.mode not in ('RGB', 'RGBA'):
+        has_alpha = original.mode in ('LA', 'PA') or 'transparency' in original.info
+        original = original.convert('RGBA' if has_alpha else 'RGB')
+
+    planned = []
+    for width in target_widths(original.width):
+        missing = [fmt for fmt in formats if (width, fmt) not in existing]
+        if not missing:
+            continue
+        height = max(1, round(original.height * width / original.width))
+        resized = original if width == original.width else original.resize((width, height), Image.LANCZOS)
+        for fmt in missing:
+            planned.append((width, height, fmt, encode(resized, fmt)))
+    if not planned:
+        return []
+
+    saved = []
+    with storage.batch(message=f'Add renditions of {os.path.basename(source)}', raise_on_error=False) as batch:
+        for width, height, fmt, data in planned:
+            # With ``force`` the storage picks fresh names next to the old files
+            name = storage.save(rendition_name(source, width, fmt), ContentFile(data))
+            saved.append(ImageRendition(source=source, width=width, height=height, format=fmt,
+                                        file=name, size=len(data)))
+    committed = {result.name for result in batch.results if result.committed}
+    rows = [row for row in saved if row.file.name in committed]
+
+    if rows:
+        ImageRendition.objects.bulk_create(
+            rows,
+            update_conflicts=True,
+            unique_fields=['source', 'width', 'format'],
+            update_fields=['height', 'file', 'size'],
+        )
+        bump_catalog_version()
+    if len(rows) < len(saved):
+        errors = '; '.join(f'{result.name}: {result.error}' for result in batch.failed)
+        raise RenditionError(f"{len(saved) - len(rows)} of {len(saved)} renditions of {source} "
+                             f"could not be uploaded: {errors}")
+    return rows
+
+
+def enqueue_renditions(field_file):
+    """
+    Queue ``field_file`` for the process_image_renditions worker. Images
+    that already have renditions aren't queued again: their job stays
+    queued until the renditions are complete.
+    """
+    if not field_file or ImageRendition.objects.filter(source=field_file.name).exists():
+        return None
+    job, _ = RenditionJob.objects.update_or_create(
+        source=field_file.name,
+        defaults={'status': RenditionJob.STATUS_PENDING, 'attempts': 0,
+                  'next_attempt_at': timezone.now(), 'last_error': ''},
+    )
+    return job
+
+
+def _retry_delay(attempts):
+    """Backoff before the next try: one minute * 2 ** (attempts - 1), capped at an hour."""
+    return timedelta(seconds=min(60 * 2 ** max(attempts - 1, 0), 60 * 60))
+
+
+def claim_jobs(batch_size):
+    """Lease up to ``batch_size`` due jobs to this worker."""
+    now = timezone.now()
+    lease = timedelta(seconds=getattr(settings, 'PRODUCT_IMAGE_RENDITION_LEASE', 10 * 60))
+    with transaction.atomic():
+        jobs = list(
+            RenditionJob.objects.select_for_update(skip_locked=True)
+            .filter(
+                status__in=[RenditionJob.STATUS_PENDING, RenditionJob.STATUS_RUNNING],
+                next_attempt_at__lte=now,
+            )
+            .order_by('next_attempt_at', 'id')[:batch_size]
+        )
+        if jobs:
+            # Jobs left running by a crashed worker become due again once
+            # the lease runs out
+            RenditionJob.objects.filter(id__in=[job.id for job in jobs]).update(
+                status=RenditionJob.STATUS_RUNNING,
+                next_attempt_at=now + lease,
+            )
+    return jobs
+
+
+def process_rendition_jobs(batch_size=10, storage=None):
+    """
+    Claim and render one batch of due jobs, reading the originals from
+    ``storage`` (the product image storage by default). Returns
+    (claimed, done, failed).
+    """
+    jobs = claim_jobs(batch_size)
+    if not jobs:
+        return 0, 0, 0
+
+    field = Product._meta.get_field('image')
+    storage = storage or field.storage
+    max_attempts = getattr(settings, 'PRODUCT_IMAGE_RENDITION_MAX_ATTEMPTS', 5)
+    done = failed = 0
+    for job in jobs:
+        field_file = field.attr_class(None, field, job.source)
+        field_file.storage = storage
+        try:
+            generate_renditions(field_file)
+        except Exception as e:
+            failed += 1
+            job.attempts += 1
+            job.last_error = str(e) or e.__class__.__name__
+            if job.attempts >= max_attempts:
+                job.status = RenditionJob.STATUS_FAILED
+            else:
+                job.status = RenditionJob.STATUS_PENDING
+                job.next_attempt_at = timezone.now() + _retry_delay(job.attempts)
+            logger.warning(f"Renditions of {job.source}, attempt {job.attempts}, failed: {job.last_error}")
+            job.save(update_fields=['attempts', 'last_error', 'status', 'next_attempt_at'])
+        else:
+            done += 1
+            # Unless the image was re-queued (re-uploaded) meanwhile
+            RenditionJob.objects.filter(id=job.id, status=RenditionJob.STATUS_RUNNING).delete()
+    return len(jobs), done, failed
+
+
+def load_srcsets(names):
+    """
+    {source name: {format: "url 320w, url 640w, ..."}} for the images in
+    ``names``, from one query. Images without renditions are absent.
+    """
+    names = {name for name in names if name}
+    if not names:
+        return {}
+    url = url_builder(ImageRendition._meta.get_field('file').storage)
+    by_source = defaultdict(lambda: defaultdict(list))
+    rows = ImageRendition.objects.filter(source__in=names).order_by('width').values_list(
+        'source', 'format', 'width', 'file')
+    for source, fmt, width, name in rows:
+        by_source[source][fmt].append(f'{url(name)} {width}w')
+    return {
+        source: {fmt: ', '.join(entries) for fmt, entries in formats.items()}
+        for source, formats in by_source.items()
+    }
@@ -0,0 +1,44 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, m2m_changed
+from django.dispatch import receiver
+from .models import Category, Size, Product, ProductSize, ProductImage
+from .cache import bump_catalog_version
+from .renditions import enqueue_renditions
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_save, sender=Size)
+@receiver(post_save, sender=Product)
+@receiver(post_save, sender=ProductSize)
+@receiver(post_save, sender=ProductImage)
+@receiver(post_delete, sender=Category)
+@receiver(post_delete, sender=Size)
+@receiver(post_delete, sender=Product)
+@receiver(post_delete, sender=ProductSize)
+@receiver(post_delete, sender=ProductImage)
+def invalidate_catalog_cache(sender, **kwargs):
+    """Bump the catalog version whenever catalog data changes."""
+    # On commit, so the version row isn't locked for the rest of the
+    # transaction (an admin save holds it open across GitHub uploads);
+    # robust, so a failed bump can't fail a change that has committed
+    transaction.on_commit(bump_catalog_version, robust=True)
+
+
+@receiver(m2m_changed, sender=Product.sizes.through)
+def invalidate_catalog_cache_on_sizes(sender, action, **kwargs):
+    """Product.sizes edits don't fire post_save on Product"""
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        transaction.on_commit(bump_catalog_version, robust=True)
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_save, sender=ProductImage)
+def queue_image_renditions(sender, instance, update_fields=None, raw=False, **kwargs):
+    """Queue a newly uploaded image for the process_image_renditions worker"""
+    if raw or not getattr(settings, 'PRODUCT_IMAGE_RENDITIONS_ON_UPLOAD', True):
+        return
+    if not instance.image or (update_fields is not None and 'image' not in update_fields):
+        return
+    # Only inserts a row, committed with the save
+    enqueue_renditions(instance.image)
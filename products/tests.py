@@ -1,3 +1,443 @@
-from django.test import TestCase
+import base64
+import io
+import os
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.core.cache import caches
+from django.core.files.base import ContentFile
+from django.core.files.storage import InMemoryStorage
+from django.db import connection
+from django.db.models import F
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from PIL import Image
+
+from api.products.serializers import ProductListSerializer, ProductSerializer
+from storage.batch import FileResult
+from storage.github_storage import GitHubStorage
+from .cache import bump_catalog_version, get_cache_stats, get_catalog_version
+from .images import image_url, image_urls, url_builder
+from .models import (Category, CatalogVersion, ImageRendition, Product, ProductImage, ProductSize,
+                     RenditionJob, Size)
+from .renditions import RenditionError, generate_renditions, process_rendition_jobs
+
+
+def baseline_url(storage, name):
+    """URL as the image_url properties built it from GitHubStorage.url() before products.images."""
+    path = name.lstrip('/')
+    if storage.base_path and not path.startswith(storage.base_path):
+        path = os.path.join(storage.base_path, path)
+    path = path.replace('\\', '/')
+    url = f"{storage.raw_base}/{path}"
+    backend_url = getattr(settings, 'BACKEND_URL', '')
+    return f"{backend_url.rstrip('/')}{url}" if backend_url else url
+
+
+class ImageURLTests(SimpleTestCase):
+    NAMES = ['products/2026/01/02/jeans.jpg', 'media/products/jeans.jpg', '/products/jeans.jpg',
+             'products\\jeans.jpg', 'mediafile.jpg', 'products/slim jeans.jpg', '']
+
+    def test_urls_match_storage_url(self):
+        for base_path in ['media/', 'media', '']:
+            for backend_url in ['', 'https://api.example.com', 'https://api.example.com/']:
+                with self.subTest(base_path=base_path, backend_url=backend_url), \
+                        self.settings(GITHUB_STORAGE_BASE_PATH=base_path, BACKEND_URL=backend_url), \
+                        mock.patch('storage.github_storage.requests') as requests:
+                    storage = GitHubStorage()
+                    build = url_builder(storage)
+                    files = []
+                    for name in self.NAMES:
+                        field_file = Product(image=name).image
+                        field_file.storage = storage
+                        files.append(field_file)
+                        if name:
+                            self.assertEqual(build(name), baseline_url(storage, name), name)
+                            self.assertEqual(image_url(field_file), baseline_url(storage, name))
+
+                    self.assertEqual(image_urls(files),
+                                     {name: baseline_url(storage, name) for name in self.NAMES if name})
+                    self.assertEqual(image_url(files[-1], 'default.jpg'), 'default.jpg')
+                    self.assertEqual(requests.mock_calls, [])
+
+    def test_builder_follows_setting_changes(self):
+        storage = GitHubStorage()
+        url_builder(storage)
+        with self.settings(BACKEND_URL='https://api.example.com'):
+            self.assertEqual(url_builder(storage)('a.jpg'), baseline_url(storage, 'a.jpg'))
+        self.assertEqual(url_builder(storage)('a.jpg'), baseline_url(storage, 'a.jpg'))
+
+
+class CatalogQueryCountTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name='Jeans', slug='jeans')
+        cls.sizes = [Size.objects.create(name=name, order=order) for order, name in enumerate(['S', 'M', 'L'])]
+
+    def add_products(self, count):
+        for _ in range(count):
+            number = Product.objects.count() + 1
+            product = Product.objects.create(
+                category=self.category, name=f'Jeans {number}', slug=f'jeans-{number}',
+                image=f'products/jeans-{number}.jpg', price='100.00')
+            for size in self.sizes:
+                ProductSize.objects.create(product=product, size=size, stock=size.order)
+            for detail in range(2):
+                image = ProductImage.objects.create(product=product, image=f'products/details/jeans-{number}-{detail}.jpg')
+                ImageRendition.objects.create(source=image.image.name, width=320, height=400, format='webp',
+                                              file=f'products/details/renditions/jeans-{number}-{detail}-320w.webp',
+                                              size=1000)
+            ImageRendition.objects.create(source=product.image.name, width=320, height=400, format='webp',
+                                          file=f'products/renditions/jeans-{number}-320w.webp', size=1000)
+
+    def serialize(self, serializer_class, queryset):
+        with CaptureQueriesContext(connection) as queries:
+            data = serializer_class(queryset, many=True).data
+        return data, len(queries)
+
+    def test_product_queries_do_not_grow_with_products(self):
+        self.add_products(1)
+        _, queries = self.serialize(ProductSerializer, Product.objects.with_catalog_relations())
+        self.add_products(9)
+
+        with self.assertNumQueries(queries):
+            data = ProductSerializer(Product.objects.with_catalog_relations(), many=True).data
+
+        self.assertEqual(len(data), 10)
+        self.assertEqual(len(data[0]['detail_images']), 2)
+        self.assertEqual([size['size']['name'] for size in data[0]['available_sizes']], ['M', 'L'])
+        self.assertIn('webp', data[0]['image_srcset'])
+        self.assertIn('webp', data[0]['detail_images'][0]['image_srcset'])
+
+    def test_product_list_queries_do_not_grow_with_products(self):
+        queryset = Product.objects.with_catalog_relations(detail_images=False)
+        self.add_products(1)
+        _, queries = self.serialize(ProductListSerializer, queryset.all())
+        self.add_products(9)
+
+        with self.assertNumQueries(queries):
+            data = ProductListSerializer(queryset.all(), many=True).data
+
+        self.assertEqual(len(data), 10)
+        self.assertNotIn('detail_images', data[0])
+
+    @override_settings(BACKEND_URL='https://api.example.com/')
+    def test_image_urls_cost_no_queries_and_match_storage_urls(self):
+        self.add_products(3)
+        queryset = Product.objects.with_catalog_relations(detail_images=False)
+        _, queries = self.serialize(ProductListSerializer, queryset.all())
+        storage = Product._meta.get_field('image').storage
+
+        with self.assertNumQueries(queries), mock.patch('storage.github_storage.requests') as requests:
+            data = ProductListSerializer(queryset.all(), many=True).data
+        self.assertEqual(requests.mock_calls, [])
+        with CaptureQueriesContext(connection) as without_urls:
+            ProductListSerializer(queryset.all(), many=True, fields=['id', 'image_srcset']).data
+
+        self.assertEqual(len(without_urls), queries)
+        self.assertEqual([product['image_url'] for product in data],
+                         [baseline_url(storage, product.image.name) for product in queryset.all()])
+
+
+class CatalogCacheTests(TestCase):
+    def setUp(self):
+        caches['default'].clear()
+        self.addCleanup(caches['default'].clear)
+        self.category = Category.objects.create(name='Jeans', slug='jeans')
+        self.size = Size.objects.create(name='M')
+        self.product = Product.objects.create(category=self.category, name='Slim jeans', slug='slim-jeans',
+                                              image='products/slim.jpg', price='100.00')
+        self.list_url = reverse('api_product_list')
+        self.detail_url = reverse('api_product_detail', args=[self.product.id, self.product.slug])
+
+    def names(self):
+        listed = [product['name'] for product in self.client.get(self.list_url).json()]
+        return listed, self.client.get(self.detail_url).json()['name']
+
+    def test_responses_are_cached(self):
+        self.names()
+        self.names()
+
+        self.assertEqual(get_cache_stats()['hits'], 2)
+
+    def test_product_save_invalidates_list_and_detail(self):
+        self.assertEqual(self.names(), (['Slim jeans'], 'Slim jeans'))
+
+        self.product.name = 'Wide jeans'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.save()
+
+        self.assertEqual(self.names(), (['Wide jeans'], 'Wide jeans'))
+
+    def test_catalog_changes_bump_the_version_on_commit(self):
+        changes = {
+            'category': lambda: Category.objects.create(name='Shirts', slug='shirts'),
+            'size': lambda: Size.objects.create(name='XL'),
+            'product sizes': lambda: self.product.sizes.add(self.size),
+            'stock': lambda: ProductSize.objects.create(product=self.product, size=self.size, stock=3),
+            'detail image': lambda: ProductImage.objects.create(product=self.product, image='products/d.jpg'),
+            'delete': lambda: self.product.delete(),
+        }
+        for change, apply in changes.items():
+            with self.subTest(change=change):
+                version = get_catalog_version()
+                with self.captureOnCommitCallbacks() as callbacks:
+                    apply()
+                self.assertEqual(get_catalog_version(), version)
+
+                for callback in callbacks:
+                    callback()
+                self.assertGreater(get_catalog_version(), version)
+
+    def test_version_is_read_from_the_database(self):
+        # A bump made by another process, whose cache this one can't see
+        self.names()
+        Product.objects.filter(pk=self.product.pk).update(name='Wide jeans')
+        CatalogVersion.objects.update(version=F('version') + 1)
+
+        self.assertEqual(self.names(), (['Wide jeans'], 'Wide jeans'))
+
+
+class CatalogETagTests(TestCase):
+    def setUp(self):
+        category = Category.objects.create(name='Jeans', slug='jeans')
+        self.product = Product.objects.create(category=category, name='Slim jeans', slug='slim-jeans',
+                                              image='products/slim.jpg', price='100.00')
+        self.url = reverse('api_product_list')
+
+    def test_unchanged_catalog_is_not_modified(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url, headers={'If-None-Match': response['ETag']})
+        self.assertEqual(response.status_code, 304)
+
+    def test_changed_catalog_is_sent_again(self):
+        etag = self.client.get(self.url)['ETag']
+        self.product.price = '120.00'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.save()
+
+        response = self.client.get(self.url, headers={'If-None-Match': etag})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.json()[0]['price'], '120.00')
+
+    def test_etag_depends_on_the_query(self):
+        etag = self.client.get(self.url)['ETag']
+
+        response = self.client.get(self.url, {'fields': 'id,name'}, headers={'If-None-Match': etag})
+
+        self.assertEqual(response.status_code, 200)
+
+
+class ProductListPaginationTests(TestCase):
+    def setUp(self):
+        caches['default'].clear()
+        self.addCleanup(caches['default'].clear)
+        self.category = Category.objects.create(name='Jeans', slug='jeans')
+        self.url = reverse('api_product_list')
+        # Several products share a name; pages must split them by id
+        for name in ['Wide jeans', 'Jeans', 'Jeans', 'Jeans', 'Boot cut', 'Jeans', 'Slim jeans']:
+            self.add_product(name)
+
+    def add_product(self, name):
+        number = Product.objects.count() + 1
+        return Product.objects.create(category=self.category, name=name, slug=f'jeans-{number}',
+                                      image=f'products/jeans-{number}.jpg', price='100.00')
+
+    def ordered(self):
+        return list(Product.objects.order_by('name', 'id').values_list('id', flat=True))
+
+    def pages(self, url, during=None):
+        ids = []
+        while url:
+            body = self.client.get(url).json()
+            ids.extend(product['id'] for product in body['results'])
+            url = body['next']
+            if during and url:
+                during()
+                during = None
+        return ids
+
+    def test_pages_cover_equal_names_once_in_order(self):
+        expected = self.ordered()
+
+        for limit in [1, 2, 3, 7]:
+            with self.subTest(limit=limit):
+                self.assertEqual(self.pages(f'{self.url}?limit={limit}'), expected)
+
+    def test_rows_added_before_the_cursor_do_not_shift_later_pages(self):
+        expected = self.ordered()
+
+        ids = self.pages(f'{self.url}?limit=3&fields=id,name', during=lambda: self.add_product('A-line jeans'))
+
+        self.assertEqual(ids, expected)
+
+    def test_bad_cursors_are_not_found(self):
+        def token(value):
+            return base64.urlsafe_b64encode(value.encode('utf-8')).decode('ascii')
+
+        for cursor in ['not-base64!', 'é', token('not json'), token('[]'), token('["Jeans"]'),
+                       token('["Jeans", 1, 2]'), token('["Jeans", "one"]'), token('["Jeans", null]'),
+                       token('{"name": "Jeans"}'), token('5'), token('["Jeans", 1e400]'), token('["Jeans", 1.5]'),
+                       token('[null, 1]'), token('["Jeans", 100000000000000000000]')]:
+            with self.subTest(cursor=cursor):
+                response = self.client.get(self.url, {'cursor': cursor})
+                self.assertEqual(response.status_code, 404)
+                self.assertEqual(response.json(), {'detail': 'Invalid cursor'})
+
+    def test_limit_is_bounded(self):
+        Product.objects.bulk_create([
+            Product(category=self.category, name=f'Jeans {number:03}', slug=f'bulk-{number}', price='100.00')
+            for number in range(110)
+        ])
+
+        for limit, size in [('5', 5), ('100', 100), ('1000', 100), ('0', 24), ('-3', 24), ('abc', 24), ('', 24)]:
+            with self.subTest(limit=limit):
+                body = self.client.get(self.url, {'limit': limit}).json()
+                self.assertEqual(len(body['results']), size)
+                self.assertIsNotNone(body['next'])
+
+    def test_unknown_fields_are_ignored(self):
+        for fields, keys in [('id,name,colour', {'id', 'name'}), (' id , ,price ', {'id', 'price'}),
+                             ('colour', set())]:
+            with self.subTest(fields=fields):
+                response = self.client.get(self.url, {'fields': fields, 'limit': 2})
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual([set(product) for product in response.json()['results']], [keys, keys])
+
+    def test_list_without_pagination_params_is_unchanged(self):
+        response = self.client.get(self.url)
+
+        self.assertEqual(len(response.json()), 7)
+        self.assertIn('description', response.json()[0])
+
+
+class FakeBatch:
+    def __init__(self, storage):
+        self.storage = storage
+        self.results = []
+
+    def __enter__(self):
+        self.storage.active_batch = self
+        return self
+
+    def __exit__(self, *exc_info):
+        self.storage.active_batch = None
+        return False
+
+    @property
+    def failed(self):
+        return [result for result in self.results if not result.committed]
+
+
+class BatchingMemoryStorage(InMemoryStorage):
+    """In-memory storage with GitHubStorage's batch(); names ending in one of ``fail`` don't upload."""
+
+    def __init__(self):
+        super().__init__()
+        self.fail = ()
+        self.active_batch = None
+
+    def batch(self, message=None, concurrency=None, raise_on_error=True):
+        return FakeBatch(self)
+
+    def _save(self, name, content):
+        if self.active_batch is None:
+            return super()._save(name, content)
+        result = FileResult(name, name, content.size)
+        if self.fail and name.endswith(self.fail):
+            result.error = 'upload failed'
+        else:
+            name = super()._save(name, content)
+            result.sha = '0' * 40
+        self.active_batch.results.append(result)
+        return name
+
+
+@override_settings(PRODUCT_IMAGE_WIDTHS=(320, 640, 1024), PRODUCT_IMAGE_FORMATS=('webp', 'jpeg'),
+                   PRODUCT_IMAGE_RENDITIONS_ON_UPLOAD=True)
+class RenditionTests(TestCase):
+    def setUp(self):
+        self.storage = BatchingMemoryStorage()
+        self.category = Category.objects.create(name='Jeans', slug='jeans')
+
+    def upload(self, width, name='products/jeans.png'):
+        buffer = io.BytesIO()
+        Image.new('RGB', (width, width // 2), 'navy').save(buffer, 'PNG')
+        return self.storage.save(name, ContentFile(buffer.getvalue()))
+
+    def field_file(self, name):
+        field_file = Product(image=name).image
+        field_file.storage = self.storage
+        return field_file
+
+    def renditions(self, name):
+        return set(ImageRendition.objects.filter(source=name).values_list('width', 'format'))
+
+    def test_only_missing_renditions_are_rendered(self):
+        name = self.upload(800)
+        self.storage.fail = ('-640w.webp',)
+
+        with self.assertRaises(RenditionError):
+            generate_renditions(self.field_file(name))
+        self.assertEqual(self.renditions(name), {(320, 'webp'), (320, 'jpeg'), (640, 'jpeg')})
+
+        self.storage.fail = ()
+        rows = generate_renditions(self.field_file(name))
+
+        self.assertEqual([(row.width, row.format) for row in rows], [(640, 'webp')])
+        self.assertEqual(len(self.renditions(name)), 4)
+
+    def test_complete_image_is_not_downloaded_again(self):
+        name = self.upload(1200)
+        self.assertEqual(len(generate_renditions(self.field_file(name))), 6)
+
+        with mock.patch.object(self.storage, 'open', side_effect=AssertionError('downloaded')):
+            self.assertEqual(generate_renditions(self.field_file(name)), [])
+
+    def test_upload_queues_a_job_instead_of_rendering(self):
+        name = self.upload(800)
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            Product.objects.create(category=self.category, name='Jeans', slug='jeans', image=name, price='100.00')
+
+        # Only the catalog version bump; nothing is rendered on commit
+        self.assertEqual(callbacks, [bump_catalog_version])
+        self.assertEqual(self.renditions(name), set())
+        self.assertEqual(process_rendition_jobs(storage=self.storage), (1, 1, 0))
+        self.assertEqual(len(self.renditions(name)), 4)
+        self.assertFalse(RenditionJob.objects.exists())
+
+    def test_partly_failed_job_is_retried(self):
+        name = self.upload(800)
+        Product.objects.create(category=self.category, name='Jeans', slug='jeans', image=name, price='100.00')
+        self.storage.fail = ('.webp',)
+
+        self.assertEqual(process_rendition_jobs(storage=self.storage), (1, 0, 1))
+        job = RenditionJob.objects.get(source=name)
+        self.assertEqual((job.status, job.attempts), (RenditionJob.STATUS_PENDING, 1))
+        self.assertGreater(job.next_attempt_at, timezone.now())
+        # Not due yet
+        self.assertEqual(process_rendition_jobs(storage=self.storage), (0, 0, 0))
+
+        self.storage.fail = ()
+        RenditionJob.objects.update(next_attempt_at=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(process_rendition_jobs(storage=self.storage), (1, 1, 0))
+        self.assertEqual(len(self.renditions(name)), 4)
+        self.assertFalse(RenditionJob.objects.exists())
+
+    @override_settings(PRODUCT_IMAGE_RENDITION_MAX_ATTEMPTS=1)
+    def test_job_fails_after_max_attempts(self):
+        Product.objects.create(category=self.category, name='Jeans', slug='jeans',
+                               image='products/missing.png', price='100.00')
+
+        self.assertEqual(process_rendition_jobs(storage=self.storage), (1, 0, 1))
+        job = RenditionJob.objects.get()
+        self.assertEqual(job.status, RenditionJob.STATUS_FAILED)
+        self.assertTrue(job.last_error)
@@ -2,7 +2,10 @@ from django.contrib import admin
 from django.utils.html import format_html
 from django.urls import reverse
 from django.utils.safestring import mark_safe
-from .models import BostaShipment, BostaTrackingEvent, BostaSettings, BostaPickupRequest
+from .models import (
+    BostaShipment, BostaTrackingEvent, BostaSettings, BostaPickupRequest, BostaWebhookEvent,
+    BostaCity, BostaZone,
+)
 
 
 @admin.register(BostaSettings)
@@ -197,4 +200,42 @@ class BostaTrackingEventAdmin(admin.ModelAdmin):
         return False  # Events are created via webhooks only
 
     def has_change_permission(self, request, obj=None):
-        return False  # Events should not be modified 
\ No newline at end of file
+        return False  # Events should not be modified 
+
+
+@admin.register(BostaWebhookEvent)
+class BostaWebhookEventAdmin(admin.ModelAdmin):
+    list_display = ('tracking_number', 'event_time', 'status', 'attempts', 'received_at', 'processed_at')
+    list_filter = ('status', 'received_at')
+    search_fields = ('tracking_number',)
+    readonly_fields = ('dedup_key', 'tracking_number', 'payload', 'event_time', 'received_at',
+                       'attempts', 'last_error', 'processed_at')
+    actions = ['requeue_events']
+
+    def requeue_events(self, request, queryset):
+        updated = queryset.exclude(status='pending').update(status='pending', attempts=0, last_error='')
+        self.message_user(request, f'{updated} webhook events re-queued.')
+    requeue_events.short_description = "Re-queue selected webhook events"
+
+
+class BostaZoneInline(admin.TabularInline):
+    model = BostaZone
+    extra = 0
+    fields = ('name', 'name_ar', 'drop_off_available', 'pickup_available', 'is_active')
+    readonly_fields = fields
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(BostaCity)
+class BostaCityAdmin(admin.ModelAdmin):
+    list_display = ('name', 'name_ar', 'code', 'drop_off_available', 'pickup_available', 'is_active', 'refreshed_at')
+    list_filter = ('is_active', 'drop_off_available')
+    search_fields = ('name', 'name_ar', 'code')
+    readonly_fields = ('bosta_id', 'code', 'name', 'name_ar', 'drop_off_available', 'pickup_available',
+                       'is_active', 'raw_data', 'refreshed_at')
+    inlines = [BostaZoneInline]
+
+    def has_add_permission(self, request):
+        return False  # Populated by refresh_bosta_cities
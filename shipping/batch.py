@@ -0,0 +1,198 @@
+"""
+Batched shipment creation for orders without a Bosta shipment.
+
+create_shipments() replaces creating shipments one order at a time:
+
+1. orders are loaded in one query; COD amounts are their stored totals;
+2. the shipment rows are written with one bulk_create;
+3. payloads are built in memory (city data comes from shipping.catalogue)
+   and, with ``submit``, POSTed from a bounded, rate-limited thread pool;
+4. responses are applied in batches: one bulk_update of the shipments and
+   one bulk_create of their 'created' tracking events per batch.
+
+A failed submission leaves its shipment pending, as create_shipment()
+does, and is reported per order. With ``dry_run`` only steps 1 and 3 run
+(without submitting), so the report shows what would happen and how long
+preparation takes.
+"""
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_save
+from django.utils import timezone
+from .http import RateLimiter
+from .models import BostaShipment, BostaTrackingEvent
+from .services import BostaService, BostaAPIError
+
+logger = logging.getLogger(__name__)
+
+UPDATE_FIELDS = ['bosta_tracking_number', 'bosta_delivery_id', 'bosta_response_data', 'status', 'updated']
+
+
+class CreateReport:
+    """Outcome and timing of one batch run."""
+
+    def __init__(self, total):
+        self.total = total
+        self.created = 0
+        self.submitted = 0
+        self.skipped = 0
+        self.failed = 0
+        self.errors = {}
+        self.latencies = []
+        self.timings = {}
+        # Unsaved shipments, filled by dry runs
+        self.planned = []
+
+    def latency_percentile(self, percentile):
+        if not self.latencies:
+            return 0.0
+        ordered = sorted(self.latencies)
+        index = min(len(ordered) - 1, int(round(percentile / 100 * (len(ordered) - 1))))
+        return ordered[index]
+
+    def summary(self):
+        phases = ', '.join(f'{name} {seconds * 1000:.0f}ms' for name, seconds in self.timings.items())
+        text = (
+            f'{self.created} shipment records, {self.submitted} submitted to Bosta, '
+            f'{self.failed} failed, {self.skipped} skipped, {self.total} orders ({phases})'
+        )
+        if self.latencies:
+            text += (
+                f'; latency p50 {self.latency_percentile(50) * 1000:.0f}ms, '
+                f'p95 {self.latency_percentile(95) * 1000:.0f}ms'
+            )
+        return text
+
+
+class _Phase:
+    def __init__(self, report, name):
+        self.report = report
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc):
+        self.report.timings[self.name] = self.report.timings.get(self.name, 0.0) + time.perf_counter() - self.start
+
+
+def new_shipment(order):
+    """Unsaved BostaShipment for ``order``, as create_shipment_for_order builds it."""
+    delivery_type = 20 if not order.paid else 10  # COD if not paid, regular delivery if paid
+    cod_amount = order.get_total_cost_with_shipping() if delivery_type == 20 else None
+    return BostaShipment(order=order, delivery_type=delivery_type, cod_amount=cod_amount, status='pending')
+
+
+def _submit(service, limiter, shipment, payload):
+    """Runs in a worker thread: (shipment, response, error, latency)."""
+    limiter.acquire()
+    start = time.perf_counter()
+    try:
+        response, error = service.submit_shipment(payload), None
+    except BostaAPIError as e:
+        response, error = None, str(e)
+    except Exception as e:
+        logger.error(f"Unexpected error creating shipment for Order #{shipment.order_id}: {str(e)}")
+        response, error = None, str(e)
+    return shipment, response, error, time.perf_counter() - start
+
+
+def _apply_batch(service, results, report):
+    now = timezone.now()
+    changed = []
+    events = []
+    for shipment, response, error, latency in results:
+        report.latencies.append(latency)
+        if error or not response:
+            report.failed += 1
+            report.errors[shipment.order_id] = error or 'Empty response from Bosta'
+            continue
+        events.append(service.apply_created_shipment(shipment, response))
+        # bulk_update() skips auto_now
+        shipment.updated = now
+        changed.append(shipment)
+
+    with transaction.atomic():
+        BostaShipment.objects.bulk_update(changed, UPDATE_FIELDS)
+        BostaTrackingEvent.objects.bulk_create(events)
+        for shipment in changed:
+            post_save.send(
+                sender=BostaShipment,
+                instance=shipment,
+                created=False,
+                update_fields=frozenset(UPDATE_FIELDS),
+                raw=False,
+                using=shipment._state.db,
+            )
+    report.submitted += len(changed)
+
+
+def create_shipments(queryset, submit=True, dry_run=False, concurrency=None, rate_limit=None,
+                     batch_size=100, service=None):
+    """
+    Create shipments for the orders in ``queryset`` and return a CreateReport.
+
+    ``submit`` also creates them in Bosta. ``concurrency`` and
+    ``rate_limit`` (requests per second) default to BOSTA_SYNC_CONCURRENCY
+    and BOSTA_SYNC_RATE_LIMIT, the budget shared with tracking sync.
+    """
+    if concurrency is None:
+        concurrency = getattr(settings, 'BOSTA_SYNC_CONCURRENCY', 8)
+    if rate_limit is None:
+        rate_limit = getattr(settings, 'BOSTA_SYNC_RATE_LIMIT', None)
+
+    report = CreateReport(0)
+    with _Phase(report, 'preload'):
+        orders = list(queryset)
+    report.total = len(orders)
+    if not orders:
+        return report
+
+    service = service or BostaService()
+    shipments = [new_shipment(order) for order in orders]
+
+    if dry_run:
+        with _Phase(report, 'build'):
+            for shipment in shipments:
+                service.build_shipment_payload(shipment)
+        report.planned = shipments
+        return report
+
+    with _Phase(report, 'write'):
+        with transaction.atomic():
+            # An order may have been given a shipment since it was loaded
+            taken = set(BostaShipment.objects.filter(
+                order_id__in=[order.id for order in orders]).values_list('order_id', flat=True))
+            report.skipped = len(taken)
+            shipments = [shipment for shipment in shipments if shipment.order_id not in taken]
+            BostaShipment.objects.bulk_create(shipments)
+            for shipment in shipments:
+                post_save.send(sender=BostaShipment, instance=shipment, created=True,
+                               update_fields=None, raw=False, using=shipment._state.db)
+    report.created = len(shipments)
+    if not submit or not shipments:
+        return report
+
+    with _Phase(report, 'build'):
+        payloads = [service.build_shipment_payload(shipment) for shipment in shipments]
+
+    limiter = RateLimiter(rate_limit)
+    pending = []
+    with _Phase(report, 'submit'):
+        with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+            futures = [pool.submit(_submit, service, limiter, shipment, payload)
+                       for shipment, payload in zip(shipments, payloads)]
+            for future in as_completed(futures):
+                pending.append(future.result())
+                if len(pending) >= batch_size:
+                    _apply_batch(service, pending, report)
+                    pending = []
+        if pending:
+            _apply_batch(service, pending, report)
+
+    logger.info(f"Bosta batch shipment creation: {report.summary()}")
+    return report
@@ -0,0 +1,280 @@
+"""
+Local catalogue of Bosta cities and zones.
+
+refresh_catalogue() (run by the refresh_bosta_cities command) downloads
+Bosta's city list and each city's zones and upserts them into BostaCity /
+BostaZone. Cities and zones Bosta no longer lists are kept but marked
+inactive.
+
+Request-time code never calls the cities API. get_catalogue() returns an
+in-process snapshot of the tables:
+
+- a fresh snapshot (younger than BOSTA_CATALOGUE_TTL) is returned as is;
+- a stale one (up to BOSTA_CATALOGUE_STALE_TTL past the TTL) is still
+  returned immediately while one background thread reloads it from the
+  database (stale-while-revalidate);
+- with no snapshot, or one older than that, the caller loads it.
+
+validate_governorates() checks every governorate stored on orders and
+shipping rates against the resolver and the catalogue in one pass.
+"""
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Count
+from django.utils import timezone
+from .cities import get_resolver, normalize
+from .http import RateLimiter
+from .models import BostaCity, BostaZone
+
+logger = logging.getLogger(__name__)
+
+CITY_FIELDS = ['code', 'name', 'name_ar', 'drop_off_available', 'pickup_available',
+               'is_active', 'raw_data', 'refreshed_at']
+ZONE_FIELDS = ['city', 'name', 'name_ar', 'drop_off_available', 'pickup_available',
+               'is_active', 'refreshed_at']
+
+
+class Catalogue:
+    """Immutable snapshot of the active cities and zones."""
+
+    def __init__(self, cities, zones):
+        self.cities = {}
+        self.zones = {}
+        city_codes = {}
+        for city in cities:
+            if city['code']:
+                self.cities[city['code']] = city
+                city_codes[city['id']] = city['code']
+        for zone in zones:
+            code = city_codes.get(zone['city_id'])
+            if code is None:
+                continue
+            by_name = self.zones.setdefault(code, {})
+            for name in (zone['name'], zone['name_ar']):
+                key = normalize(name)
+                if key:
+                    by_name.setdefault(key, zone)
+        self.loaded_at = time.monotonic()
+
+    def __bool__(self):
+        return bool(self.cities)
+
+    def city(self, code):
+        """Catalogue row (dict) for a Bosta city code, or None."""
+        return self.cities.get(code)
+
+    def zone(self, code, text):
+        """Zone of city ``code`` whose English or Arabic name matches ``text``, or None."""
+        return self.zones.get(code, {}).get(normalize(text))
+
+    def api_cities(self):
+        """Cities in the shape the Bosta cities API returns them."""
+        return [city['raw_data'] or {'code': code, 'name': city['name'], 'nameAr': city['name_ar']}
+                for code, city in self.cities.items()]
+
+
+def load_catalogue():
+    cities = BostaCity.objects.filter(is_active=True).values(
+        'id', 'code', 'name', 'name_ar', 'drop_off_available', 'raw_data')
+    zones = BostaZone.objects.filter(is_active=True, city__is_active=True).values(
+        'city_id', 'name', 'name_ar', 'drop_off_available')
+    return Catalogue(list(cities), list(zones))
+
+
+_lock = threading.Lock()
+_snapshot = None
+_revalidating = False
+
+
+def _revalidate():
+    global _snapshot, _revalidating
+    try:
+        _snapshot = load_catalogue()
+    except Exception as e:
+        logger.error(f"Failed to reload Bosta catalogue: {str(e)}")
+    finally:
+        _revalidating = False
+        # Threads get their own connection; don't leave it open
+        connection.close()
+
+
+def get_catalogue():
+    """The current Catalogue snapshot (see module docstring for freshness)."""
+    global _snapshot, _revalidating
+    ttl = getattr(settings, 'BOSTA_CATALOGUE_TTL', 15 * 60)
+    stale_ttl = getattr(settings, 'BOSTA_CATALOGUE_STALE_TTL', 24 * 60 * 60)
+
+    snapshot = _snapshot
+    age = time.monotonic() - snapshot.loaded_at if snapshot is not None else None
+    if age is not None and age < ttl:
+        return snapshot
+
+    if age is not None and age < ttl + stale_ttl:
+        with _lock:
+            if not _revalidating:
+                _revalidating = True
+                threading.Thread(target=_revalidate, name='bosta-catalogue', daemon=True).start()
+        return snapshot
+
+    with _lock:
+        # Another thread may have loaded it while we waited
+        if _snapshot is snapshot:
+            _snapshot = load_catalogue()
+        return _snapshot
+
+
+def invalidate_catalogue():
+    """Drop this process's snapshot; the next get_catalogue() reloads it."""
+    global _snapshot
+    _snapshot = None
+
+
+def _city_row(data, now):
+    return BostaCity(
+        bosta_id=data['_id'],
+        code=data.get('code') or '',
+        name=data.get('name') or '',
+        name_ar=data.get('nameAr') or '',
+        drop_off_available=data.get('dropOffAvailability', True),
+        pickup_available=data.get('pickupAvailability', True),
+        is_active=True,
+        raw_data=data,
+        refreshed_at=now,
+    )
+
+
+def _zone_row(data, city, now):
+    return BostaZone(
+        bosta_id=data['_id'],
+        city=city,
+        name=data.get('name') or '',
+        name_ar=data.get('nameAr') or '',
+        drop_off_available=data.get('dropOffAvailability', True),
+        pickup_available=data.get('pickupAvailability', True),
+        is_active=True,
+        refreshed_at=now,
+    )
+
+
+def refresh_catalogue(service=None, zones=True, concurrency=4, rate_limit=None):
+    """
+    Download cities (and, with ``zones``, every city's zones) from Bosta
+    and upsert them. Returns a dict of counts. Raises BostaAPIError if the
+    city list can't be fetched; a city whose zones fail keeps its old ones.
+    """
+    from .services import BostaService
+
+    service = service or BostaService()
+    now = timezone.now()
+    city_data = [data for data in service.fetch_cities() if data.get('_id')]
+    counts = {'cities': len(city_data), 'zones': 0, 'zone_errors': 0, 'deactivated': 0}
+
+    zone_data = {}
+    if zones and city_data:
+        limiter = RateLimiter(rate_limit if rate_limit is not None
+                              else getattr(settings, 'BOSTA_SYNC_RATE_LIMIT', None))
+
+        def fetch(city_id):
+            limiter.acquire()
+            try:
+                return city_id, service.fetch_zones(city_id)
+            except Exception as e:
+                logger.error(f"Failed to fetch zones for Bosta city {city_id}: {str(e)}")
+                return city_id, None
+
+        with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+            zone_data = dict(pool.map(fetch, [data['_id'] for data in city_data]))
+
+    with transaction.atomic():
+        BostaCity.objects.bulk_create(
+            [_city_row(data, now) for data in city_data],
+            update_conflicts=True,
+            unique_fields=['bosta_id'],
+            update_fields=CITY_FIELDS,
+        )
+        counts['deactivated'] += BostaCity.objects.filter(is_active=True).exclude(
+            bosta_id__in=[data['_id'] for data in city_data]).update(is_active=False)
+
+        cities = BostaCity.objects.in_bulk([data['_id'] for data in city_data], field_name='bosta_id')
+        rows = []
+        for city_id, items in zone_data.items():
+            if items is None:
+                counts['zone_errors'] += 1
+                continue
+            city = cities[city_id]
+            city_rows = [_zone_row(data, city, now) for data in items if data.get('_id')]
+            counts['deactivated'] += BostaZone.objects.filter(city=city, is_active=True).exclude(
+                bosta_id__in=[row.bosta_id for row in city_rows]).update(is_active=False)
+            rows.extend(city_rows)
+        BostaZone.objects.bulk_create(
+            rows,
+            update_conflicts=True,
+            unique_fields=['bosta_id'],
+            update_fields=ZONE_FIELDS,
+        )
+        counts['zones'] = len(rows)
+
+    invalidate_catalogue()
+    return counts
+
+
+class GovernorateCheck:
+    """Validation result for one distinct stored governorate value."""
+
+    OK = 'ok'
+    APPROXIMATE = 'approximate'  # only a fuzzy match (probably a misspelling); shipments fall back to Cairo
+    UNRESOLVED = 'unresolved'  # shipments would fall back to Cairo
+    NOT_IN_CATALOGUE = 'not_in_catalogue'
+    NO_DROP_OFF = 'no_drop_off'
+
+    __slots__ = ('name', 'orders', 'rates', 'code', 'problem')
+
+    def __init__(self, name, orders=0, rates=0, code=None, problem=OK):
+        self.name = name
+        self.orders = orders
+        self.rates = rates
+        self.code = code
+        self.problem = problem
+
+    def __repr__(self):
+        return f'<GovernorateCheck {self.name!r} {self.code} {self.problem}>'
+
+
+def validate_governorates(catalogue=None):
+    """
+    Check every distinct governorate on orders and GovernorateShipping
+    rows. Returns GovernorateCheck objects, problems first.
+    """
+    from orders.models import GovernorateShipping, Order
+
+    catalogue = catalogue if catalogue is not None else get_catalogue()
+    resolver = get_resolver()
+
+    checks = {}
+    for row in Order.objects.exclude(governorate__isnull=True).exclude(governorate='').values('governorate').annotate(count=Count('id')):
+        checks[row['governorate']] = GovernorateCheck(row['governorate'], orders=row['count'])
+    for name in GovernorateShipping.objects.values_list('name', flat=True):
+        checks.setdefault(name, GovernorateCheck(name)).rates += 1
+
+    for check in checks.values():
+        city = resolver.resolve(check.name, fuzzy=False)
+        if city is None:
+            city = resolver.resolve(check.name)
+            check.problem = GovernorateCheck.APPROXIMATE if city else GovernorateCheck.UNRESOLVED
+        if city is None:
+            continue
+        check.code = city.code
+        # An empty catalogue (never refreshed) can't disprove anything
+        if catalogue:
+            entry = catalogue.city(city.code)
+            if entry is None:
+                check.problem = GovernorateCheck.NOT_IN_CATALOGUE
+            elif not entry['drop_off_available']:
+                check.problem = GovernorateCheck.NO_DROP_OFF
+
+    return sorted(checks.values(), key=lambda check: (check.problem == GovernorateCheck.OK, check.name))
@@ -0,0 +1,198 @@
+"""
+Resolution of free-text governorate / city input to Bosta cities.
+
+The alias table lives in shipping/data/bosta_cities.json (Bosta city code,
+Bosta's exact Arabic name, English name and English/Arabic aliases). It is
+loaded once per process into a CityResolver, which answers in this order:
+
+1. exact lookup of the normalized input in a hash table of every alias;
+2. exact lookup of word windows of the input, from the end and longest
+   first, so addresses such as "12 Tahrir St, Dokki, Giza" resolve;
+3. fuzzy match: character trigrams of the input and of its word windows
+   are scored against a precomputed trigram -> alias index (Dice
+   coefficient), accepting the best alias above CITY_MATCH_THRESHOLD.
+
+Normalization lowercases, folds separators, and folds Arabic letter variants
+(alef forms, taa marbuta, alef maqsura, diacritics), so most spellings hit
+step 1. Results are memoized with an LRU cache.
+
+Shipments (resolve_city) use steps 1 and 2 only: trigram scores of a wrong
+governorate ("north coast" -> North Sinai) are as high as those of a typo,
+so a fuzzy hit would send parcels to the wrong place without anyone
+noticing. Input that doesn't match falls back to DEFAULT_CITY_CODE with a
+warning naming the closest fuzzy match; check_governorates (catalogue.py)
+reports such names ahead of time.
+"""
+import json
+import logging
+import os
+import re
+from collections import defaultdict
+from functools import lru_cache
+
+logger = logging.getLogger(__name__)
+
+DATA_FILE = os.path.join(os.path.dirname(__file__), 'data', 'bosta_cities.json')
+
+DEFAULT_CITY_CODE = 'EG-01'
+CITY_MATCH_THRESHOLD = 0.5
+
+_ARABIC_FOLDS = str.maketrans({
+    'أ': 'ا', 'إ': 'ا', 'آ': 'ا', 'ٱ': 'ا',
+    'ة': 'ه',
+    'ى': 'ي',
+    'ـ': None,  # tatweel
+})
+_ARABIC_DIACRITICS = re.compile('[ً-ْٰ]')
+_SEPARATORS = re.compile(r'[\s_\-,./\\|()،؛]+')
+_ARTICLE = re.compile(r'^(?:(?:el|al)\s+|ال)')
+
+
+def normalize(text):
+    """Canonical form used for every lookup key."""
+    if not text:
+        return ''
+    text = _ARABIC_DIACRITICS.sub('', str(text).lower().translate(_ARABIC_FOLDS))
+    return _SEPARATORS.sub(' ', text).strip()
+
+
+def _trigrams(text):
+    padded = f' {text} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class City:
+    __slots__ = ('code', 'name', 'name_ar')
+
+    def __init__(self, code, name, name_ar):
+        self.code = code
+        self.name = name
+        self.name_ar = name_ar
+
+    def __repr__(self):
+        return f'<City {self.code} {self.name}>'
+
+
+class CityResolver:
+    def __init__(self, entries):
+        self.by_code = {}
+        self.exact = {}
+        self.trigram_index = defaultdict(list)
+        self.alias_trigram_counts = []
+
+        for entry in entries:
+            city = City(entry['code'], entry['name'], entry['name_ar'])
+            self.by_code[city.code] = city
+            for alias in [entry['name'], entry['name_ar'], *entry.get('aliases', [])]:
+                for key in self._keys(alias):
+                    self.exact.setdefault(key, city)
+
+        for alias_id, (key, city) in enumerate(self.exact.items()):
+            grams = _trigrams(key)
+            self.alias_trigram_counts.append((city, len(grams)))
+            for gram in grams:
+                self.trigram_index[gram].append(alias_id)
+
+        self.max_window = max((len(key.split()) for key in self.exact), default=1)
+
+    @staticmethod
+    def _keys(alias):
+        """Lookup keys for an alias: as written, without the article, without spaces."""
+        key = normalize(alias)
+        if not key:
+            return []
+        keys = [key, _ARTICLE.sub('', key), key.replace(' ', '')]
+        return list(dict.fromkeys(keys))
+
+    def _exact(self, key):
+        return self.exact.get(key) or self.exact.get(_ARTICLE.sub('', key))
+
+    def _windows(self, key):
+        words = key.split()
+        # Right to left because addresses end with the governorate, and
+        # longest window first at each position so "kafr el sheikh" wins
+        # over "sheikh"
+        for end in range(len(words), 0, -1):
+            for size in range(min(self.max_window, end), 0, -1):
+                city = self.exact.get(' '.join(words[end - size:end]))
+                if city:
+                    return city
+        return None
+
+    def _score(self, text):
+        """Best (score, city) for ``text`` by trigram Dice coefficient."""
+        grams = _trigrams(text)
+        shared = defaultdict(int)
+        for gram in grams:
+            for alias_id in self.trigram_index.get(gram, ()):
+                shared[alias_id] += 1
+        best, best_score = None, 0.0
+        for alias_id, common in shared.items():
+            city, alias_size = self.alias_trigram_counts[alias_id]
+            score = 2 * common / (len(grams) + alias_size)
+            if score > best_score:
+                best, best_score = city, score
+        return best_score, best
+
+    def _fuzzy(self, key):
+        # Score the whole input and each word window; misspelled governorates
+        # usually sit inside a longer address
+        words = key.split()
+        candidates = {key}
+        for size in range(1, min(self.max_window, len(words)) + 1):
+            for start in range(len(words) - size + 1):
+                candidates.add(' '.join(words[start:start + size]))
+        best_score, best = max((self._score(text) for text in candidates), key=lambda result: result[0])
+        return best if best_score >= CITY_MATCH_THRESHOLD else None
+
+    def resolve(self, text, fuzzy=True):
+        """Return the City for ``text`` or None; ``fuzzy=False`` skips step 3."""
+        key = normalize(text)
+        if not key:
+            return None
+        city = self._exact(key) or self._windows(key)
+        if city is None and fuzzy:
+            city = self._fuzzy(key)
+        return city
+
+
+@lru_cache(maxsize=1)
+def get_resolver():
+    with open(DATA_FILE, encoding='utf-8') as f:
+        return CityResolver(json.load(f))
+
+
+@lru_cache(maxsize=4096)
+def find_city(text):
+    """The City ``text`` names exactly (alias or address window), or None."""
+    return get_resolver().resolve(text, fuzzy=False)
+
+
+def resolve_city(text):
+    """
+    Resolve free text to a City for a shipment, falling back to the default
+    (Cairo). Every fallback is logged.
+    """
+    city = find_city(text)
+    if city is not None:
+        return city
+    resolver = get_resolver()
+    city = resolver.by_code[DEFAULT_CITY_CODE]
+    closest = resolver.resolve(text)
+    logger.warning(
+        f"Governorate {text!r} doesn't match a Bosta city; using {city.name} ({city.code})"
+        + (f", closest match {closest.name} ({closest.code})" if closest else '')
+    )
+    return city
+
+
+def canonical_city_name(code):
+    """English name for a Bosta city code (Cairo if unknown)."""
+    resolver = get_resolver()
+    city = resolver.by_code.get(code) or resolver.by_code[DEFAULT_CITY_CODE]
+    return city.name
+
+
+def zone_name(city, governorate):
+    """District sent as the Bosta zone: the customer's city, else their governorate."""
+    return ' '.join((city or '').split()) or ' '.join((governorate or '').split())
@@ -0,0 +1,156 @@
+"""
+Pooled HTTP session for the Bosta API.
+
+Every BostaService shares one requests.Session per process, so calls reuse
+kept-alive TCP/TLS connections instead of paying a handshake per request.
+Its adapter retries with exponential backoff:
+
+- connection failures are retried for every method (nothing was sent);
+- 5xx responses and read timeouts are retried only for idempotent methods,
+  so a POST that may have created a delivery is never sent twice;
+- 429 responses are retried for every method, honouring Retry-After,
+  because a throttled request was not processed.
+
+Per-call latency is recorded in process-local counters (see
+get_request_stats()) and logged. RateLimiter spaces out calls made from
+worker threads.
+
+Settings: BOSTA_HTTP_POOL_SIZE, BOSTA_HTTP_MAX_RETRIES,
+BOSTA_HTTP_BACKOFF_FACTOR and BOSTA_HTTP_TIMEOUT.
+"""
+import re
+import threading
+import time
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+_session = None
+_session_lock = threading.Lock()
+
+_stats = {}
+_stats_lock = threading.Lock()
+
+# Path segments that are identifiers rather than routes, e.g. tracking
+# numbers and delivery ids, so stats group by endpoint
+_ID_SEGMENT = re.compile(r'^(?=.*\d)[\w-]{4,}$')
+
+
+class BostaRetry(Retry):
+    """Retry that also retries non-idempotent methods on 429."""
+
+    def is_retry(self, method, status_code, has_retry_after=False):
+        if status_code == 429:
+            return True
+        return super().is_retry(method, status_code, has_retry_after)
+
+
+def get_timeout():
+    return getattr(settings, 'BOSTA_HTTP_TIMEOUT', 30)
+
+
+def build_session():
+    """Create a session with a pooled, retrying adapter."""
+    pool_size = getattr(settings, 'BOSTA_HTTP_POOL_SIZE', 10)
+    retry = BostaRetry(
+        total=getattr(settings, 'BOSTA_HTTP_MAX_RETRIES', 3),
+        backoff_factor=getattr(settings, 'BOSTA_HTTP_BACKOFF_FACTOR', 0.5),
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=Retry.DEFAULT_ALLOWED_METHODS,
+        respect_retry_after_header=True,
+        # Hand the last response back so BostaService can report it
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+
+    session = requests.Session()
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    session.headers.update({
+        'Content-Type': 'application/json',
+        'Accept': 'application/json',
+    })
+    return session
+
+
+def get_session():
+    """Return the process-wide Bosta session, creating it on first use."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = build_session()
+    return _session
+
+
+def reset_session():
+    """Close and drop the shared session (e.g. after changing settings)."""
+    global _session
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+        _session = None
+
+
+def endpoint_label(method, endpoint):
+    path = endpoint.split('?', 1)[0]
+    segments = [':id' if _ID_SEGMENT.match(segment) else segment for segment in path.split('/')]
+    return f"{method.upper()} {'/'.join(segments)}"
+
+
+def record_request(label, duration, status_code=None):
+    """Add one call to the latency counters; ``status_code`` None means it failed to complete."""
+    ms = duration * 1000
+    with _stats_lock:
+        entry = _stats.setdefault(label, {'count': 0, 'errors': 0, 'total_ms': 0.0, 'max_ms': 0.0})
+        entry['count'] += 1
+        entry['total_ms'] += ms
+        entry['max_ms'] = max(entry['max_ms'], ms)
+        if status_code is None or status_code >= 400:
+            entry['errors'] += 1
+
+
+def get_request_stats():
+    """Per-endpoint call count, error count and average / max latency in ms."""
+    with _stats_lock:
+        return {
+            label: {
+                'count': entry['count'],
+                'errors': entry['errors'],
+                'avg_ms': round(entry['total_ms'] / entry['count'], 2),
+                'max_ms': round(entry['max_ms'], 2),
+            }
+            for label, entry in _stats.items()
+        }
+
+
+def reset_request_stats():
+    with _stats_lock:
+        _stats.clear()
+
+
+
+class RateLimiter:
+    """
+    Thread-safe limiter spacing calls at least 1/``rate`` seconds apart.
+    A falsy rate disables limiting.
+    """
+
+    def __init__(self, rate=None):
+        self.interval = 1.0 / rate if rate else 0
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            wait = self._next - now
+            self._next = max(now, self._next) + self.interval
+        if wait > 0:
+            time.sleep(wait)
@@ -0,0 +1,179 @@
+"""
+Webhook inbox for Bosta status updates.
+
+ingest_webhook() is all the webhook view does: it stores the payload under
+a dedup key (a hash of the canonical payload) and returns, so Bosta gets
+its acknowledgement without waiting for shipment updates, order saves or
+emails. Redelivered webhooks hit the unique key and are dropped.
+
+process_pending_webhooks() is run by the process_bosta_webhooks command. It
+applies pending events per shipment in event-time order through
+BostaService.handle_webhook and collapses:
+
+- events older than the newest event already applied for the shipment
+  (out-of-order deliveries);
+- events reporting the state the shipment is already in: its stored status
+  for states that map to one, otherwise the state of the event applied
+  before it in the same run.
+
+Collapsed events are marked skipped. A failed event is retried on the next
+run (up to BOSTA_WEBHOOK_MAX_ATTEMPTS, then marked failed) and holds back
+later events for the same shipment meanwhile. Run a single worker so the
+per-shipment order holds.
+"""
+import hashlib
+import json
+import logging
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Max
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from .models import BostaShipment, BostaWebhookEvent
+from .services import STATE_STATUSES, BostaService
+
+logger = logging.getLogger(__name__)
+
+
+def _dedup_key(payload):
+    raw = json.dumps(payload, sort_keys=True, default=str, separators=(',', ':'))
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+def _event_time(payload, default):
+    """Bosta sends ``timeStamp`` in epoch milliseconds; some payloads use ``updatedAt``."""
+    stamp = payload.get('timeStamp')
+    if isinstance(stamp, (int, float)):
+        return datetime.fromtimestamp(stamp / 1000, tz=dt_timezone.utc)
+    updated_at = payload.get('updatedAt')
+    if isinstance(updated_at, str):
+        parsed = parse_datetime(updated_at)
+        if parsed is not None:
+            return parsed if timezone.is_aware(parsed) else timezone.make_aware(parsed, dt_timezone.utc)
+    return default
+
+
+def _state_key(payload):
+    state = payload.get('state')
+    return json.dumps(state, sort_keys=True, default=str)
+
+
+def _state_status(payload):
+    """The shipment status the payload's state maps to, or None."""
+    state = payload.get('state')
+    return STATE_STATUSES.get(state.get('code')) if isinstance(state, dict) else None
+
+
+def ingest_webhook(payload):
+    """
+    Store a webhook payload. Returns (event, created); ``created`` is False
+    for a duplicate delivery. Raises ValueError without a tracking number.
+    """
+    tracking_number = payload.get('trackingNumber')
+    if not tracking_number:
+        raise ValueError("Webhook received without tracking number")
+
+    dedup_key = _dedup_key(payload)
+    try:
+        with transaction.atomic():
+            event = BostaWebhookEvent.objects.create(
+                dedup_key=dedup_key,
+                tracking_number=str(tracking_number),
+                payload=payload,
+                event_time=_event_time(payload, timezone.now()),
+            )
+        return event, True
+    except IntegrityError:
+        return BostaWebhookEvent.objects.get(dedup_key=dedup_key), False
+
+
+def _mark(event, status, error=''):
+    event.status = status
+    event.last_error = error
+    event.processed_at = timezone.now()
+    event.save(update_fields=['status', 'last_error', 'processed_at', 'attempts'])
+
+
+def process_pending_webhooks(limit=500, service=None):
+    """
+    Apply up to ``limit`` pending webhook events.
+    Returns a dict of counts: processed, skipped, failed, retrying.
+    """
+    counts = {'processed': 0, 'skipped': 0, 'failed': 0, 'retrying': 0}
+    events = list(
+        BostaWebhookEvent.objects.filter(status='pending')
+        .order_by('tracking_number', 'event_time', 'id')[:limit]
+    )
+    if not events:
+        return counts
+
+    service = service or BostaService()
+    max_attempts = getattr(settings, 'BOSTA_WEBHOOK_MAX_ATTEMPTS', 5)
+
+    tracking_numbers = {event.tracking_number for event in events}
+    last_applied = dict(
+        BostaWebhookEvent.objects.filter(tracking_number__in=tracking_numbers, status='processed')
+        .values('tracking_number')
+        .annotate(latest=Max('event_time'))
+        .values_list('tracking_number', 'latest')
+    )
+    # Stored statuses, so a state repeated in a later run is collapsed too
+    current_status = dict(
+        BostaShipment.objects.filter(bosta_tracking_number__in=tracking_numbers)
+        .values_list('bosta_tracking_number', 'status')
+    )
+    last_state = {}
+    blocked = set()
+
+    for event in events:
+        tracking_number = event.tracking_number
+        if tracking_number in blocked:
+            # An earlier event for this shipment is awaiting retry
+            continue
+
+        latest = last_applied.get(tracking_number)
+        if latest is not None and event.event_time < latest:
+            _mark(event, 'skipped', 'Older than an update already applied')
+            counts['skipped'] += 1
+            continue
+
+        state = _state_key(event.payload)
+        status = _state_status(event.payload)
+        if status:
+            repeated = current_status.get(tracking_number) == status
+        else:
+            repeated = last_state.get(tracking_number) == state
+        if repeated:
+            _mark(event, 'skipped', 'Shipment is already in this state')
+            counts['skipped'] += 1
+            continue
+
+        event.attempts += 1
+        try:
+            with transaction.atomic():
+                applied = service.handle_webhook(event.payload)
+        except Exception as e:
+            applied, error = False, str(e)
+        else:
+            error = '' if applied else 'Shipment not found or update failed'
+
+        if applied:
+            _mark(event, 'processed')
+            last_applied[tracking_number] = event.event_time
+            last_state[tracking_number] = state
+            if status:
+                current_status[tracking_number] = status
+            counts['processed'] += 1
+        elif event.attempts >= max_attempts:
+            _mark(event, 'failed', error)
+            counts['failed'] += 1
+        else:
+            # Stay pending; later events for this shipment wait behind it
+            event.last_error = error
+            event.save(update_fields=['attempts', 'last_error'])
+            counts['retrying'] += 1
+            blocked.add(tracking_number)
+            logger.warning(f"Webhook #{event.id} for {tracking_number} failed (attempt {event.attempts}): {error}")
+    return counts
@@ -0,0 +1,97 @@
+import json
+import random
+import time
+from django.core.management.base import BaseCommand
+from shipping.cities import DATA_FILE, CityResolver, find_city, get_resolver, normalize
+
+
+STREETS = [
+    '12 Tahrir St', '5 Abbas El Akkad St', 'Building 14, Gamal Abdel Nasser Rd',
+    'Flat 3, 27 El Nasr St', 'Villa 8, Compound 2', '45 Port Said St',
+    '١٥ شارع التحرير', 'عمارة ٣ شارع الجمهورية', 'شقة ٧ شارع النصر',
+]
+
+
+def _typo(rng, text):
+    """Swap two adjacent letters or drop one, like a hurried customer."""
+    if len(text) < 5:
+        return text
+    i = rng.randrange(1, len(text) - 2)
+    if rng.random() < 0.5:
+        return text[:i] + text[i + 1] + text[i] + text[i + 2:]
+    return text[:i] + text[i + 1:]
+
+
+class Command(BaseCommand):
+    help = 'Benchmark governorate / address resolution to Bosta cities over a generated address corpus'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--count',
+            type=int,
+            default=20000,
+            help='Address strings in the corpus (default: 20000)'
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=42,
+            help='Random seed for the corpus (default: 42)'
+        )
+
+    def handle(self, *args, **options):
+        with open(DATA_FILE, encoding='utf-8') as f:
+            entries = json.load(f)
+
+        start = time.perf_counter()
+        CityResolver(entries)
+        build_ms = (time.perf_counter() - start) * 1000
+
+        corpus = self.build_corpus(entries, options['count'], random.Random(options['seed']))
+        resolver = get_resolver()
+
+        # Uncached: every lookup goes through normalize + hash/n-gram matching
+        start = time.perf_counter()
+        results = [resolver.resolve(text) for text, _, _ in corpus]
+        uncached = time.perf_counter() - start
+
+        # Cached: the LRU wrapper used by BostaService (warm after one pass)
+        find_city.cache_clear()
+        for text, _, _ in corpus:
+            find_city(text)
+        start = time.perf_counter()
+        for text, _, _ in corpus:
+            find_city(text)
+        cached = time.perf_counter() - start
+
+        correct = sum(1 for (_, code, _), city in zip(corpus, results) if city and city.code == code)
+        by_kind = {}
+        for (_, code, kind), city in zip(corpus, results):
+            hits, total = by_kind.get(kind, (0, 0))
+            by_kind[kind] = (hits + (1 if city and city.code == code else 0), total + 1)
+
+        count = len(corpus)
+        self.stdout.write(f'Index build: {build_ms:.1f}ms ({len(resolver.exact)} alias keys)')
+        self.stdout.write(f'Uncached: {uncached * 1e6 / count:.1f}us per lookup')
+        self.stdout.write(f'Cached:   {cached * 1e6 / count:.2f}us per lookup ({find_city.cache_info().currsize} entries)')
+        self.stdout.write(f'Accuracy: {correct / count:.1%} of {count}')
+        for kind, (hits, total) in sorted(by_kind.items()):
+            self.stdout.write(f'  {kind:<12} {hits / total:.1%} of {total}')
+
+    def build_corpus(self, entries, count, rng):
+        """(address, expected code, kind) tuples."""
+        corpus = []
+        for _ in range(count):
+            entry = rng.choice(entries)
+            alias = rng.choice([entry['name'], entry['name_ar'], *entry['aliases']])
+            kind = rng.choice(['exact', 'address', 'typo', 'cased'])
+            if kind == 'exact':
+                text = alias
+            elif kind == 'address':
+                text = f'{rng.choice(STREETS)}, {alias}'
+            elif kind == 'typo':
+                text = _typo(rng, normalize(alias))
+            else:
+                text = f'  {alias.upper()}  '
+            corpus.append((text, entry['code'], kind))
+        return corpus
@@ -1,8 +1,7 @@
 from django.core.management.base import BaseCommand
-from django.db import transaction
 from orders.models import Order
-from shipping.models import BostaShipment
-from shipping.services import BostaOrderIntegration
+from shipping.batch import create_shipments
+from shipping.services import BostaService
 import logging
 
 logger = logging.getLogger(__name__)
@@ -39,125 +38,97 @@ class Command(BaseCommand):
             action='store_true',
             help='Also create shipments in Bosta API (not just database records)'
         )
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            help='Parallel Bosta requests (default: BOSTA_SYNC_CONCURRENCY)'
+        )
+        parser.add_argument(
+            '--rate-limit',
+            type=float,
+            help='Maximum Bosta requests per second (default: BOSTA_SYNC_RATE_LIMIT)'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=100,
+            help='Responses written to the database per batch (default: 100)'
+        )
 
     def handle(self, *args, **options):
         try:
-            integration = BostaOrderIntegration()
+            bosta_service = BostaService()
         except Exception as e:
             self.stdout.write(
-                self.style.ERROR(f'Failed to initialize Bosta integration: {str(e)}')
+                self.style.ERROR(f'Failed to initialize Bosta service: {str(e)}')
             )
             return
 
         # Handle specific order
         if options['order_id']:
-            try:
-                order = Order.objects.get(id=options['order_id'])
-                self.process_order(integration, order, options)
-                return
-            except Order.DoesNotExist:
+            order = Order.objects.filter(id=options['order_id']).select_related('bosta_shipment').first()
+            if order is None:
                 self.stdout.write(
                     self.style.ERROR(f'Order with ID {options["order_id"]} not found')
                 )
                 return
+            if hasattr(order, 'bosta_shipment'):
+                self.stdout.write(
+                    self.style.WARNING(f'Shipment already exists for Order #{order.id}')
+                )
+                return
+            queryset = Order.objects.filter(id=order.id)
+        else:
+            # Get orders without shipments
+            queryset = Order.objects.filter(bosta_shipment__isnull=True)
+
+            if options['status']:
+                queryset = queryset.filter(status=options['status'])
 
-        # Get orders without shipments
-        queryset = Order.objects.filter(
-            bosta_shipment__isnull=True
-        ).select_related('user')
+            # Order by creation date (oldest first)
+            ids = list(queryset.order_by('created').values_list('id', flat=True)[:options['limit']])
+            queryset = Order.objects.filter(id__in=ids).order_by('created')
 
-        if options['status']:
-            queryset = queryset.filter(status=options['status'])
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING('DRY RUN MODE - No shipments will be created'))
 
-        # Order by creation date (oldest first)
-        orders = queryset.order_by('created')[:options['limit']]
-        total_count = orders.count()
+        report = create_shipments(
+            queryset,
+            submit=options['auto_create'],
+            dry_run=options['dry_run'],
+            concurrency=options['concurrency'],
+            rate_limit=options['rate_limit'],
+            batch_size=options['batch_size'],
+            service=bosta_service,
+        )
 
-        if total_count == 0:
+        if report.total == 0:
             self.stdout.write(self.style.SUCCESS('No orders found that need shipments'))
             return
 
-        self.stdout.write(f'Found {total_count} orders without Bosta shipments')
+        self.stdout.write(f'Found {report.total} orders without Bosta shipments')
 
         if options['dry_run']:
-            self.stdout.write(self.style.WARNING('DRY RUN MODE - No shipments will be created'))
-            for order in orders:
-                self.stdout.write(f'Would create shipment for Order #{order.id} ({order.email})')
+            for shipment in report.planned:
+                order = shipment.order
+                kind = f'COD {shipment.cod_amount} LE' if shipment.is_cod_shipment() else 'prepaid'
+                self.stdout.write(f'Would create shipment for Order #{order.id} ({order.email}), {kind}')
+            timings = ', '.join(f'{name} {seconds * 1000:.1f}ms' for name, seconds in report.timings.items())
+            self.stdout.write(f'Prepared {report.total} payloads in {timings}')
             return
 
-        created_count = 0
-        error_count = 0
-
-        for i, order in enumerate(orders, 1):
-            self.stdout.write(f'Processing {i}/{total_count}: Order #{order.id}')
-            
-            try:
-                success = self.process_order(integration, order, options)
-                if success:
-                    created_count += 1
-                else:
-                    error_count += 1
-            except Exception as e:
-                self.stdout.write(
-                    self.style.WARNING(f'Error processing Order #{order.id}: {str(e)}')
-                )
-                error_count += 1
-
-        # Summary
-        self.stdout.write(
-            self.style.SUCCESS(
-                f'Processing complete: {created_count} created, {error_count} errors, {total_count} total'
+        for order_id, error in sorted(report.errors.items()):
+            self.stdout.write(self.style.WARNING(f'  Order #{order_id}: {error}'))
+        if report.skipped:
+            self.stdout.write(
+                self.style.WARNING(f'{report.skipped} orders already had a shipment and were skipped')
             )
-        )
-
-    def process_order(self, integration, order, options):
-        """
-        Process a single order and return success status.
-        """
-        try:
-            # Check if shipment already exists
-            if hasattr(order, 'bosta_shipment'):
-                self.stdout.write(
-                    self.style.WARNING(f'  Shipment already exists for Order #{order.id}')
-                )
-                return False
-
-            with transaction.atomic():
-                # Create shipment record
-                shipment = BostaShipment.objects.create(
-                    order=order,
-                    delivery_type=20 if not order.paid else 10,  # COD if not paid
-                    cod_amount=order.get_total_cost_with_shipping() if not order.paid else None,
-                    status='pending'
-                )
-
-                self.stdout.write(
-                    self.style.SUCCESS(f'  Created shipment record for Order #{order.id}')
-                )
-
-                # Create in Bosta API if requested
-                if options['auto_create']:
-                    try:
-                        result = integration.bosta_service.create_shipment(shipment)
-                        if result:
-                            self.stdout.write(
-                                self.style.SUCCESS(
-                                    f'  Created Bosta shipment: {shipment.bosta_tracking_number}'
-                                )
-                            )
-                        else:
-                            self.stdout.write(
-                                self.style.WARNING(f'  Failed to create in Bosta API')
-                            )
-                    except Exception as e:
-                        self.stdout.write(
-                            self.style.WARNING(f'  Bosta API error: {str(e)}')
-                        )
-
-                return True
 
-        except Exception as e:
+        # Summary
+        style = self.style.WARNING if report.failed else self.style.SUCCESS
+        self.stdout.write(style(f'Processing complete: {report.summary()}'))
+        if report.failed:
             self.stdout.write(
-                self.style.ERROR(f'  Database error: {str(e)}')
+                f'{report.failed} shipment records were saved but not created in Bosta; '
+                'use the "Create shipments in Bosta" admin action to retry them'
             )
-            return False 
\ No newline at end of file
@@ -0,0 +1,56 @@
+import time
+from django.core.management.base import BaseCommand
+from shipping.inbox import process_pending_webhooks
+from shipping.services import BostaService
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Apply pending Bosta webhooks from the inbox, in order per shipment'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=500,
+            help='Events handled per pass (default: 500)'
+        )
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Keep polling for new webhooks instead of exiting once the inbox is drained'
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=5,
+            help='Seconds to sleep between polls when --loop is used (default: 5)'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            bosta_service = BostaService()
+        except Exception as e:
+            self.stdout.write(
+                self.style.ERROR(f'Failed to initialize Bosta service: {str(e)}')
+            )
+            return
+
+        while True:
+            counts = process_pending_webhooks(limit=options['limit'], service=bosta_service)
+            handled = counts['processed'] + counts['skipped'] + counts['failed']
+            if handled or counts['retrying']:
+                self.stdout.write(
+                    f"{counts['processed']} processed, {counts['skipped']} skipped, "
+                    f"{counts['failed']} failed, {counts['retrying']} to retry"
+                )
+            # Keep draining while whole passes are being used up
+            if handled >= options['limit']:
+                continue
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+
+        self.stdout.write(self.style.SUCCESS('Webhook inbox drained'))
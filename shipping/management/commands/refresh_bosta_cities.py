@@ -0,0 +1,63 @@
+from django.core.management.base import BaseCommand
+from shipping.catalogue import GovernorateCheck, refresh_catalogue, validate_governorates
+from shipping.services import BostaService, BostaAPIError
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Download Bosta cities and zones into the local catalogue'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--no-zones',
+            action='store_true',
+            help='Refresh the city list only'
+        )
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=4,
+            help='Parallel zone requests (default: 4)'
+        )
+        parser.add_argument(
+            '--validate',
+            action='store_true',
+            help='Afterwards, check stored governorates against the catalogue'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            bosta_service = BostaService()
+        except Exception as e:
+            self.stdout.write(
+                self.style.ERROR(f'Failed to initialize Bosta service: {str(e)}')
+            )
+            return
+
+        try:
+            counts = refresh_catalogue(
+                service=bosta_service,
+                zones=not options['no_zones'],
+                concurrency=options['concurrency'],
+            )
+        except BostaAPIError as e:
+            self.stdout.write(self.style.ERROR(f'Failed to fetch Bosta cities: {str(e)}'))
+            return
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Catalogue refreshed: {counts['cities']} cities, {counts['zones']} zones, "
+            f"{counts['deactivated']} deactivated"
+        ))
+        if counts['zone_errors']:
+            self.stdout.write(self.style.WARNING(f"Zones could not be fetched for {counts['zone_errors']} cities"))
+
+        if options['validate']:
+            problems = [check for check in validate_governorates() if check.problem != GovernorateCheck.OK]
+            for check in problems:
+                self.stdout.write(
+                    f'{check.name!r}: {check.problem} (code {check.code or "-"}, '
+                    f'{check.orders} orders, {check.rates} rates)'
+                )
+            self.stdout.write(f'{len(problems)} governorate values need attention')
@@ -3,6 +3,8 @@ from django.utils import timezone
 from datetime import timedelta
 from shipping.models import BostaShipment
 from shipping.services import BostaService
+from shipping.schedule import due_filter
+from shipping.sync import sync_tracking
 import logging
 
 logger = logging.getLogger(__name__)
@@ -28,6 +30,27 @@ class Command(BaseCommand):
             action='store_true',
             help='Force sync even for delivered/cancelled shipments'
         )
+        parser.add_argument(
+            '--ignore-schedule',
+            action='store_true',
+            help='Poll every matching shipment, not only those whose next poll is due'
+        )
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            help='Parallel Bosta requests (default: BOSTA_SYNC_CONCURRENCY)'
+        )
+        parser.add_argument(
+            '--rate-limit',
+            type=float,
+            help='Maximum Bosta requests per second (default: BOSTA_SYNC_RATE_LIMIT)'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=100,
+            help='Shipments written per bulk update (default: 100)'
+        )
 
     def handle(self, *args, **options):
         try:
@@ -66,38 +89,42 @@ class Command(BaseCommand):
                 status__in=['delivered', 'cancelled', 'returned']
             )
 
-        shipments = queryset.order_by('-created')
-        total_count = shipments.count()
+        if not options['ignore_schedule'] and not options['force']:
+            # Only shipments whose adaptive poll interval has elapsed
+            queryset = queryset.filter(due_filter())
+
+        shipments = list(queryset.select_related('order').order_by('-created'))
+        total_count = len(shipments)
 
-        self.stdout.write(f'Found {total_count} shipments to sync')
+        self.stdout.write(f'Found {total_count} shipments due for sync')
 
         if total_count == 0:
             self.stdout.write(self.style.SUCCESS('No shipments to sync'))
             return
 
-        updated_count = 0
-        error_count = 0
+        completed = [0]
 
-        for i, shipment in enumerate(shipments, 1):
-            self.stdout.write(f'Syncing {i}/{total_count}: {shipment.bosta_tracking_number}')
-            
-            try:
-                success = self.sync_shipment(bosta_service, shipment)
-                if success:
-                    updated_count += 1
-                else:
-                    error_count += 1
-            except Exception as e:
+        def progress(shipment, error):
+            completed[0] += 1
+            if error:
                 self.stdout.write(
-                    self.style.WARNING(f'Error syncing {shipment.bosta_tracking_number}: {str(e)}')
+                    self.style.WARNING(f'Error syncing {shipment.bosta_tracking_number}: {error}')
                 )
-                error_count += 1
+            else:
+                self.stdout.write(f'Fetched {completed[0]}/{total_count}: {shipment.bosta_tracking_number}')
+
+        report = sync_tracking(
+            shipments,
+            concurrency=options['concurrency'],
+            rate_limit=options['rate_limit'],
+            batch_size=options['batch_size'],
+            service=bosta_service,
+            progress=progress,
+        )
 
         # Summary
         self.stdout.write(
-            self.style.SUCCESS(
-                f'Sync complete: {updated_count} updated, {error_count} errors, {total_count} total'
-            )
+            self.style.SUCCESS(f'Sync complete: {report.summary()}')
         )
 
     def sync_shipment(self, bosta_service, shipment):
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+from shipping.catalogue import GovernorateCheck, get_catalogue, validate_governorates
+
+
+class Command(BaseCommand):
+    help = 'Check every governorate stored on orders and shipping rates against the Bosta catalogue'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='List governorates that validate too'
+        )
+
+    def handle(self, *args, **options):
+        if not get_catalogue():
+            self.stdout.write(self.style.WARNING(
+                'Bosta catalogue is empty; run refresh_bosta_cities. Checking names only.'
+            ))
+
+        checks = validate_governorates()
+        problems = 0
+        for check in checks:
+            if check.problem == GovernorateCheck.OK and not options['all']:
+                continue
+            line = (f'{check.name!r}: {check.problem} (code {check.code or "-"}, '
+                    f'{check.orders} orders, {check.rates} rates)')
+            if check.problem == GovernorateCheck.OK:
+                self.stdout.write(line)
+            else:
+                problems += 1
+                self.stdout.write(self.style.WARNING(line))
+
+        summary = f'{len(checks)} governorate values checked, {problems} need attention'
+        self.stdout.write(self.style.SUCCESS(summary) if not problems else self.style.WARNING(summary))
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.3 on 2026-10-18 00:57
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shipping', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BostaSyncState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_polled_at', models.DateTimeField(blank=True, null=True)),
+                ('last_state_hash', models.CharField(blank=True, max_length=40)),
+                ('unchanged_polls', models.PositiveIntegerField(default=0)),
+                ('next_poll_at', models.DateTimeField(blank=True, db_index=True, null=True)),
+                ('updated', models.DateTimeField(auto_now=True)),
+                ('shipment', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='sync_state', to='shipping.bostashipment')),
+            ],
+            options={
+                'verbose_name': 'Tracking Sync State',
+                'verbose_name_plural': 'Tracking Sync States',
+            },
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.3 on 2026-10-18 00:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shipping', '0002_bostasyncstate'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BostaWebhookEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dedup_key', models.CharField(max_length=64, unique=True)),
+                ('tracking_number', models.CharField(db_index=True, max_length=50)),
+                ('payload', models.JSONField()),
+                ('event_time', models.DateTimeField()),
+                ('received_at', models.DateTimeField(auto_now_add=True)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('processed', 'Processed'), ('skipped', 'Skipped'), ('failed', 'Failed')], default='pending', max_length=20)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('last_error', models.TextField(blank=True)),
+                ('processed_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Webhook Event',
+                'verbose_name_plural': 'Webhook Events',
+                'ordering': ('-received_at',),
+                'indexes': [models.Index(fields=['status', 'tracking_number', 'event_time'], name='shipping_bo_status_371cd8_idx')],
+            },
+        ),
+    ]
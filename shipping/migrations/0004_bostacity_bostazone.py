@@ -0,0 +1,53 @@
+# Generated by Django 5.2.3 on 2026-10-18 01:02
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shipping', '0003_bostawebhookevent'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BostaCity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bosta_id', models.CharField(max_length=50, unique=True)),
+                ('code', models.CharField(blank=True, db_index=True, max_length=20)),
+                ('name', models.CharField(max_length=100)),
+                ('name_ar', models.CharField(blank=True, max_length=100)),
+                ('drop_off_available', models.BooleanField(default=True)),
+                ('pickup_available', models.BooleanField(default=True)),
+                ('is_active', models.BooleanField(default=True)),
+                ('raw_data', models.JSONField(blank=True, help_text='City as returned by the Bosta API', null=True)),
+                ('refreshed_at', models.DateTimeField()),
+            ],
+            options={
+                'verbose_name': 'Bosta City',
+                'verbose_name_plural': 'Bosta Cities',
+                'ordering': ('name',),
+            },
+        ),
+        migrations.CreateModel(
+            name='BostaZone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bosta_id', models.CharField(max_length=50, unique=True)),
+                ('name', models.CharField(max_length=100)),
+                ('name_ar', models.CharField(blank=True, max_length=100)),
+                ('drop_off_available', models.BooleanField(default=True)),
+                ('pickup_available', models.BooleanField(default=True)),
+                ('is_active', models.BooleanField(default=True)),
+                ('refreshed_at', models.DateTimeField()),
+                ('city', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='zones', to='shipping.bostacity')),
+            ],
+            options={
+                'verbose_name': 'Bosta Zone',
+                'verbose_name_plural': 'Bosta Zones',
+                'ordering': ('city', 'name'),
+            },
+        ),
+    ]
@@ -249,4 +249,109 @@ BostaShipment.add_to_class(
         blank=True,
         related_name='shipments'
     )
-) 
\ No newline at end of file
+) 
+
+class BostaSyncState(models.Model):
+    """
+    Polling schedule for one shipment's tracking sync.
+    sync_bosta_tracking only polls shipments whose next_poll_at has passed.
+    """
+    shipment = models.OneToOneField(BostaShipment, on_delete=models.CASCADE, related_name='sync_state')
+    last_polled_at = models.DateTimeField(null=True, blank=True)
+    last_state_hash = models.CharField(max_length=40, blank=True)
+    # Consecutive polls that returned the same state; stretches the interval
+    unchanged_polls = models.PositiveIntegerField(default=0)
+    # Null once the shipment reaches a terminal status
+    next_poll_at = models.DateTimeField(null=True, blank=True, db_index=True)
+    updated = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Tracking Sync State"
+        verbose_name_plural = "Tracking Sync States"
+
+    def __str__(self):
+        return f"{self.shipment.bosta_tracking_number} - next poll {self.next_poll_at or 'never'}"
+
+
+class BostaWebhookEvent(models.Model):
+    """
+    Inbox of received Bosta webhooks.
+    The webhook view only stores the payload and acknowledges; the
+    process_bosta_webhooks worker applies events in order per shipment.
+    """
+    STATUS_CHOICES = (
+        ('pending', 'Pending'),
+        ('processed', 'Processed'),
+        ('skipped', 'Skipped'),
+        ('failed', 'Failed'),
+    )
+
+    # Hash of the payload, so a redelivered webhook is stored only once
+    dedup_key = models.CharField(max_length=64, unique=True)
+    tracking_number = models.CharField(max_length=50, db_index=True)
+    payload = models.JSONField()
+    # When Bosta says the update happened (falls back to received_at)
+    event_time = models.DateTimeField()
+    received_at = models.DateTimeField(auto_now_add=True)
+
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ('-received_at',)
+        verbose_name = "Webhook Event"
+        verbose_name_plural = "Webhook Events"
+        indexes = [
+            models.Index(fields=['status', 'tracking_number', 'event_time']),
+        ]
+
+    def __str__(self):
+        return f"{self.tracking_number} @ {self.event_time} ({self.get_status_display()})"
+
+
+class BostaCity(models.Model):
+    """
+    Local copy of Bosta's city list, kept current by refresh_bosta_cities.
+    Shipment creation reads it (through shipping.catalogue) instead of
+    calling the cities API.
+    """
+    bosta_id = models.CharField(max_length=50, unique=True)
+    code = models.CharField(max_length=20, blank=True, db_index=True)
+    name = models.CharField(max_length=100)
+    name_ar = models.CharField(max_length=100, blank=True)
+    drop_off_available = models.BooleanField(default=True)
+    pickup_available = models.BooleanField(default=True)
+    # False once the city no longer appears in Bosta's list
+    is_active = models.BooleanField(default=True)
+    raw_data = models.JSONField(null=True, blank=True, help_text="City as returned by the Bosta API")
+    refreshed_at = models.DateTimeField()
+
+    class Meta:
+        ordering = ('name',)
+        verbose_name = "Bosta City"
+        verbose_name_plural = "Bosta Cities"
+
+    def __str__(self):
+        return f"{self.name} ({self.code})"
+
+
+class BostaZone(models.Model):
+    """A zone (district) within a BostaCity."""
+    bosta_id = models.CharField(max_length=50, unique=True)
+    city = models.ForeignKey(BostaCity, on_delete=models.CASCADE, related_name='zones')
+    name = models.CharField(max_length=100)
+    name_ar = models.CharField(max_length=100, blank=True)
+    drop_off_available = models.BooleanField(default=True)
+    pickup_available = models.BooleanField(default=True)
+    is_active = models.BooleanField(default=True)
+    refreshed_at = models.DateTimeField()
+
+    class Meta:
+        ordering = ('city', 'name')
+        verbose_name = "Bosta Zone"
+        verbose_name_plural = "Bosta Zones"
+
+    def __str__(self):
+        return f"{self.name} - {self.city.name}"
@@ -0,0 +1,81 @@
+"""
+Adaptive polling schedule for Bosta tracking sync.
+
+Each shipment has a BostaSyncState. After every poll the next poll is
+scheduled from the shipment's status (BOSTA_SYNC_INTERVALS, in minutes),
+doubled for each consecutive poll that saw the same state, up to
+BOSTA_SYNC_MAX_INTERVAL. Terminal shipments are never polled again, and a
+webhook resets the schedule because it already told us the latest state.
+"""
+import hashlib
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+from .models import BostaSyncState
+
+TERMINAL_STATUSES = ('delivered', 'cancelled', 'returned')
+
+DEFAULT_INTERVALS = {
+    'pending': 60,
+    'pickup_requested': 60,
+    'picked_up': 30,
+    'in_transit': 15,
+    'exception': 30,
+}
+
+
+def poll_interval(status, unchanged_polls=0):
+    """Minutes until the next poll, or None if the shipment is terminal."""
+    if status in TERMINAL_STATUSES:
+        return None
+    intervals = getattr(settings, 'BOSTA_SYNC_INTERVALS', DEFAULT_INTERVALS)
+    base = intervals.get(status, 60)
+    # Back off while nothing changes: 1x, 2x, 4x, 8x
+    interval = base * 2 ** min(unchanged_polls, 3)
+    return min(interval, getattr(settings, 'BOSTA_SYNC_MAX_INTERVAL', 6 * 60))
+
+
+def state_hash(tracking_data):
+    """Fingerprint of the parts of a tracking response the sync acts on."""
+    state = (tracking_data or {}).get('state') or {}
+    raw = json.dumps(state, sort_keys=True, default=str)
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+
+def schedule(state, status, tracking_data=None, now=None):
+    """
+    Update ``state`` in memory after a poll (or webhook) that returned
+    ``tracking_data``; None means the poll failed and only reschedules.
+    """
+    now = now or timezone.now()
+    if tracking_data is not None:
+        new_hash = state_hash(tracking_data)
+        if new_hash == state.last_state_hash:
+            state.unchanged_polls += 1
+        else:
+            state.unchanged_polls = 0
+            state.last_state_hash = new_hash
+        state.last_polled_at = now
+
+    interval = poll_interval(status, state.unchanged_polls)
+    state.next_poll_at = now + timedelta(minutes=interval) if interval is not None else None
+    state.updated = now
+    return state
+
+
+def record_webhook(shipment, webhook_data):
+    """Restart the shipment's schedule from the state a webhook delivered."""
+    state, _ = BostaSyncState.objects.get_or_create(shipment=shipment)
+    state.unchanged_polls = 0
+    state.last_state_hash = ''
+    schedule(state, shipment.status, webhook_data)
+    state.save()
+
+
+def due_filter(now=None):
+    """Q matching shipments with no schedule yet or whose next poll has passed."""
+    now = now or timezone.now()
+    return Q(sync_state__isnull=True) | Q(sync_state__next_poll_at__lte=now)
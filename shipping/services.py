@@ -1,14 +1,32 @@
 import requests
 import logging
+import time
 from datetime import datetime, date, timedelta
 from decimal import Decimal
 from typing import Dict, List, Optional, Union
 from django.conf import settings
+from django.db import DatabaseError, transaction
 from django.utils import timezone
 from .models import BostaShipment, BostaTrackingEvent, BostaSettings, BostaPickupRequest
+from .http import get_session, get_timeout, endpoint_label, record_request
+from .schedule import record_webhook
+from .cities import resolve_city, canonical_city_name, zone_name
+from .catalogue import get_catalogue
 
 logger = logging.getLogger(__name__)
 
+# Map Bosta states to our status values
+STATE_STATUSES = {
+    0: 'pending',
+    1: 'pickup_requested',
+    2: 'picked_up',
+    3: 'in_transit',
+    4: 'delivered',
+    5: 'cancelled',
+    6: 'returned',
+    7: 'exception'
+}
+
 
 class BostaAPIError(Exception):
     """Custom exception for Bosta API errors"""
@@ -21,20 +39,25 @@ class BostaService:
     Provides methods for creating shipments, tracking, pickup requests, etc.
     """
     
-    def __init__(self):
+    def __init__(self, session=None):
         self.settings = BostaSettings.get_active_settings()
         if not self.settings:
             raise BostaAPIError("No active Bosta settings found. Please configure Bosta in admin.")
         
         self.api_key = self.settings.api_key
         self.base_url = self.settings.api_base_url.rstrip('/')
-        # Don't preset headers since we'll test different auth methods in _make_request
+        # Shared pooled session unless one is injected (e.g. in tests)
+        self.session = session or get_session()
 
     def _make_request(self, method: str, endpoint: str, data: Dict = None) -> Dict:
         """
         Make HTTP request to Bosta API with error handling.
         Based on official Bosta API documentation and SDK patterns.
         
+        Requests go through the shared keep-alive session, which retries
+        connection errors, 429s and (for idempotent methods) 5xx responses
+        with backoff. Latency is recorded per endpoint (see shipping.http).
+        
         Args:
             method: HTTP method (GET, POST, PUT, DELETE)
             endpoint: API endpoint
@@ -47,27 +70,30 @@ class BostaService:
             BostaAPIError: If API request fails
         """
         url = f"{self.base_url}{endpoint}"
+        method = method.upper()
+        if method not in ('GET', 'POST', 'PUT', 'DELETE'):
+            raise BostaAPIError(f"Unsupported HTTP method: {method}")
         
         # Use official Bosta API authentication pattern
         headers = {
             'Authorization': self.api_key,  # Official Bosta pattern
-            'Content-Type': 'application/json',
-            'Accept': 'application/json'
         }
         
+        label = endpoint_label(method, endpoint)
+        status_code = None
+        start = time.perf_counter()
         try:
             logger.info(f"Making {method} request to Bosta API: {url}")
             
-            if method.upper() == 'GET':
-                response = requests.get(url, headers=headers, params=data, timeout=30)
-            elif method.upper() == 'POST':
-                response = requests.post(url, headers=headers, json=data, timeout=30)
-            elif method.upper() == 'PUT':
-                response = requests.put(url, headers=headers, json=data, timeout=30)
-            elif method.upper() == 'DELETE':
-                response = requests.delete(url, headers=headers, timeout=30)
-            else:
-                raise BostaAPIError(f"Unsupported HTTP method: {method}")
+            response = self.session.request(
+                method,
+                url,
+                headers=headers,
+                params=data if method == 'GET' else None,
+                json=data if method in ('POST', 'PUT') else None,
+                timeout=get_timeout(),
+            )
+            status_code = response.status_code
             
             # Log response for debugging
             logger.debug(f"Bosta API Response Status: {response.status_code}")
@@ -115,6 +141,10 @@ class BostaService:
         except Exception as e:
             logger.error(f"Unexpected error in Bosta API request: {str(e)}")
             raise BostaAPIError(f"Unexpected error: {str(e)}")
+        finally:
+            duration = time.perf_counter() - start
+            record_request(label, duration, status_code)
+            logger.info(f"Bosta {label} -> {status_code or 'no response'} in {duration * 1000:.0f}ms")
 
     def create_shipment(self, shipment: BostaShipment) -> Optional[Dict]:
         """
@@ -127,6 +157,33 @@ class BostaService:
             Bosta API response data or None if failed
         """
         order = shipment.order
+        shipment_data = self.build_shipment_payload(shipment)
+        
+        try:
+            response_data = self.submit_shipment(shipment_data)
+            
+            # Update shipment with Bosta response
+            event = self.apply_created_shipment(shipment, response_data)
+            shipment.save()
+            
+            # Create initial tracking event
+            event.save()
+            
+            logger.info(f"Created Bosta shipment for Order #{order.id}: {shipment.bosta_tracking_number}")
+            return response_data
+            
+        except BostaAPIError as e:
+            logger.error(f"Failed to create Bosta shipment for Order #{order.id}: {str(e)}")
+            return None
+
+    def build_shipment_payload(self, shipment: BostaShipment) -> Dict:
+        """
+        Build the create-delivery request body for ``shipment``.
+        
+        Makes no API calls. Reads order items (for the COD total) only when
+        shipment.cod_amount is not already set.
+        """
+        order = shipment.order
         
         # Prepare shipment data with correct Bosta mapping
         resolved_zone = self._resolve_zone_name(order, None)
@@ -134,177 +191,20 @@ class BostaService:
         # Use Bosta's correct city code and Arabic name for Gharbiya
         user_selected_governorate = (order.governorate or '').strip()
         
-        # Complete mapping to Bosta's actual city data (all in Arabic)
-        governorate_to_bosta = {
-            # Cairo variants
-            'cairo': ('EG-01', 'القاهره'),
-            'al qahirah': ('EG-01', 'القاهره'),
-            'el qahira': ('EG-01', 'القاهره'),
-            'القاهرة': ('EG-01', 'القاهره'),
-            'القاهره': ('EG-01', 'القاهره'),
-            
-            # Alexandria variants  
-            'alexandria': ('EG-02', 'الاسكندريه'),
-            'iskandariya': ('EG-02', 'الاسكندريه'),
-            'alex': ('EG-02', 'الاسكندريه'),
-            'الاسكندرية': ('EG-02', 'الاسكندريه'),
-            'الإسكندرية': ('EG-02', 'الاسكندريه'),
-            'الاسكندريه': ('EG-02', 'الاسكندريه'),
-            
-            # Giza variants
-            'giza': ('EG-25', 'الجيزه'),
-            'gizah': ('EG-25', 'الجيزه'),
-            'الجيزة': ('EG-25', 'الجيزه'),
-            'الجيزه': ('EG-25', 'الجيزه'),
-            
-            # Dakahlia variants
-            'dakahlia': ('EG-05', 'الدقهليه'),
-            'dakhliya': ('EG-05', 'الدقهليه'),
-            'الدقهلية': ('EG-05', 'الدقهليه'),
-            'الدقهليه': ('EG-05', 'الدقهليه'),
-            
-            # Beheira variants
-            'beheira': ('EG-04', 'البحيره'),
-            'behira': ('EG-04', 'البحيره'),
-            'البحيرة': ('EG-04', 'البحيره'),
-            'البحيره': ('EG-04', 'البحيره'),
-            
-            # Gharbiya variants
-            'gharbiya': ('EG-07', 'الغربيه'),
-            'gharbia': ('EG-07', 'الغربيه'),
-            'gharbeya': ('EG-07', 'الغربيه'),
-            'الغربية': ('EG-07', 'الغربيه'),
-            'الغربيه': ('EG-07', 'الغربيه'),
-            
-            # Kafr Al Sheikh variants
-            'kafr al sheikh': ('EG-08', 'كفر الشيخ'),
-            'kafr el sheikh': ('EG-08', 'كفر الشيخ'),
-            'kafralshiekh': ('EG-08', 'كفر الشيخ'),
-            'كفر الشيخ': ('EG-08', 'كفر الشيخ'),
-            
-            # Qalyubia variants
-            'qalyubia': ('EG-06', 'القليوبيه'),
-            'qalyubiya': ('EG-06', 'القليوبيه'), 
-            'qaliubiya': ('EG-06', 'القليوبيه'),
-            'el kaluobia': ('EG-06', 'القليوبيه'),
-            'القليوبية': ('EG-06', 'القليوبيه'),
-            'القليوبيه': ('EG-06', 'القليوبيه'),
-            
-            # Sharqia variants
-            'sharqia': ('EG-10', 'الشرقيه'),
-            'sharkia': ('EG-10', 'الشرقيه'),
-            'الشرقية': ('EG-10', 'الشرقيه'),
-            'الشرقيه': ('EG-10', 'الشرقيه'),
-            
-            # Menofia variants
-            'menofia': ('EG-09', 'المنوفيه'),
-            'menoufia': ('EG-09', 'المنوفيه'),
-            'المنوفية': ('EG-09', 'المنوفيه'),
-            'المنوفيه': ('EG-09', 'المنوفيه'),
-            
-            # Aswan variants
-            'aswan': ('EG-21', 'اسوان'),
-            'asuan': ('EG-21', 'اسوان'),
-            'أسوان': ('EG-21', 'اسوان'),
-            'اسوان': ('EG-21', 'اسوان'),
-            
-            # Red Sea variants
-            'red sea': ('EG-23', 'البحر الاحمر'),
-            'red_sea': ('EG-23', 'البحر الاحمر'),
-            'redsea': ('EG-23', 'البحر الاحمر'),
-            'البحر الأحمر': ('EG-23', 'البحر الاحمر'),
-            'البحر الاحمر': ('EG-23', 'البحر الاحمر'),
-            
-            # Luxor variants
-            'luxor': ('EG-22', 'الاقصر'),
-            'الأقصر': ('EG-22', 'الاقصر'),
-            'الاقصر': ('EG-22', 'الاقصر'),
-            
-            # Asyut variants
-            'asyut': ('EG-17', 'اسيوط'),
-            'assiut': ('EG-17', 'اسيوط'),
-            'أسيوط': ('EG-17', 'اسيوط'),
-            'اسيوط': ('EG-17', 'اسيوط'),
-            
-            # Sohag variants
-            'sohag': ('EG-18', 'سوهاج'),
-            'suhag': ('EG-18', 'سوهاج'),
-            'سوهاج': ('EG-18', 'سوهاج'),
-            
-            # Qena variants
-            'qena': ('EG-20', 'قنا'),
-            'qina': ('EG-20', 'قنا'),
-            'قنا': ('EG-20', 'قنا'),
-            
-            # Minya variants
-            'minya': ('EG-19', 'المنيا'),
-            'minia': ('EG-19', 'المنيا'),
-            'المنيا': ('EG-19', 'المنيا'),
-            
-            # Beni Suef variants
-            'beni suef': ('EG-16', 'بني سويف'),
-            'beni_suef': ('EG-16', 'بني سويف'),
-            'benisuef': ('EG-16', 'بني سويف'),
-            'بني سويف': ('EG-16', 'بني سويف'),
-            
-            # Fayoum variants
-            'fayoum': ('EG-15', 'الفيوم'),
-            'fayyum': ('EG-15', 'الفيوم'),
-            'الفيوم': ('EG-15', 'الفيوم'),
-            
-            # Ismailia variants
-            'ismailia': ('EG-11', 'الاسماعيليه'),
-            'ismailiya': ('EG-11', 'الاسماعيليه'),
-            'الإسماعيلية': ('EG-11', 'الاسماعيليه'),
-            'الاسماعيليه': ('EG-11', 'الاسماعيليه'),
-            
-            # Suez variants
-            'suez': ('EG-12', 'السويس'),
-            'السويس': ('EG-12', 'السويس'),
-            
-            # Port Said variants
-            'port said': ('EG-13', 'بور سعيد'),
-            'port_said': ('EG-13', 'بور سعيد'),
-            'portsaid': ('EG-13', 'بور سعيد'),
-            'بور سعيد': ('EG-13', 'بور سعيد'),
-            
-            # Damietta variants
-            'damietta': ('EG-14', 'دمياط'),
-            'dumyat': ('EG-14', 'دمياط'),
-            'دمياط': ('EG-14', 'دمياط'),
-            
-            # North Sinai variants
-            'north sinai': ('EG-27', 'شمال سيناء'),
-            'north_sinai': ('EG-27', 'شمال سيناء'),
-            'northsinai': ('EG-27', 'شمال سيناء'),
-            'شمال سيناء': ('EG-27', 'شمال سيناء'),
-            
-            # South Sinai variants
-            'south sinai': ('EG-26', 'جنوب سيناء'),
-            'south_sinai': ('EG-26', 'جنوب سيناء'),
-            'southsinai': ('EG-26', 'جنوب سيناء'),
-            'جنوب سيناء': ('EG-26', 'جنوب سيناء'),
-            
-            # New Valley variants
-            'new valley': ('EG-24', 'الوادي الجديد'),
-            'new_valley': ('EG-24', 'الوادي الجديد'),
-            'newvalley': ('EG-24', 'الوادي الجديد'),
-            'الوادي الجديد': ('EG-24', 'الوادي الجديد'),
-            
-            # Matrouh variants
-            'matrouh': ('EG-28', 'مرسي مطروح'),
-            'matruh': ('EG-28', 'مرسي مطروح'),
-            'مطروح': ('EG-28', 'مرسي مطروح'),
-            'مرسي مطروح': ('EG-28', 'مرسي مطروح'),
-        }
-        
-        # Look up the governorate in our mapping
-        lookup_key = user_selected_governorate.lower().strip()
-        if lookup_key in governorate_to_bosta:
-            bosta_city_code, bosta_city_name = governorate_to_bosta[lookup_key]
-        else:
-            # Fallback to Cairo if not found
-            bosta_city_code, bosta_city_name = ('EG-01', 'القاهره')
+        # Bosta's exact city code and Arabic name (alias table in shipping/data/bosta_cities.json);
+        # falls back to Cairo if the governorate can't be resolved
+        city = resolve_city(user_selected_governorate)
+        bosta_city_code, bosta_city_name = city.code, city.name_ar
+
+        # Prefer the names in the synced catalogue (no API call); Bosta's own
+        # zone spelling when the customer's district matches one
+        catalogue = get_catalogue()
+        catalogue_city = catalogue.city(bosta_city_code)
+        if catalogue_city and catalogue_city['name_ar']:
+            bosta_city_name = catalogue_city['name_ar']
+        catalogue_zone = catalogue.zone(bosta_city_code, resolved_zone)
+        if catalogue_zone:
+            resolved_zone = catalogue_zone['name']
         
         shipment_data = {
             'type': 10,
@@ -338,31 +238,30 @@ class BostaService:
             cod_amount = shipment.cod_amount or order.get_total_cost_with_shipping()
             shipment_data['cod'] = float(cod_amount)
         
-        try:
-            # Use v1 API for shipment creation (v2 doesn't exist according to official docs)
-            response_data = self._make_request('POST', '/api/v1/deliveries', shipment_data)
-            
-            # Update shipment with Bosta response
-            shipment.bosta_tracking_number = response_data.get('trackingNumber')
-            shipment.bosta_delivery_id = response_data.get('_id')
-            shipment.bosta_response_data = response_data
-            shipment.status = 'pickup_requested'
-            shipment.save()
-            
-            # Create initial tracking event
-            self._create_tracking_event(
-                shipment=shipment,
-                event_type='created',
-                event_description='Shipment created in Bosta',
-                event_timestamp=timezone.now()
-            )
-            
-            logger.info(f"Created Bosta shipment for Order #{order.id}: {shipment.bosta_tracking_number}")
-            return response_data
-            
-        except BostaAPIError as e:
-            logger.error(f"Failed to create Bosta shipment for Order #{order.id}: {str(e)}")
-            return None
+        return shipment_data
+
+    def submit_shipment(self, shipment_data: Dict) -> Dict:
+        """POST a payload from build_shipment_payload. Raises BostaAPIError."""
+        # Use v1 API for shipment creation (v2 doesn't exist according to official docs)
+        return self._make_request('POST', '/api/v1/deliveries', shipment_data)
+
+    def apply_created_shipment(self, shipment: BostaShipment, response_data: Dict) -> BostaTrackingEvent:
+        """
+        Apply a create-delivery response to ``shipment`` in memory.
+        
+        Returns the unsaved 'created' tracking event. Nothing is written;
+        callers save the shipment and event (one at a time or in bulk).
+        """
+        shipment.bosta_tracking_number = response_data.get('trackingNumber')
+        shipment.bosta_delivery_id = response_data.get('_id')
+        shipment.bosta_response_data = response_data
+        shipment.status = 'pickup_requested'
+        return BostaTrackingEvent(
+            shipment=shipment,
+            event_type='created',
+            event_description='Shipment created in Bosta',
+            event_timestamp=timezone.now()
+        )
 
     def track_shipment(self, tracking_number: str) -> Optional[Dict]:
         """
@@ -375,8 +274,7 @@ class BostaService:
             Tracking data or None if failed
         """
         try:
-            # Use v1 API for tracking
-            response_data = self._make_request('GET', f'/api/v1/deliveries/track/{tracking_number}')
+            response_data = self.fetch_tracking(tracking_number)
             
             # Update shipment status based on tracking data
             try:
@@ -391,6 +289,14 @@ class BostaService:
             logger.error(f"Failed to track shipment {tracking_number}: {str(e)}")
             return None
 
+    def fetch_tracking(self, tracking_number: str) -> Dict:
+        """
+        Fetch raw tracking data without touching the database.
+        Safe to call from worker threads; raises BostaAPIError on failure.
+        """
+        # Use v1 API for tracking
+        return self._make_request('GET', f'/api/v1/deliveries/track/{tracking_number}')
+
     def get_shipment_details(self, delivery_id: str) -> Optional[Dict]:
         """
         Get detailed shipment information by delivery ID.
@@ -532,22 +438,38 @@ class BostaService:
             logger.error(f"Failed to cancel shipment {delivery_id}: {str(e)}")
             return False
 
-    def get_cities(self) -> List[Dict]:
+    def get_cities(self, use_catalogue: bool = True) -> List[Dict]:
         """
         Get list of supported cities from Bosta.
         
+        Served from the local catalogue (refresh_bosta_cities) when it has
+        been populated; otherwise, or with use_catalogue=False, from the API.
+        
         Returns:
             List of city data
         """
+        if use_catalogue:
+            catalogue = get_catalogue()
+            if catalogue:
+                return catalogue.api_cities()
         try:
-            # Use v1 API for cities (v2 API has limited functionality)
-            response_data = self._make_request('GET', '/api/v1/cities')
-            # Bosta API returns cities in 'data' field, not 'cities'
-            return response_data.get('data', [])
+            return self.fetch_cities()
         except BostaAPIError as e:
             logger.error(f"Failed to get cities: {str(e)}")
             return []
 
+    def fetch_cities(self) -> List[Dict]:
+        """Download the city list from the API. Raises BostaAPIError."""
+        # Use v1 API for cities (v2 API has limited functionality)
+        response_data = self._make_request('GET', '/api/v1/cities')
+        # Bosta API returns cities in 'data' field, not 'cities'
+        return response_data.get('data', [])
+
+    def fetch_zones(self, city_id: str) -> List[Dict]:
+        """Download the zones of one city (by Bosta _id). Raises BostaAPIError."""
+        response_data = self._make_request('GET', f'/api/v1/cities/{city_id}/zones')
+        return response_data.get('data', [])
+
     def handle_webhook(self, webhook_data: Dict) -> bool:
         """
         Process incoming webhook from Bosta.
@@ -557,6 +479,10 @@ class BostaService:
             
         Returns:
             True if processed successfully, False otherwise
+            
+        Database errors are raised (after rolling back this webhook's
+        writes) so the caller's transaction stays usable and the webhook
+        inbox can record the error and retry.
         """
         try:
             tracking_number = webhook_data.get('trackingNumber')
@@ -564,63 +490,71 @@ class BostaService:
                 logger.warning("Webhook received without tracking number")
                 return False
             
-            # Find the shipment
-            try:
-                shipment = BostaShipment.objects.get(bosta_tracking_number=tracking_number)
-            except BostaShipment.DoesNotExist:
-                logger.warning(f"Shipment with tracking number {tracking_number} not found")
-                return False
-            
-            # Update shipment based on webhook data
-            self._update_shipment_from_webhook(shipment, webhook_data)
+            # Its own savepoint: a failure part way leaves no partial update
+            # and, on PostgreSQL, no aborted transaction behind
+            with transaction.atomic():
+                # Find the shipment
+                try:
+                    shipment = BostaShipment.objects.get(bosta_tracking_number=tracking_number)
+                except BostaShipment.DoesNotExist:
+                    logger.warning(f"Shipment with tracking number {tracking_number} not found")
+                    return False
+                
+                # Update shipment based on webhook data
+                self._update_shipment_from_webhook(shipment, webhook_data)
+                
+                # The webhook told us the latest state; restart the polling schedule
+                record_webhook(shipment, webhook_data)
             
             logger.info(f"Processed webhook for shipment {tracking_number}")
             return True
             
+        except DatabaseError:
+            raise
         except Exception as e:
             logger.error(f"Error processing webhook: {str(e)}")
             return False
 
     def _update_shipment_from_tracking(self, shipment: BostaShipment, tracking_data: Dict):
         """Update shipment status based on tracking API response"""
+        event = self.apply_tracking_update(shipment, tracking_data)
+        if event:
+            shipment.save()
+            event.save()
+
+    def apply_tracking_update(self, shipment: BostaShipment, tracking_data: Dict) -> Optional[BostaTrackingEvent]:
+        """
+        Apply a tracking response to ``shipment`` in memory.
+        
+        Returns the unsaved tracking event for the status change, or None if
+        the status did not change. Nothing is written; callers save the
+        shipment and event (one at a time or in bulk).
+        """
         current_state = tracking_data.get('state', {})
         state_code = current_state.get('code')
         
-        # Map Bosta states to our status values
-        status_mapping = {
-            0: 'pending',
-            1: 'pickup_requested', 
-            2: 'picked_up',
-            3: 'in_transit',
-            4: 'delivered',
-            5: 'cancelled',
-            6: 'returned',
-            7: 'exception'
-        }
+        new_status = STATE_STATUSES.get(state_code, shipment.status)
         
-        new_status = status_mapping.get(state_code, shipment.status)
+        if new_status == shipment.status:
+            return None
+
+        shipment.status = new_status
         
-        if new_status != shipment.status:
-            shipment.status = new_status
+        # Update delivery date if delivered
+        if new_status == 'delivered' and not shipment.delivery_date:
+            shipment.delivery_date = timezone.now()
             
-            # Update delivery date if delivered
-            if new_status == 'delivered' and not shipment.delivery_date:
-                shipment.delivery_date = timezone.now()
-                
-                # Mark COD as collected if this is a COD shipment
-                if shipment.is_cod_shipment():
-                    shipment.cod_collected = True
-                    shipment.cod_collection_date = timezone.now()
-            
-            shipment.save()
-            
-            # Create tracking event
-            self._create_tracking_event(
-                shipment=shipment,
-                event_type=new_status,
-                event_description=current_state.get('value', f'Status updated to {new_status}'),
-                event_timestamp=timezone.now()
-            )
+            # Mark COD as collected if this is a COD shipment
+            if shipment.is_cod_shipment():
+                shipment.cod_collected = True
+                shipment.cod_collection_date = timezone.now()
+        
+        return BostaTrackingEvent(
+            shipment=shipment,
+            event_type=new_status,
+            event_description=current_state.get('value', f'Status updated to {new_status}'),
+            event_timestamp=timezone.now()
+        )
 
     def _update_shipment_from_webhook(self, shipment: BostaShipment, webhook_data: Dict):
         """Update shipment based on webhook data"""
@@ -654,91 +588,9 @@ class BostaService:
     def _get_bosta_city_code(self, city_name: str) -> str:
         """
         Map city name to Bosta city code.
-        This should be updated based on Bosta's city codes.
-        """
-        # Common Egyptian governorates to Bosta codes mapping (canonical names)
-        city_mapping = {
-            'Cairo': 'EG-01',
-            'Giza': 'EG-02', 
-            'Alexandria': 'EG-03',
-            'Dakahlia': 'EG-04',
-            'Beheira': 'EG-05',
-            'Gharbiya': 'EG-07',
-            'Kafr Al Sheikh': 'EG-06',
-            'Qalyubia': 'EG-08',
-            'Sharqia': 'EG-09',
-            'Menofia': 'EG-10',
-        }
-
-        # Aliases/normalizations mapped directly to codes (lowercased keys)
-        alias_to_code = {
-            # Gharbiya variants
-            'gharbiya': 'EG-07',
-            'gharbia': 'EG-07',
-            'gharbeya': 'EG-07',
-            'el gharbiya': 'EG-07',
-            'el gharbeya': 'EG-07',
-            'el-gharbiya': 'EG-07',
-            'elgharbiya': 'EG-07',
-            'الغربية': 'EG-07',
-            'الغربيه': 'EG-07',  # Bosta's exact Arabic spelling
-            # Qalyubia variants (El Kaluobia)
-            'qalyubia': 'EG-08',
-            'qalyubiya': 'EG-08',
-            'qaliubiya': 'EG-08',
-            'qalubia': 'EG-08',
-            'el qalyubia': 'EG-08',
-            'el qalubia': 'EG-08',
-            'el kaluobia': 'EG-08',
-            'القليوبية': 'EG-08',
-            # Kafr El/Al Sheikh variants
-            'kafr el sheikh': 'EG-07',
-            'kafr al sheikh': 'EG-07',
-            'kafr el-sheikh': 'EG-07',
-            'كفر الشيخ': 'EG-07',
-            # Sharqia variants
-            'sharqia': 'EG-09',
-            'sharkia': 'EG-09',
-            'الشرقية': 'EG-09',
-            # Cairo, Giza, Alex, Dakahlia, Beheira, Menofia (Arabic)
-            'القاهرة': 'EG-01',
-            'الجيزة': 'EG-02',
-            'الاسكندرية': 'EG-03',
-            'الإسكندرية': 'EG-03',
-            'الدقهلية': 'EG-04',
-            'البحيرة': 'EG-05',
-            'المنوفية': 'EG-10',
-        }
-
-        def _normalize(name: str) -> str:
-            if not name:
-                return ''
-            n = name.strip().lower()
-            n = n.replace('_', ' ').replace('-', ' ')
-            # collapse multiple spaces
-            n = ' '.join(n.split())
-            return n
-
-        norm = _normalize(city_name)
-        if norm in alias_to_code:
-            return alias_to_code[norm]
-
-        # Try canonical name lookup (case-insensitive)
-        for canonical, code in city_mapping.items():
-            if _normalize(canonical) == norm:
-                return code
-
-        # Default to Cairo if unknown
-        # Heuristic fallback by substring to reduce mis-mapping
-        if any(key in norm for key in ['gharb', 'gharbi', 'الغرب']):
-            return 'EG-07'  # Gharbiya
-        if any(key in norm for key in ['qalyu', 'qaliu', 'qalub', 'kaliob', 'قليوب', 'القليو']):
-            return 'EG-08'  # Qalyubia
-        if any(key in norm for key in ['kafr', 'sheikh', 'الشيخ']):
-            return 'EG-06'  # Kafr El Sheikh
-        if any(key in norm for key in ['sharq', 'shark', 'الشر']):
-            return 'EG-09'  # Sharqia
-        return 'EG-01'
+        Uses the shared resolver in shipping/cities.py; unknown names map to Cairo.
+        """
+        return resolve_city(city_name).code
 
     def _resolve_city_code(self, order) -> str:
         """Resolve best city code from order data (prefer governorate, fallback to city)."""
@@ -749,24 +601,11 @@ class BostaService:
         return self._get_bosta_city_code(target)
 
     def _get_canonical_city_name(self, city_code: str) -> str:
-        mapping = {
-            'EG-01': 'Cairo',
-            'EG-02': 'Giza',
-            'EG-03': 'Alexandria',
-            'EG-04': 'Dakahlia',
-            'EG-05': 'Beheira',
-            'EG-06': 'Kafr Al Sheikh',
-            'EG-07': 'Gharbiya',
-            'EG-08': 'Qalyubia',
-            'EG-09': 'Sharqia',
-            'EG-10': 'Menofia',
-        }
-        return mapping.get(city_code, 'Cairo')
+        return canonical_city_name(city_code)
 
     def _resolve_zone_name(self, order, city_code: str = None) -> str:
         # If zone (district) equals the canonical governorate name, keep user's city value to avoid Bosta overriding
-        user_zone = (order.city or '').strip() or (order.governorate or '').strip()
-        return user_zone
+        return zone_name(order.city, order.governorate)
 
     def _get_business_location_id(self) -> str:
         """
@@ -1,6 +1,7 @@
 from django.db.models.signals import post_save, pre_save
 from django.dispatch import receiver
 from orders.models import Order
+from orders.signals import orders_cancelled
 from .models import BostaShipment, BostaSettings
 from .services import BostaOrderIntegration
 import logging
@@ -45,8 +46,8 @@ def sync_order_status_with_shipment(sender, instance, **kwargs):
     """
     if instance.pk:  # Only for existing orders
         try:
-            old_instance = Order.objects.get(pk=instance.pk)
-            if old_instance.status != instance.status:
+            # Compared with the status the order was loaded with; no query
+            if instance.has_changed('status'):
                 # Order status changed, check if we need to update shipment
                 if hasattr(instance, 'bosta_shipment'):
                     shipment = instance.bosta_shipment
@@ -59,8 +60,6 @@ def sync_order_status_with_shipment(sender, instance, **kwargs):
                         if shipment.bosta_delivery_id:
                             bosta_service.cancel_shipment(shipment.bosta_delivery_id)
                 
-        except Order.DoesNotExist:
-            pass  # New order
         except Exception as e:
             logger.error(f"Error syncing order status for Order #{instance.id}: {str(e)}")
 
@@ -74,18 +73,39 @@ def update_order_status_from_shipment(sender, instance, **kwargs):
         order = instance.order
         
         # Map shipment status to order status
+        # Only the status changes, so write only that (one UPDATE). The
+        # pre_save handler above acts on cancellations only, so it can't
+        # recurse back here.
         if instance.status == 'delivered' and order.status != 'delivered':
             order.status = 'delivered'
-            # Disconnect signal temporarily to avoid recursion
-            post_save.disconnect(sync_order_status_with_shipment, sender=Order)
-            order.save()
-            post_save.connect(sync_order_status_with_shipment, sender=Order)
+            order.save(update_fields=['status', 'updated'])
             
         elif instance.status == 'in_transit' and order.status == 'pending':
             order.status = 'shipped'
-            post_save.disconnect(sync_order_status_with_shipment, sender=Order)
-            order.save()
-            post_save.connect(sync_order_status_with_shipment, sender=Order)
+            order.save(update_fields=['status', 'updated'])
             
     except Exception as e:
-        logger.error(f"Error updating order status from shipment {instance.id}: {str(e)}") 
\ No newline at end of file
+        logger.error(f"Error updating order status from shipment {instance.id}: {str(e)}") 
+
+
+@receiver(orders_cancelled)
+def cancel_shipments_for_orders(sender, orders, **kwargs):
+    """
+    Cancel the Bosta shipments of orders cancelled in bulk, under the same
+    conditions as sync_order_status_with_shipment. Returns {order_id: error}
+    for shipments that could not be cancelled, so they are retried.
+    """
+    shipments = list(
+        BostaShipment.objects.filter(order__in=orders, bosta_delivery_id__isnull=False)
+        .exclude(status__in=['delivered', 'cancelled'])
+    )
+    if not shipments:
+        return {}
+
+    from .services import BostaService
+    bosta_service = BostaService()
+    errors = {}
+    for shipment in shipments:
+        if not bosta_service.cancel_shipment(shipment.bosta_delivery_id):
+            errors[shipment.order_id] = f'Bosta cancellation failed for {shipment.bosta_delivery_id}'
+    return errors
@@ -0,0 +1,418 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from datetime import timedelta
+from unittest import mock
+
+from django.db import DatabaseError
+from django.db.models.signals import post_save
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+
+from orders.models import Order
+from . import catalogue
+from .cities import DEFAULT_CITY_CODE, resolve_city
+from .http import build_session
+from .batch import create_shipments
+from .inbox import ingest_webhook, process_pending_webhooks
+from .models import BostaCity, BostaSettings, BostaShipment, BostaSyncState, BostaTrackingEvent
+from .schedule import due_filter, record_webhook
+from .services import BostaAPIError, BostaOrderIntegration, BostaService
+from .sync import sync_tracking
+
+
+class ResolveCityTests(SimpleTestCase):
+    def test_governorate_names_and_addresses(self):
+        for text, code in [
+            ('Giza', 'EG-25'),
+            ('gharbia', 'EG-07'),
+            ('الإسكندرية', 'EG-02'),
+            ('Kafr El Sheikh', 'EG-08'),
+            ('12 Tahrir St, Dokki, Giza', 'EG-25'),
+            ('Hurghada', 'EG-23'),
+        ]:
+            with self.subTest(text=text):
+                self.assertEqual(resolve_city(text).code, code)
+
+    def test_near_misses_fall_back_to_default_with_warning(self):
+        # Each of these has a fuzzy match in another governorate
+        for text in ['north coast', 'sheikh', 'said', 'Sinai', 'new york', '']:
+            with self.subTest(text=text), self.assertLogs('shipping.cities', 'WARNING'):
+                self.assertEqual(resolve_city(text).code, DEFAULT_CITY_CODE)
+
+    def test_exact_match_is_not_logged(self):
+        with self.assertNoLogs('shipping.cities'):
+            resolve_city('Alexandria')
+
+
+class WebhookInboxTests(TestCase):
+    def setUp(self):
+        BostaSettings.objects.create(api_key='key')
+        order = Order.objects.create(first_name='Mona', last_name='Adel', email='mona@example.com',
+                                     address='12 Tahrir St', city='Dokki', postal_code='12611',
+                                     phone='01000000000', governorate='Giza')
+        self.shipment = BostaShipment.objects.create(order=order, bosta_tracking_number='T100', status='in_transit')
+        self.event, _ = ingest_webhook({'trackingNumber': 'T100', 'state': {'code': 4, 'value': 'Delivered'},
+                                        'timeStamp': 1767225600000})
+
+    def test_webhook_is_applied(self):
+        counts = process_pending_webhooks()
+
+        self.assertEqual(counts['processed'], 1)
+        self.shipment.refresh_from_db()
+        self.assertEqual(self.shipment.status, 'delivered')
+
+    def test_repeated_state_in_a_later_run_is_skipped(self):
+        self.assertEqual(process_pending_webhooks()['processed'], 1)
+        events = BostaTrackingEvent.objects.count()
+
+        ingest_webhook({'trackingNumber': 'T100', 'state': {'code': 4, 'value': 'Delivered'},
+                        'timeStamp': 1767229200000})
+        counts = process_pending_webhooks()
+
+        self.assertEqual((counts['processed'], counts['skipped']), (0, 1))
+        self.assertEqual(BostaTrackingEvent.objects.count(), events)
+
+    def test_state_the_shipment_is_already_in_is_skipped(self):
+        self.shipment.status = 'delivered'
+        self.shipment.save()
+
+        self.assertEqual(process_pending_webhooks()['skipped'], 1)
+        self.assertFalse(BostaTrackingEvent.objects.exists())
+
+    def test_database_error_rolls_back_the_update_and_is_retried(self):
+        with mock.patch('shipping.services.record_webhook', side_effect=DatabaseError('connection lost')):
+            counts = process_pending_webhooks()
+
+        self.assertEqual(counts['retrying'], 1)
+        self.event.refresh_from_db()
+        self.assertEqual((self.event.status, self.event.attempts), ('pending', 1))
+        self.assertEqual(self.event.last_error, 'connection lost')
+        self.shipment.refresh_from_db()
+        self.assertEqual(self.shipment.status, 'in_transit')
+        self.assertFalse(BostaTrackingEvent.objects.exists())
+
+        self.assertEqual(process_pending_webhooks()['processed'], 1)
+
+
+def create_order(phone, **kwargs):
+    return Order.objects.create(first_name='Mona', last_name='Adel', email='mona@example.com',
+                                address='12 Tahrir St', city='Dokki', postal_code='12611',
+                                phone=phone, governorate='Giza', **kwargs)
+
+
+class BulkPathTestCase(TestCase):
+    """Compares a bulk path with the one-by-one path it replaced, on two identical sets of orders."""
+
+    def setUp(self):
+        BostaSettings.objects.create(api_key='key', auto_create_shipments=True, auto_request_pickup=False)
+        self.service = BostaService()
+        self.saves = []
+        post_save.connect(self.record_save, sender=BostaShipment, dispatch_uid='test-record-save')
+        self.addCleanup(post_save.disconnect, sender=BostaShipment, dispatch_uid='test-record-save')
+
+    def record_save(self, sender, instance, created, **kwargs):
+        self.saves.append((instance.order.phone, created, instance.status))
+
+    def outcome(self, orders):
+        """What each path left behind, keyed by order phone and free of ids and timestamps."""
+        rows = {}
+        for order in Order.objects.filter(pk__in=[order.pk for order in orders]).select_related('bosta_shipment'):
+            shipment = order.bosta_shipment
+            rows[order.phone] = (
+                order.status, shipment.status, shipment.delivery_type, shipment.cod_amount,
+                shipment.delivery_date is not None, shipment.cod_collected,
+                sorted(shipment.tracking_events.values_list('event_type', 'event_description')),
+            )
+        saves, self.saves = sorted(self.saves), []
+        return rows, saves
+
+
+class SyncTrackingTests(BulkPathTestCase):
+    TRACKING = {
+        '01': {'state': {'code': 4, 'value': 'Delivered'}},
+        '02': {'state': {'code': 3, 'value': 'In transit'}},
+        '03': {'state': {'code': 2, 'value': 'Picked up'}},
+        '04': None,
+    }
+
+    def shipments(self, prefix):
+        shipments = []
+        for phone in self.TRACKING:
+            shipments.append(BostaShipment.objects.create(
+                order=create_order(phone), bosta_tracking_number=f'{prefix}{phone}', status='picked_up'))
+        self.saves = []
+        return shipments
+
+    def fetch(self, tracking_number):
+        data = self.TRACKING[tracking_number[-2:]]
+        if data is None:
+            raise BostaAPIError('timeout')
+        return data
+
+    def test_matches_tracking_one_shipment_at_a_time(self):
+        with mock.patch.object(self.service, 'fetch_tracking', side_effect=self.fetch):
+            one_by_one = self.shipments('A')
+            for shipment in one_by_one:
+                self.service.track_shipment(shipment.bosta_tracking_number)
+            expected = self.outcome([shipment.order for shipment in one_by_one])
+
+            bulk = self.shipments('B')
+            report = sync_tracking(bulk, concurrency=2, rate_limit=0, batch_size=2, service=self.service)
+
+        self.assertEqual(self.outcome([shipment.order for shipment in bulk]), expected)
+        self.assertEqual((report.updated, report.unchanged, report.errors), (2, 1, 1))
+        self.assertEqual(expected[0]['01'][:2], ('delivered', 'delivered'))
+
+
+class CreateShipmentsTests(BulkPathTestCase):
+    PHONES = {'01': False, '02': True, '03': False}
+
+    def orders(self):
+        orders = [create_order(phone, paid=paid) for phone, paid in self.PHONES.items()]
+        self.saves = []
+        return orders
+
+    def submit(self, payload):
+        phone = payload['receiver']['phone']
+        if phone == '03':
+            raise BostaAPIError('rejected')
+        return {'trackingNumber': f'{self.prefix}{phone}', '_id': f'{self.prefix}-delivery-{phone}'}
+
+    def response_data(self, orders):
+        return {shipment.order.phone: shipment.bosta_response_data and shipment.bosta_response_data['_id'][1:]
+                for shipment in BostaShipment.objects.filter(order__in=orders).select_related('order')}
+
+    def test_matches_creating_one_order_at_a_time(self):
+        with mock.patch.object(BostaService, 'submit_shipment', autospec=True,
+                               side_effect=lambda service, payload: self.submit(payload)):
+            self.prefix = 'A'
+            one_by_one = self.orders()
+            integration = BostaOrderIntegration()
+            for order in one_by_one:
+                integration.create_shipment_for_order(order)
+            expected_data = self.response_data(one_by_one)
+            expected = self.outcome(one_by_one)
+
+            self.prefix = 'B'
+            bulk = self.orders()
+            report = create_shipments(Order.objects.filter(pk__in=[order.pk for order in bulk]),
+                                      concurrency=2, rate_limit=0, batch_size=2, service=self.service)
+
+        self.assertEqual(self.response_data(bulk), expected_data)
+        self.assertEqual(self.outcome(bulk), expected)
+        self.assertEqual((report.created, report.submitted, report.failed), (3, 2, 1))
+        self.assertEqual([save[1:] for save in expected[1] if save[0] == '01'],
+                         [(False, 'pickup_requested'), (True, 'pending')])
+
+
+@override_settings(BOSTA_SYNC_INTERVALS={'in_transit': 15}, BOSTA_SYNC_MAX_INTERVAL=60)
+class SyncScheduleTests(TestCase):
+    def setUp(self):
+        BostaSettings.objects.create(api_key='key')
+        self.now = timezone.now()
+
+    def shipment(self, phone, status='in_transit', **state):
+        shipment = BostaShipment.objects.create(order=create_order(phone), bosta_tracking_number=f'T{phone}',
+                                                status=status)
+        if state:
+            BostaSyncState.objects.create(shipment=shipment, **state)
+        return shipment
+
+    def due(self, now=None):
+        return set(BostaShipment.objects.filter(due_filter(now or self.now))
+                   .values_list('bosta_tracking_number', flat=True))
+
+    def test_only_due_shipments_match(self):
+        self.shipment('01')
+        self.shipment('02', next_poll_at=self.now - timedelta(minutes=1))
+        self.shipment('03', next_poll_at=self.now)
+        self.shipment('04', next_poll_at=self.now + timedelta(minutes=1))
+        self.shipment('05', status='delivered', next_poll_at=None)
+
+        self.assertEqual(self.due(), {'T01', 'T02', 'T03'})
+
+    def test_sync_reschedules_and_backs_off_while_unchanged(self):
+        in_transit = self.shipment('01')
+        delivered = self.shipment('02')
+        tracking = {'T01': {'state': {'code': 3, 'value': 'In transit'}},
+                    'T02': {'state': {'code': 4, 'value': 'Delivered'}}}
+        service = BostaService()
+
+        intervals = []
+        with mock.patch.object(service, 'fetch_tracking', side_effect=tracking.get):
+            for _ in range(4):
+                sync_tracking([in_transit, delivered], concurrency=1, rate_limit=0, service=service)
+                state = BostaSyncState.objects.get(shipment=in_transit)
+                intervals.append(round((state.next_poll_at - state.last_polled_at).total_seconds() / 60))
+
+        # 15, 30, 60, then capped at BOSTA_SYNC_MAX_INTERVAL
+        self.assertEqual(intervals, [15, 30, 60, 60])
+        self.assertEqual(self.due(), set())
+        self.assertEqual(self.due(self.now + timedelta(days=30)), {'T01'})
+        self.assertIsNone(BostaSyncState.objects.get(shipment=delivered).next_poll_at)
+
+    def test_webhook_restarts_the_schedule(self):
+        shipment = self.shipment('01', next_poll_at=self.now + timedelta(hours=1), unchanged_polls=3,
+                                 last_state_hash='0' * 40)
+
+        record_webhook(shipment, {'state': {'code': 3, 'value': 'In transit'}})
+
+        state = BostaSyncState.objects.get(shipment=shipment)
+        self.assertEqual(state.unchanged_polls, 0)
+        self.assertEqual(round((state.next_poll_at - state.last_polled_at).total_seconds() / 60), 15)
+
+
+class FakeCitiesService:
+    def __init__(self, cities, zones):
+        self.cities = cities
+        self.zones = zones
+
+    def fetch_cities(self):
+        return self.cities
+
+    def fetch_zones(self, city_id):
+        zones = self.zones[city_id]
+        if zones is None:
+            raise BostaAPIError('timeout')
+        return zones
+
+
+class CatalogueTests(TestCase):
+    GIZA = {'_id': 'c-giza', 'code': 'EG-25', 'name': 'Giza', 'nameAr': 'الجيزة (Bosta)'}
+    ALEXANDRIA = {'_id': 'c-alex', 'code': 'EG-02', 'name': 'Alexandria', 'nameAr': 'الإسكندرية'}
+
+    def setUp(self):
+        BostaSettings.objects.create(api_key='key')
+        catalogue.invalidate_catalogue()
+        self.addCleanup(catalogue.invalidate_catalogue)
+
+    def refresh(self, cities, zones):
+        return catalogue.refresh_catalogue(service=FakeCitiesService(cities, zones), concurrency=2, rate_limit=0)
+
+    def test_refresh_upserts_and_deactivates(self):
+        zones = {'c-giza': [{'_id': 'z-dokki', 'name': 'DOKKI', 'nameAr': 'الدقي'}],
+                 'c-alex': [{'_id': 'z-smouha', 'name': 'Smouha'}]}
+        self.assertEqual(self.refresh([self.GIZA, self.ALEXANDRIA], zones),
+                         {'cities': 2, 'zones': 2, 'zone_errors': 0, 'deactivated': 0})
+
+        # Alexandria is gone and Giza's zones can't be fetched this time
+        counts = self.refresh([self.GIZA], {'c-giza': None})
+
+        self.assertEqual((counts['zone_errors'], counts['deactivated']), (1, 1))
+        self.assertEqual(dict(BostaCity.objects.values_list('code', 'is_active')), {'EG-25': True, 'EG-02': False})
+        snapshot = catalogue.get_catalogue()
+        self.assertIsNone(snapshot.city('EG-02'))
+        self.assertEqual(snapshot.zone('EG-25', 'Dokki')['name'], 'DOKKI')
+
+    def test_payload_is_built_from_the_catalogue_without_api_calls(self):
+        self.refresh([self.GIZA], {'c-giza': [{'_id': 'z-dokki', 'name': 'DOKKI', 'nameAr': 'الدقي'}]})
+        order = create_order('01')
+        shipment = BostaShipment(order=order, cod_amount='100.00')
+        service = BostaService()
+
+        with mock.patch.object(service, '_make_request', side_effect=AssertionError('API called')):
+            payload = service.build_shipment_payload(shipment)
+            self.assertEqual(service.get_cities(), [self.GIZA])
+
+        address = payload['dropOffAddress']
+        self.assertEqual((address['cityCode'], address['city'], address['zone']),
+                         ('EG-25', 'الجيزة (Bosta)', 'DOKKI'))
+
+    def test_fresh_snapshot_is_reused(self):
+        snapshot = catalogue.get_catalogue()
+
+        with self.assertNumQueries(0):
+            self.assertIs(catalogue.get_catalogue(), snapshot)
+
+    @override_settings(BOSTA_CATALOGUE_TTL=0)
+    def test_stale_snapshot_is_served_while_one_thread_reloads(self):
+        snapshot = catalogue.get_catalogue()
+        self.addCleanup(setattr, catalogue, '_revalidating', False)
+
+        with mock.patch('shipping.catalogue.threading.Thread') as thread, self.assertNumQueries(0):
+            self.assertIs(catalogue.get_catalogue(), snapshot)
+            self.assertIs(catalogue.get_catalogue(), snapshot)
+
+        thread.assert_called_once()
+        thread.return_value.start.assert_called_once_with()
+
+    @override_settings(BOSTA_CATALOGUE_TTL=0, BOSTA_CATALOGUE_STALE_TTL=0)
+    def test_expired_snapshot_is_reloaded_by_the_caller(self):
+        snapshot = catalogue.get_catalogue()
+
+        self.assertIsNot(catalogue.get_catalogue(), snapshot)
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    def _respond(self):
+        server = self.server
+        length = int(self.headers.get('Content-Length') or 0)
+        self.rfile.read(length)
+        server.requests.append((self.command, self.path))
+        status, headers = server.responses.pop(0) if server.responses else (200, {})
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', '2')
+        self.end_headers()
+        self.wfile.write(b'{}')
+
+    do_GET = do_POST = do_DELETE = _respond
+
+    def log_message(self, format, *args):
+        pass
+
+
+@override_settings(BOSTA_HTTP_MAX_RETRIES=3, BOSTA_HTTP_BACKOFF_FACTOR=0)
+class BostaRetryTests(SimpleTestCase):
+    """The pooled session against a local stub server that answers with scripted statuses."""
+
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+        self.server.requests = []
+        self.server.responses = []
+        thread = threading.Thread(target=self.server.serve_forever, kwargs={'poll_interval': 0.01}, daemon=True)
+        thread.start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        self.session = build_session()
+        self.addCleanup(self.session.close)
+        self.url = f'http://127.0.0.1:{self.server.server_port}/api/v2/deliveries'
+
+    def script(self, *responses):
+        self.server.responses = [response if isinstance(response, tuple) else (response, {})
+                                 for response in responses]
+
+    def test_get_is_retried_on_5xx(self):
+        self.script(503, 502, 200)
+
+        response = self.session.get(self.url, timeout=5)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(self.server.requests), 3)
+
+    def test_last_response_is_returned_when_retries_run_out(self):
+        self.script(500, 500, 500, 500, 200)
+
+        response = self.session.get(self.url, timeout=5)
+
+        self.assertEqual(response.status_code, 500)
+        self.assertEqual(len(self.server.requests), 4)
+
+    def test_post_is_not_retried_on_5xx(self):
+        self.script(503, 201)
+
+        response = self.session.post(self.url, json={'type': 10}, timeout=5)
+
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(self.server.requests, [('POST', '/api/v2/deliveries')])
+
+    def test_post_is_retried_on_429_after_retry_after(self):
+        self.script((429, {'Retry-After': '2'}), 201)
+
+        with mock.patch('urllib3.util.retry.time.sleep') as sleep:
+            response = self.session.post(self.url, json={'type': 10}, timeout=5)
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(self.server.requests), 2)
+        sleep.assert_any_call(2.0)
@@ -19,4 +19,5 @@ urlpatterns = [
     # Admin tools
     path('admin/sync-tracking/', views.sync_all_tracking, name='sync_tracking'),
     path('admin/test-bosta/', views.test_bosta_connection, name='test_bosta'),
+    path('admin/bosta-http-stats/', views.bosta_http_stats, name='bosta_http_stats'),
 ] 
\ No newline at end of file
@@ -15,6 +15,9 @@ from rest_framework import status
 from orders.models import Order
 from .models import BostaShipment, BostaTrackingEvent, BostaSettings
 from .services import BostaService, BostaOrderIntegration, BostaAPIError
+from .http import get_request_stats
+from .sync import sync_tracking
+from .inbox import ingest_webhook
 
 logger = logging.getLogger(__name__)
 
@@ -38,14 +41,16 @@ def bosta_webhook(request):
             # Add webhook signature validation here if Bosta supports it
             pass
         
-        # Process the webhook
-        bosta_service = BostaService()
-        success = bosta_service.handle_webhook(webhook_data)
-        
-        if success:
-            return HttpResponse("OK", status=200)
-        else:
+        # Store the webhook and acknowledge; process_bosta_webhooks applies it
+        try:
+            event, created = ingest_webhook(webhook_data)
+        except ValueError as e:
+            logger.warning(str(e))
             return HttpResponse("Failed to process webhook", status=400)
+        
+        if not created:
+            logger.info(f"Duplicate Bosta webhook for {event.tracking_number} ignored")
+        return HttpResponse("OK", status=200)
             
     except json.JSONDecodeError:
         logger.error("Invalid JSON in webhook payload")
@@ -182,27 +187,17 @@ def sync_all_tracking(request):
     Admin tool to sync tracking information for all active shipments.
     """
     try:
-        bosta_service = BostaService()
-        
         # Get all shipments with tracking numbers that are not delivered
         active_shipments = BostaShipment.objects.filter(
             bosta_tracking_number__isnull=False,
             status__in=['pickup_requested', 'picked_up', 'in_transit']
-        )
+        ).select_related('order')
         
-        updated_count = 0
-        for shipment in active_shipments:
-            try:
-                result = bosta_service.track_shipment(shipment.bosta_tracking_number)
-                if result:
-                    updated_count += 1
-            except Exception as e:
-                logger.error(f"Error syncing tracking for {shipment.bosta_tracking_number}: {str(e)}")
+        report = sync_tracking(active_shipments)
         
         return JsonResponse({
-            'message': f'Synced tracking for {updated_count} out of {active_shipments.count()} shipments',
-            'updated_count': updated_count,
-            'total_shipments': active_shipments.count()
+            'message': f'Synced tracking for {report.total - report.errors} out of {report.total} shipments',
+            **report.as_dict()
         })
         
     except Exception as e:
@@ -210,6 +205,15 @@ def sync_all_tracking(request):
         return JsonResponse({'error': 'Internal server error'}, status=500)
 
 
+@staff_member_required
+@require_http_methods(["GET"])
+def bosta_http_stats(request):
+    """
+    Admin tool showing per-endpoint Bosta API call counts and latency for this process.
+    """
+    return JsonResponse({'endpoints': get_request_stats()})
+
+
 @staff_member_required
 @require_http_methods(["GET"])
 def test_bosta_connection(request):
@@ -227,7 +231,7 @@ def test_bosta_connection(request):
         
         # Test API connection
         bosta_service = BostaService()
-        cities = bosta_service.get_cities()
+        cities = bosta_service.get_cities(use_catalogue=False)
         
         if cities:
             return JsonResponse({
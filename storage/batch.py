@@ -0,0 +1,197 @@
+"""
+Multi-file commits for GitHubStorage.
+
+Inside ``with storage.batch():`` files saved through any GitHubStorage of
+the same repository branch are queued instead of being PUT one commit at a
+time. Leaving the block pushes them as a single commit through the git
+data API:
+
+1. one blob per file, created from a thread pool of
+   GITHUB_STORAGE_BATCH_CONCURRENCY workers (each file is base64-encoded by
+   its worker, just before upload);
+2. one tree on top of the branch head, one commit, and a fast-forward of
+   the branch ref. If the branch moved meanwhile, step 2 is redone on the
+   new head, reusing the blobs.
+
+Every queued file gets a FileResult. With ``raise_on_error`` (the default)
+a BatchUploadError is raised after the commit if any file failed, so a
+surrounding transaction can roll back rows that point at it. Leaving the
+block with an exception discards the queue.
+
+Batches nest: files go to the innermost open batch, which commits them
+when it is left.
+"""
+import base64
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from django.conf import settings
+from django.utils.dateparse import parse_datetime
+from . import index
+
+logger = logging.getLogger(__name__)
+
+REF_UPDATE_ATTEMPTS = 3
+
+_local = threading.local()
+
+
+def active_batch(storage):
+    """The innermost batch open in this thread for ``storage``'s repository branch, or None."""
+    key = index._key(storage)
+    for batch in reversed(getattr(_local, 'stack', ())):
+        if batch.key == key:
+            return batch
+    return None
+
+
+class GitHubAPIError(Exception):
+    def __init__(self, response):
+        self.status_code = response.status_code
+        super().__init__(f"{response.status_code} - {response.text}")
+
+
+class BatchUploadError(Exception):
+    def __init__(self, results):
+        self.results = results
+        failed = [result for result in results if result.error]
+        super().__init__(
+            f"Failed to upload {len(failed)} of {len(results)} files to GitHub: "
+            + '; '.join(f'{result.name}: {result.error}' for result in failed)
+        )
+
+
+class FileResult:
+    """Outcome for one queued file."""
+
+    __slots__ = ('name', 'path', 'size', 'sha', 'error')
+
+    def __init__(self, name, path, size):
+        self.name = name
+        self.path = path
+        self.size = size
+        self.sha = None  # blob sha once created
+        self.error = None
+
+    @property
+    def committed(self):
+        return self.sha is not None and self.error is None
+
+    def __repr__(self):
+        return f'<FileResult {self.path} {"committed" if self.committed else self.error or "pending"}>'
+
+
+class CommitBatch:
+    def __init__(self, storage, message=None, concurrency=None, raise_on_error=True):
+        self.storage = storage
+        self.key = index._key(storage)
+        self.message = message
+        self.concurrency = concurrency or getattr(settings, 'GITHUB_STORAGE_BATCH_CONCURRENCY', 4)
+        self.raise_on_error = raise_on_error
+        self.results = []
+        self.commit_sha = None
+        self._pending = {}  # path -> (FileResult, bytes)
+
+    def __enter__(self):
+        if not hasattr(_local, 'stack'):
+            _local.stack = []
+        _local.stack.append(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        _local.stack.remove(self)
+        if exc_type is not None:
+            self._pending.clear()
+            return False
+        self.commit()
+        return False
+
+    def __contains__(self, path):
+        return path in self._pending
+
+    def add(self, name, path, content):
+        """Queue ``content`` (bytes) for ``path``; a later add() of the same path replaces it."""
+        self._pending[path] = (FileResult(name, path, len(content)), content)
+        return name
+
+    @property
+    def failed(self):
+        return [result for result in self.results if not result.committed]
+
+    def _url(self, endpoint):
+        return f'{self.storage.api_base}/repos/{self.storage.repo_owner}/{self.storage.repo_name}/git/{endpoint}'
+
+    def _request(self, method, endpoint, **kwargs):
+        response = requests.request(method, self._url(endpoint), headers=self.storage._get_headers(), **kwargs)
+        if response.status_code not in [200, 201]:
+            raise GitHubAPIError(response)
+        return response.json()
+
+    def _create_blob(self, item):
+        result, content = item
+        try:
+            data = self._request('POST', 'blobs', json={
+                'content': base64.b64encode(content).decode('utf-8'),
+                'encoding': 'base64',
+            })
+            result.sha = data['sha']
+        except Exception as e:
+            result.error = str(e)
+        return result
+
+    def _push(self, results):
+        """Commit ``results`` on top of the branch head; returns the commit data."""
+        tree = [{'path': result.path, 'mode': '100644', 'type': 'blob', 'sha': result.sha} for result in results]
+        for attempt in range(1, REF_UPDATE_ATTEMPTS + 1):
+            head = self._request('GET', f'ref/heads/{self.storage.branch}')['object']['sha']
+            base_tree = self._request('GET', f'commits/{head}')['tree']['sha']
+            new_tree = self._request('POST', 'trees', json={'base_tree': base_tree, 'tree': tree})['sha']
+            commit = self._request('POST', 'commits', json={
+                'message': self.message or f'Upload {len(results)} files via Django admin',
+                'tree': new_tree,
+                'parents': [head],
+            })
+            try:
+                self._request('PATCH', f'refs/heads/{self.storage.branch}', json={'sha': commit['sha']})
+                return commit
+            except GitHubAPIError as e:
+                # 422: not a fast-forward, someone else committed first
+                if e.status_code != 422 or attempt == REF_UPDATE_ATTEMPTS:
+                    raise
+                logger.warning(f"Branch {self.storage.branch} moved during batch upload; retrying")
+
+    def commit(self):
+        """Push the queued files as one commit and return their FileResults."""
+        items = list(self._pending.values())
+        self._pending.clear()
+        if not items:
+            return self.results
+
+        with ThreadPoolExecutor(max_workers=max(1, min(self.concurrency, len(items)))) as pool:
+            results = list(pool.map(self._create_blob, items))
+        del items
+        self.results.extend(results)
+
+        blobs = [result for result in results if result.sha]
+        if blobs:
+            try:
+                commit = self._push(blobs)
+            except Exception as e:
+                for result in blobs:
+                    result.error = f'Commit failed: {str(e)}'
+            else:
+                self.commit_sha = commit['sha']
+                if index.index_enabled():
+                    date = (commit.get('committer') or {}).get('date')
+                    index.record_many(self.storage, [(result.path, result.sha, result.size) for result in blobs],
+                                      modified=parse_datetime(date) if date else None)
+
+        failed = [result for result in results if not result.committed]
+        if failed:
+            logger.error(f"GitHub batch upload: {len(failed)} of {len(results)} files failed")
+            if self.raise_on_error:
+                raise BatchUploadError(results)
+        return self.results
+
@@ -0,0 +1,151 @@
+"""
+On-disk read-through cache for GitHubStorage._open.
+
+Files are stored by git blob sha under GITHUB_STORAGE_CACHE_DIR
+(``<dir>/ab/abcdef...``), so a path that is overwritten simply gets a new
+entry and nothing needs invalidating. The sha of a path comes from the
+metadata index (storage.index).
+
+- Downloads are streamed to a temporary file in GITHUB_STORAGE_CHUNK_SIZE
+  chunks, hashed, and renamed into place under their blob sha. If that
+  differs from the indexed sha the file was changed outside the storage,
+  and the index is corrected.
+- Hits are opened with mmap, so reading a large file doesn't copy it into
+  one bytes object.
+- The cache is kept under GITHUB_STORAGE_CACHE_MAX_SIZE bytes by removing
+  the least recently used entries (a hit refreshes the entry's mtime).
+"""
+import hashlib
+import mmap
+import os
+import tempfile
+import threading
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.files.base import ContentFile, File
+
+
+def git_blob_sha(fileobj, size):
+    """Git blob sha of ``size`` bytes read from ``fileobj``."""
+    digest = hashlib.sha1(f'blob {size}\0'.encode())
+    for chunk in iter(lambda: fileobj.read(1024 * 1024), b''):
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+class MappedFile(File):
+    """A read-only File over a memory-mapped cache entry."""
+
+    def __init__(self, path, name=None):
+        self._fd = open(path, 'rb')
+        try:
+            data = mmap.mmap(self._fd.fileno(), 0, access=mmap.ACCESS_READ)
+        except Exception:
+            self._fd.close()
+            raise
+        super().__init__(data, name)
+        self.size = len(data)
+
+    def close(self):
+        super().close()
+        self._fd.close()
+
+
+class BlobCache:
+    def __init__(self, directory, max_size):
+        self.directory = directory
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._size = None  # bytes on disk, counted on first write
+
+    def path(self, sha):
+        return os.path.join(self.directory, sha[:2], sha)
+
+    def get(self, sha):
+        """Path of the cached blob, or None."""
+        path = self.path(sha)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return path
+
+    def put(self, chunks):
+        """Write ``chunks`` to the cache under their blob sha. Returns (sha, path)."""
+        os.makedirs(self.directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix='.download-')
+        try:
+            with os.fdopen(fd, 'w+b') as tmp:
+                for chunk in chunks:
+                    tmp.write(chunk)
+                size = tmp.tell()
+                tmp.seek(0)
+                sha = git_blob_sha(tmp, size)
+            path = self.path(sha)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+        self._added(size, keep=path)
+        return sha, path
+
+    def _entries(self):
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                if name.startswith('.'):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                yield stat.st_mtime, stat.st_size, path
+
+    def _added(self, size, keep):
+        with self._lock:
+            if self._size is None:
+                self._size = sum(entry_size for _, entry_size, _ in self._entries())
+            else:
+                self._size += size
+            if self._size > self.max_size:
+                self._evict(keep)
+
+    def _evict(self, keep):
+        # Other processes share the directory, so recount before evicting
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        # Free a margin so every write doesn't trigger a scan
+        target = self.max_size * 0.9
+        for _, size, path in entries:
+            if total <= target:
+                break
+            if path == keep:
+                continue
+            try:
+                os.unlink(path)
+                total -= size
+            except FileNotFoundError:
+                pass
+        self._size = total
+
+    def open(self, path, name=None):
+        if os.path.getsize(path) == 0:
+            # mmap can't map an empty file
+            return ContentFile(b'', name=name)
+        return MappedFile(path, name)
+
+
+@lru_cache(maxsize=None)
+def _get_cache(directory, max_size):
+    return BlobCache(directory, max_size)
+
+
+def get_blob_cache():
+    """The configured BlobCache, or None if GITHUB_STORAGE_CACHE_DIR isn't set."""
+    directory = getattr(settings, 'GITHUB_STORAGE_CACHE_DIR', None)
+    if not directory:
+        return None
+    return _get_cache(directory, getattr(settings, 'GITHUB_STORAGE_CACHE_MAX_SIZE', 512 * 1024 * 1024))
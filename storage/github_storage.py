@@ -1,12 +1,43 @@
 import base64
+import logging
 import os
 import io
+import tempfile
 import requests
+from functools import lru_cache
 from urllib.parse import urljoin
 from django.core.files.storage import Storage
-from django.core.files.base import ContentFile
+from django.core.files.base import File
 from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
 from django.utils.deconstruct import deconstructible
+from django.utils.functional import cached_property
+from . import index
+from .batch import CommitBatch, active_batch
+from .cache import get_blob_cache
+
+logger = logging.getLogger(__name__)
+
+
+@lru_cache(maxsize=None)
+def _get_setting(name, default=None):
+    # Every model field creates its own storage; read each setting once
+    return getattr(settings, name, default)
+
+
+@receiver(setting_changed)
+def _reset_settings(setting, **kwargs):
+    if setting.startswith('GITHUB_'):
+        _get_setting.cache_clear()
+        _warn_cache_needs_index.cache_clear()
+
+
+@lru_cache(maxsize=None)
+def _warn_cache_needs_index():
+    # Logged once per process rather than on every read
+    logger.warning("GITHUB_STORAGE_CACHE_DIR is set but the metadata index is off "
+                   "(GITHUB_STORAGE_INDEX or the 'storage' app); reads are not cached")
 
 
 @deconstructible
@@ -15,14 +46,16 @@ class GitHubStorage(Storage):
     Custom Django storage backend for GitHub repositories.
     Uploads files directly to a GitHub repository via GitHub API.
     """
+    # Setting (and default) that holds the path files are stored under
+    base_path_setting = ('GITHUB_STORAGE_BASE_PATH', 'media/')
     
     def __init__(self, **kwargs):
         # GitHub configuration
-        self.github_token = getattr(settings, 'GITHUB_STORAGE_TOKEN', None)
-        self.repo_owner = getattr(settings, 'GITHUB_STORAGE_REPO_OWNER', None)
-        self.repo_name = getattr(settings, 'GITHUB_STORAGE_REPO_NAME', None)
-        self.branch = getattr(settings, 'GITHUB_STORAGE_BRANCH', 'main')
-        self.base_path = getattr(settings, 'GITHUB_STORAGE_BASE_PATH', 'media/')
+        self.github_token = _get_setting('GITHUB_STORAGE_TOKEN')
+        self.repo_owner = _get_setting('GITHUB_STORAGE_REPO_OWNER')
+        self.repo_name = _get_setting('GITHUB_STORAGE_REPO_NAME')
+        self.branch = _get_setting('GITHUB_STORAGE_BRANCH', 'main')
+        self.base_path = _get_setting(*self.base_path_setting)
         
         # API endpoints
         self.api_base = 'https://api.github.com'
@@ -31,6 +64,13 @@ class GitHubStorage(Storage):
         if not all([self.github_token, self.repo_owner, self.repo_name]):
             raise ValueError("GitHub storage requires GITHUB_STORAGE_TOKEN, GITHUB_STORAGE_REPO_OWNER, and GITHUB_STORAGE_REPO_NAME settings")
     
+    def batch(self, message=None, concurrency=None, raise_on_error=True):
+        """
+        Context manager that commits every file saved inside it (through any
+        storage on this repository branch) as one commit; see storage.batch.
+        """
+        return CommitBatch(self, message=message, concurrency=concurrency, raise_on_error=raise_on_error)
+    
     def _get_api_url(self, name):
         """Get GitHub API URL for file operations"""
         path = self._normalize_name(name)
@@ -57,12 +97,31 @@ class GitHubStorage(Storage):
             'Content-Type': 'application/json',
         }
     
-    def _get_file_info(self, name):
-        """Get file information from GitHub (for updates)"""
+    def _get_file_info(self, name, use_index=True):
+        """
+        Get file information (at least sha and size), or None if the file
+        doesn't exist. Answered from the metadata index (storage.index)
+        when it can; ``use_index=False`` always asks GitHub.
+        """
+        path = self._normalize_name(name)
+        indexed = index.index_enabled()
+        if indexed and use_index:
+            found, row = index.lookup(self, path)
+            if found:
+                return {'path': row.path, 'sha': row.sha, 'size': row.size, 'modified': row.modified}
+            if found is False:
+                return None
+
         url = self._get_api_url(name)
         response = requests.get(url, headers=self._get_headers())
         if response.status_code == 200:
-            return response.json()
+            info = response.json()
+            # Directories come back as a list of entries
+            if indexed and isinstance(info, dict) and info.get('type') == 'file':
+                index.record(self, path, info['sha'], info.get('size'))
+            return info
+        if response.status_code == 404 and indexed:
+            index.forget(self, path)
         return None
     
     def _save(self, name, content):
@@ -77,12 +136,27 @@ class GitHubStorage(Storage):
         if isinstance(file_content, str):
             file_content = file_content.encode('utf-8')
         
+        batch = active_batch(self)
+        if batch is not None:
+            return batch.add(name, self._normalize_name(name), file_content)
+        
         # Encode content as base64
         encoded_content = base64.b64encode(file_content).decode('utf-8')
         
-        # Check if file already exists (for updates)
-        existing_file = self._get_file_info(name)
+        response = self._put(name, encoded_content, self._get_file_info(name))
+        if response.status_code in [409, 422]:
+            # The sha we sent (or didn't send) was stale; retry once with
+            # the file's current metadata from GitHub
+            response = self._put(name, encoded_content, self._get_file_info(name, use_index=False))
         
+        if response.status_code in [200, 201]:
+            if index.index_enabled():
+                index.record_response(self, self._normalize_name(name), response.json())
+            return name
+        else:
+            raise Exception(f"Failed to upload file to GitHub: {response.status_code} - {response.text}")
+    
+    def _put(self, name, encoded_content, existing_file):
         # Prepare request data
         data = {
             'message': f'Upload {os.path.basename(name)} via Django admin',
@@ -97,22 +171,48 @@ class GitHubStorage(Storage):
         
         # Upload to GitHub
         url = self._get_api_url(name)
-        response = requests.put(url, json=data, headers=self._get_headers())
-        
-        if response.status_code in [200, 201]:
-            return name
-        else:
-            raise Exception(f"Failed to upload file to GitHub: {response.status_code} - {response.text}")
+        return requests.put(url, json=data, headers=self._get_headers())
     
     def _open(self, name, mode='rb'):
-        """Open file from GitHub repository"""
-        url = self._get_raw_url(name)
-        response = requests.get(url)
+        """
+        Open file from GitHub repository. With GITHUB_STORAGE_CACHE_DIR set,
+        reads go through the local blob cache (storage.cache), which is
+        keyed by the sha from the metadata index and so needs it.
+        """
+        cache = get_blob_cache()
+        if cache is not None and not index.index_enabled():
+            _warn_cache_needs_index()
+            cache = None
+        sha = None
+        if cache is not None:
+            file_info = self._get_file_info(name)
+            if not isinstance(file_info, dict):
+                raise FileNotFoundError(f"File {name} not found in GitHub repository")
+            sha = file_info['sha']
+            cached = cache.get(sha)
+            if cached:
+                return cache.open(cached, name)
         
-        if response.status_code == 200:
-            return ContentFile(response.content)
-        else:
-            raise FileNotFoundError(f"File {name} not found in GitHub repository")
+        url = self._get_raw_url(name)
+        chunk_size = getattr(settings, 'GITHUB_STORAGE_CHUNK_SIZE', 64 * 1024)
+        with requests.get(url, stream=True) as response:
+            if response.status_code != 200:
+                raise FileNotFoundError(f"File {name} not found in GitHub repository")
+            
+            if cache is not None:
+                actual_sha, cached = cache.put(response.iter_content(chunk_size))
+                if actual_sha != sha:
+                    # Changed outside the storage since it was indexed
+                    index.record(self, self._normalize_name(name), actual_sha, os.path.getsize(cached))
+                return cache.open(cached, name)
+            
+            # Small files stay in memory, larger ones spill to disk
+            spooled = tempfile.SpooledTemporaryFile(
+                max_size=getattr(settings, 'GITHUB_STORAGE_SPOOL_MAX_SIZE', 2 * 1024 * 1024))
+            for chunk in response.iter_content(chunk_size):
+                spooled.write(chunk)
+            spooled.seek(0)
+            return File(spooled, name)
     
     def delete(self, name):
         """Delete file from GitHub repository"""
@@ -121,20 +221,34 @@ class GitHubStorage(Storage):
         if not existing_file:
             return  # File doesn't exist, nothing to delete
         
+        response = self._delete(name, existing_file['sha'])
+        if response.status_code in [404, 409, 422]:
+            # Stale index entry; retry once with the file's current sha
+            existing_file = self._get_file_info(name, use_index=False)
+            if not existing_file:
+                return
+            response = self._delete(name, existing_file['sha'])
+        
+        if response.status_code not in [200, 204]:
+            raise Exception(f"Failed to delete file from GitHub: {response.status_code} - {response.text}")
+        if index.index_enabled():
+            index.forget(self, self._normalize_name(name))
+    
+    def _delete(self, name, sha):
         data = {
             'message': f'Delete {os.path.basename(name)} via Django admin',
-            'sha': existing_file['sha'],
+            'sha': sha,
             'branch': self.branch,
         }
         
         url = self._get_api_url(name)
-        response = requests.delete(url, json=data, headers=self._get_headers())
-        
-        if response.status_code not in [200, 204]:
-            raise Exception(f"Failed to delete file from GitHub: {response.status_code} - {response.text}")
+        return requests.delete(url, json=data, headers=self._get_headers())
     
     def exists(self, name):
         """Check if file exists in GitHub repository"""
+        batch = active_batch(self)
+        if batch is not None and self._normalize_name(name) in batch:
+            return True
         file_info = self._get_file_info(name)
         return file_info is not None
     
@@ -168,9 +282,17 @@ class GitHubStorage(Storage):
             return file_info.get('size', 0)
         raise FileNotFoundError(f"File {name} not found")
     
+    @cached_property
+    def url_prefix(self):
+        """Raw URL of the base path; a stored name's URL is this plus the name"""
+        return f"{self.raw_base}/{self._normalize_name('')}"
+    
     def url(self, name):
         """Get public URL for the file"""
-        return self._get_raw_url(name)
+        # Names this storage hands out are already relative to base_path
+        if name[:1] == '/' or '\\' in name or (self.base_path and name.startswith(self.base_path)):
+            return self._get_raw_url(name)
+        return self.url_prefix + name
     
     def get_accessed_time(self, name):
         """GitHub doesn't provide access time"""
@@ -181,7 +303,11 @@ class GitHubStorage(Storage):
         raise NotImplementedError()
     
     def get_modified_time(self, name):
-        """GitHub doesn't provide modification time in a simple way"""
+        """Commit time of the last change made through this storage, if indexed"""
+        file_info = self._get_file_info(name)
+        if file_info and file_info.get('modified'):
+            return file_info['modified']
+        # GitHub doesn't provide modification time in a simple way
         raise NotImplementedError()
 
 
@@ -189,19 +315,11 @@ class GitHubMediaStorage(GitHubStorage):
     """
     Specific storage for media files with media-specific configuration
     """
-    
-    def __init__(self, **kwargs):
-        super().__init__(**kwargs)
-        # Override base path for media files
-        self.base_path = getattr(settings, 'GITHUB_MEDIA_PATH', 'media/')
+    base_path_setting = ('GITHUB_MEDIA_PATH', 'media/')
 
 
 class GitHubStaticStorage(GitHubStorage):
     """
     Specific storage for static files with static-specific configuration
     """
-    
-    def __init__(self, **kwargs):
-        super().__init__(**kwargs)
-        # Override base path for static files
-        self.base_path = getattr(settings, 'GITHUB_STATIC_PATH', 'static/') 
\ No newline at end of file
+    base_path_setting = ('GITHUB_STATIC_PATH', 'static/') 
\ No newline at end of file
@@ -0,0 +1,173 @@
+"""
+Local metadata index for GitHubStorage.
+
+GitHubFile keeps path -> (blob sha, size, modified time) for the files of a
+repository branch, so exists(), size(), delete() and _save() don't need a
+contents API GET per call:
+
+- refresh_index() (run by the refresh_github_index command) rebuilds the
+  rows of a branch from one recursive git tree request;
+- writes through the storage record the sha and size from the PUT response
+  and remove the row after a DELETE;
+- a lookup that finds a row uses it. A miss is trusted as "no such file"
+  only if the branch was fully refreshed within GITHUB_STORAGE_INDEX_MAX_AGE
+  seconds; otherwise the storage asks the contents API and records the
+  answer.
+
+A row can go stale if the repository is changed outside the storage; the
+storage then gets a sha conflict on write and retries with fresh metadata.
+"""
+import logging
+from collections import deque
+from datetime import timedelta
+
+import requests
+from django.apps import apps
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+logger = logging.getLogger(__name__)
+
+
+class IndexRefreshError(Exception):
+    """The git tree of a branch couldn't be fetched."""
+
+
+def index_enabled():
+    return getattr(settings, 'GITHUB_STORAGE_INDEX', True) and apps.is_installed('storage')
+
+
+def _key(storage):
+    return {'repository': f'{storage.repo_owner}/{storage.repo_name}', 'branch': storage.branch}
+
+
+def lookup(storage, path):
+    """
+    Index answer for ``path``: (True, row) if indexed, (False, None) if the
+    index knows the file doesn't exist, (None, None) if it can't tell.
+    """
+    from .models import GitHubFile, GitHubIndexState
+
+    key = _key(storage)
+    row = GitHubFile.objects.filter(path=path, **key).first()
+    if row is not None:
+        return True, row
+
+    max_age = getattr(settings, 'GITHUB_STORAGE_INDEX_MAX_AGE', 24 * 60 * 60)
+    complete = GitHubIndexState.objects.filter(
+        refreshed_at__gte=timezone.now() - timedelta(seconds=max_age), **key).exists()
+    return (False, None) if complete else (None, None)
+
+
+def record(storage, path, sha, size, modified=None):
+    """Store the metadata of a file the storage has just written or fetched."""
+    from .models import GitHubFile
+
+    GitHubFile.objects.update_or_create(
+        path=path,
+        defaults={'sha': sha, 'size': size or 0, 'modified': modified, 'refreshed_at': timezone.now()},
+        **_key(storage),
+    )
+
+
+def record_many(storage, files, modified=None):
+    """record() for many (path, sha, size) at once, e.g. after a batch commit."""
+    from .models import GitHubFile
+
+    now = timezone.now()
+    GitHubFile.objects.bulk_create(
+        [GitHubFile(path=path, sha=sha, size=size or 0, modified=modified, refreshed_at=now, **_key(storage))
+         for path, sha, size in files],
+        update_conflicts=True,
+        unique_fields=['repository', 'branch', 'path'],
+        update_fields=['sha', 'size', 'modified', 'refreshed_at'],
+    )
+
+
+def record_response(storage, path, data):
+    """record() from a contents API PUT response."""
+    content = data.get('content') or {}
+    committer = (data.get('commit') or {}).get('committer') or {}
+    modified = parse_datetime(committer['date']) if committer.get('date') else None
+    if content.get('sha'):
+        record(storage, content.get('path') or path, content['sha'], content.get('size'), modified)
+
+
+def forget(storage, path):
+    from .models import GitHubFile
+
+    GitHubFile.objects.filter(path=path, **_key(storage)).delete()
+
+
+def _get_tree(storage, tree, recursive=False):
+    url = f'{storage.api_base}/repos/{storage.repo_owner}/{storage.repo_name}/git/trees/{tree}'
+    response = requests.get(url, headers=storage._get_headers(), params={'recursive': 1} if recursive else None)
+    if response.status_code != 200:
+        raise IndexRefreshError(f"Failed to fetch git tree {tree}: {response.status_code} - {response.text}")
+    return response.json()
+
+
+def fetch_tree(storage):
+    """
+    (tree sha, [(path, blob sha, size)]) for every file on the storage's
+    branch. Falls back to walking the tree level by level when GitHub
+    truncates the recursive listing.
+    """
+    data = _get_tree(storage, storage.branch, recursive=True)
+    if not data.get('truncated'):
+        return data['sha'], [(item['path'], item['sha'], item.get('size', 0))
+                             for item in data['tree'] if item['type'] == 'blob']
+
+    logger.warning(f"Git tree of {storage.branch} is truncated; walking it directory by directory")
+    files = []
+    pending = deque([('', data['sha'])])
+    while pending:
+        prefix, sha = pending.popleft()
+        for item in _get_tree(storage, sha)['tree']:
+            path = f'{prefix}{item["path"]}'
+            if item['type'] == 'tree':
+                pending.append((f'{path}/', item['sha']))
+            elif item['type'] == 'blob':
+                files.append((path, item['sha'], item.get('size', 0)))
+    return data['sha'], files
+
+
+def refresh_index(storage):
+    """
+    Rebuild the index of the storage's branch from its git tree. Returns a
+    dict of counts. Raises IndexRefreshError if the tree can't be fetched.
+    """
+    from .models import GitHubFile, GitHubIndexState
+
+    key = _key(storage)
+    started = timezone.now()
+    tree_sha, files = fetch_tree(storage)
+
+    with transaction.atomic():
+        # Rows written by the storage while the tree was being fetched are
+        # newer than the tree; leave them alone
+        newer = set(GitHubFile.objects.filter(refreshed_at__gte=started, **key).values_list('path', flat=True))
+        # Keep the modified time of files whose content hasn't changed
+        known = {path: (sha, modified) for path, sha, modified in
+                 GitHubFile.objects.filter(**key).values_list('path', 'sha', 'modified')}
+        rows = []
+        for path, sha, size in files:
+            if path in newer:
+                continue
+            old_sha, modified = known.get(path, (None, None))
+            rows.append(GitHubFile(path=path, sha=sha, size=size, modified=modified if old_sha == sha else None,
+                                   refreshed_at=started, **key))
+        GitHubFile.objects.bulk_create(
+            rows,
+            update_conflicts=True,
+            unique_fields=['repository', 'branch', 'path'],
+            update_fields=['sha', 'size', 'modified', 'refreshed_at'],
+            batch_size=1000,
+        )
+        removed, _ = GitHubFile.objects.filter(refreshed_at__lt=started, **key).delete()
+        GitHubIndexState.objects.update_or_create(
+            defaults={'tree_sha': tree_sha, 'files': len(files), 'refreshed_at': started}, **key)
+
+    return {'files': len(files), 'updated': len(rows), 'removed': removed}
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+from storage.github_storage import GitHubMediaStorage
+from storage.index import IndexRefreshError, refresh_index
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the GitHub storage metadata index from the repository tree'
+
+    def handle(self, *args, **options):
+        try:
+            storage = GitHubMediaStorage()
+        except Exception as e:
+            self.stdout.write(
+                self.style.ERROR(f'Failed to initialize GitHub storage: {str(e)}')
+            )
+            return
+
+        try:
+            counts = refresh_index(storage)
+        except IndexRefreshError as e:
+            self.stdout.write(self.style.ERROR(str(e)))
+            return
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Index of {storage.repo_owner}/{storage.repo_name}@{storage.branch} refreshed: "
+            f"{counts['files']} files, {counts['removed']} removed"
+        ))
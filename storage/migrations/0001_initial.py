@@ -0,0 +1,46 @@
+# Generated by Django 5.2.3 on 2026-10-18 01:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GitHubFile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('repository', models.CharField(help_text='owner/name', max_length=200)),
+                ('branch', models.CharField(max_length=100)),
+                ('path', models.CharField(help_text='Path in the repository, including the storage base path', max_length=500)),
+                ('sha', models.CharField(help_text='Git blob sha', max_length=40)),
+                ('size', models.PositiveBigIntegerField(default=0)),
+                ('modified', models.DateTimeField(blank=True, null=True)),
+                ('refreshed_at', models.DateTimeField()),
+            ],
+            options={
+                'verbose_name': 'GitHub File',
+                'verbose_name_plural': 'GitHub Files',
+                'constraints': [models.UniqueConstraint(fields=('repository', 'branch', 'path'), name='unique_github_file_path')],
+            },
+        ),
+        migrations.CreateModel(
+            name='GitHubIndexState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('repository', models.CharField(max_length=200)),
+                ('branch', models.CharField(max_length=100)),
+                ('tree_sha', models.CharField(blank=True, max_length=40)),
+                ('files', models.PositiveIntegerField(default=0)),
+                ('refreshed_at', models.DateTimeField()),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('repository', 'branch'), name='unique_github_index_state')],
+            },
+        ),
+    ]
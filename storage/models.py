@@ -0,0 +1,45 @@
+from django.db import models
+
+
+class GitHubFile(models.Model):
+    """
+    A file GitHubStorage knows about in a repository branch, so metadata
+    calls (exists, size, the sha needed to update or delete) don't go to
+    the contents API. Maintained by storage.index.
+    """
+    repository = models.CharField(max_length=200, help_text="owner/name")
+    branch = models.CharField(max_length=100)
+    path = models.CharField(max_length=500, help_text="Path in the repository, including the storage base path")
+    sha = models.CharField(max_length=40, help_text="Git blob sha")
+    size = models.PositiveBigIntegerField(default=0)
+    # Commit time of the last change made through the storage; the tree API
+    # doesn't report it, so files only seen by a refresh have none
+    modified = models.DateTimeField(null=True, blank=True)
+    refreshed_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['repository', 'branch', 'path'], name='unique_github_file_path'),
+        ]
+        verbose_name = "GitHub File"
+        verbose_name_plural = "GitHub Files"
+
+    def __str__(self):
+        return f"{self.repository}@{self.branch}:{self.path}"
+
+
+class GitHubIndexState(models.Model):
+    """When the GitHubFile rows of a repository branch were last rebuilt from its git tree."""
+    repository = models.CharField(max_length=200)
+    branch = models.CharField(max_length=100)
+    tree_sha = models.CharField(max_length=40, blank=True)
+    files = models.PositiveIntegerField(default=0)
+    refreshed_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['repository', 'branch'], name='unique_github_index_state'),
+        ]
+
+    def __str__(self):
+        return f"{self.repository}@{self.branch} ({self.files} files, {self.refreshed_at})"
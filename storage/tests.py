@@ -0,0 +1,414 @@
+import base64
+import io
+import json
+import tempfile
+from datetime import datetime, timedelta, timezone as dt_timezone
+from unittest import mock
+
+from django.core.files.base import ContentFile
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from . import index
+from .batch import BatchUploadError
+from .cache import git_blob_sha
+from .github_storage import GitHubStorage
+from .models import GitHubFile, GitHubIndexState
+
+COMMIT_DATE = '2026-01-02T03:04:05Z'
+
+
+def blob_sha(content):
+    return git_blob_sha(io.BytesIO(content), len(content))
+
+
+class FakeResponse:
+    def __init__(self, status_code, data=None):
+        self.status_code = status_code
+        self._data = data
+
+    @property
+    def text(self):
+        return json.dumps(self._data)
+
+    def json(self):
+        return self._data
+
+    def iter_content(self, chunk_size):
+        for start in range(0, len(self._data), chunk_size):
+            yield self._data[start:start + chunk_size]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+class FakeGitHub:
+    """
+    Stands in for the ``requests`` module: just enough of the contents and
+    git APIs for GitHubStorage, storage.index and storage.batch. Every call
+    is logged.
+    """
+
+    def __init__(self):
+        self.files = {}  # path -> bytes
+        self.trees = {}  # tree sha or branch -> git trees API response
+        self.calls = []
+        # Git data API: the branch head, created objects, blob contents that fail
+        self.head = 'base'
+        self.blobs = {}
+        self.new_trees = {}
+        self.commits = {}
+        self.bad_blobs = set()
+        # Ref updates that lose the race to a commit made elsewhere
+        self.racing_commits = 0
+
+    def _path(self, url):
+        return url.split('/contents/', 1)[1]
+
+    def get(self, url, headers=None, params=None, **kwargs):
+        self.calls.append(('GET', url))
+        if url.startswith('https://raw.githubusercontent.com/'):
+            content = self.files.get(url.split('/', 6)[6])
+            return FakeResponse(200, content) if content is not None else FakeResponse(404, b'')
+        if '/git/trees/' in url:
+            tree = self.trees.get(url.rsplit('/', 1)[1])
+            return FakeResponse(200, tree) if tree else FakeResponse(404, {'message': 'Not Found'})
+        path = self._path(url)
+        if path not in self.files:
+            return FakeResponse(404, {'message': 'Not Found'})
+        content = self.files[path]
+        return FakeResponse(200, {'type': 'file', 'path': path, 'sha': blob_sha(content), 'size': len(content)})
+
+    def put(self, url, json=None, headers=None, **kwargs):
+        self.calls.append(('PUT', url))
+        path = self._path(url)
+        if path in self.files and json.get('sha') != blob_sha(self.files[path]):
+            return FakeResponse(409, {'message': 'sha does not match'})
+        content = base64.b64decode(json['content'])
+        self.files[path] = content
+        return FakeResponse(201, {
+            'content': {'path': path, 'sha': blob_sha(content), 'size': len(content)},
+            'commit': {'committer': {'date': COMMIT_DATE}},
+        })
+
+    def delete(self, url, json=None, headers=None, **kwargs):
+        self.calls.append(('DELETE', url))
+        path = self._path(url)
+        if path not in self.files:
+            return FakeResponse(404, {'message': 'Not Found'})
+        if json.get('sha') != blob_sha(self.files[path]):
+            return FakeResponse(409, {'message': 'sha does not match'})
+        del self.files[path]
+        return FakeResponse(200, {'commit': {'committer': {'date': COMMIT_DATE}}})
+
+    def request(self, method, url, json=None, headers=None, **kwargs):
+        self.calls.append((method, url))
+        endpoint = url.split('/git/', 1)[1]
+        if endpoint == 'blobs':
+            content = base64.b64decode(json['content'])
+            if content in self.bad_blobs:
+                return FakeResponse(500, {'message': 'Server Error'})
+            sha = blob_sha(content)
+            self.blobs[sha] = content
+            return FakeResponse(201, {'sha': sha})
+        if endpoint.startswith('ref/heads/'):
+            return FakeResponse(200, {'object': {'sha': self.head}})
+        if endpoint.startswith('commits/'):
+            return FakeResponse(200, {'sha': endpoint.split('/')[1], 'tree': {'sha': f'tree-of-{self.head}'}})
+        if endpoint == 'trees':
+            sha = f'tree-{len(self.new_trees)}'
+            self.new_trees[sha] = json['tree']
+            return FakeResponse(201, {'sha': sha})
+        if endpoint == 'commits':
+            sha = f'commit-{len(self.commits)}'
+            self.commits[sha] = json
+            return FakeResponse(201, {'sha': sha, 'committer': {'date': COMMIT_DATE}})
+        # PATCH refs/heads/<branch>
+        if self.racing_commits:
+            self.racing_commits -= 1
+            self.head = f'elsewhere-{self.racing_commits}'
+        commit = self.commits[json['sha']]
+        if commit['parents'] != [self.head]:
+            return FakeResponse(422, {'message': 'Update is not a fast forward'})
+        for entry in self.new_trees[commit['tree']]:
+            self.files[entry['path']] = self.blobs[entry['sha']]
+        self.head = json['sha']
+        return FakeResponse(200, {'object': {'sha': json['sha']}})
+
+
+@override_settings(
+    GITHUB_STORAGE_TOKEN='token',
+    GITHUB_STORAGE_REPO_OWNER='owner',
+    GITHUB_STORAGE_REPO_NAME='repo',
+    GITHUB_STORAGE_BRANCH='main',
+    GITHUB_STORAGE_BASE_PATH='media/',
+    GITHUB_STORAGE_INDEX=True,
+    GITHUB_STORAGE_CACHE_DIR=None,
+)
+class GitHubStorageTestCase(TestCase):
+    def setUp(self):
+        self.github = FakeGitHub()
+        for module in ('storage.github_storage', 'storage.index', 'storage.batch'):
+            patcher = mock.patch(f'{module}.requests', self.github)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.storage = GitHubStorage()
+
+    def row(self, path):
+        return GitHubFile.objects.filter(repository='owner/repo', branch='main', path=path).first()
+
+
+class IndexedMetadataTests(GitHubStorageTestCase):
+    def test_indexed_file_is_answered_without_requests(self):
+        index.record(self.storage, 'media/a.jpg', 'a' * 40, 42)
+
+        self.assertTrue(self.storage.exists('a.jpg'))
+        self.assertEqual(self.storage.size('a.jpg'), 42)
+        self.assertEqual(self.github.calls, [])
+
+    def test_missing_file_is_answered_without_requests_after_refresh(self):
+        GitHubIndexState.objects.create(repository='owner/repo', branch='main', tree_sha='t' * 40,
+                                        files=0, refreshed_at=timezone.now())
+
+        self.assertFalse(self.storage.exists('missing.jpg'))
+        self.assertEqual(self.github.calls, [])
+
+    def test_stale_refresh_asks_github(self):
+        GitHubIndexState.objects.create(repository='owner/repo', branch='main', tree_sha='t' * 40,
+                                        files=0, refreshed_at=timezone.now() - timedelta(days=30))
+
+        self.assertFalse(self.storage.exists('missing.jpg'))
+        self.assertEqual(len(self.github.calls), 1)
+
+    def test_unindexed_file_is_fetched_once_and_recorded(self):
+        self.github.files['media/a.jpg'] = b'abc'
+
+        self.assertTrue(self.storage.exists('a.jpg'))
+        self.assertTrue(self.storage.exists('a.jpg'))
+        self.assertEqual(len(self.github.calls), 1)
+        self.assertEqual(self.row('media/a.jpg').sha, blob_sha(b'abc'))
+
+    def test_save_records_put_response(self):
+        name = self.storage.save('a.jpg', ContentFile(b'data'))
+
+        row = self.row('media/a.jpg')
+        self.assertEqual(name, 'a.jpg')
+        self.assertEqual((row.sha, row.size), (blob_sha(b'data'), 4))
+        self.assertEqual(row.modified, datetime(2026, 1, 2, 3, 4, 5, tzinfo=dt_timezone.utc))
+
+    def test_save_over_stale_row_retries_with_current_sha(self):
+        self.github.files['media/a.jpg'] = b'changed outside the storage'
+        index.record(self.storage, 'media/a.jpg', blob_sha(b'old'), 3)
+
+        self.storage._save('a.jpg', ContentFile(b'new'))
+
+        self.assertEqual([method for method, _ in self.github.calls], ['PUT', 'GET', 'PUT'])
+        self.assertEqual(self.github.files['media/a.jpg'], b'new')
+        self.assertEqual(self.row('media/a.jpg').sha, blob_sha(b'new'))
+
+    def test_delete_removes_row(self):
+        self.github.files['media/a.jpg'] = b'abc'
+        index.record(self.storage, 'media/a.jpg', blob_sha(b'abc'), 3)
+
+        self.storage.delete('a.jpg')
+
+        self.assertEqual([method for method, _ in self.github.calls], ['DELETE'])
+        self.assertNotIn('media/a.jpg', self.github.files)
+        self.assertIsNone(self.row('media/a.jpg'))
+
+    def test_delete_of_file_removed_outside_the_storage_forgets_it(self):
+        index.record(self.storage, 'media/a.jpg', blob_sha(b'abc'), 3)
+
+        self.storage.delete('a.jpg')
+
+        self.assertEqual([method for method, _ in self.github.calls], ['DELETE', 'GET'])
+        self.assertIsNone(self.row('media/a.jpg'))
+
+
+class ReadCacheTests(GitHubStorageTestCase):
+    def setUp(self):
+        super().setUp()
+        cache_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(cache_dir.cleanup)
+        cache_settings = self.settings(GITHUB_STORAGE_CACHE_DIR=cache_dir.name)
+        cache_settings.enable()
+        self.addCleanup(cache_settings.disable)
+        self.github.files['media/a.jpg'] = b'image data'
+
+    def test_second_read_comes_from_cache(self):
+        index.record(self.storage, 'media/a.jpg', blob_sha(b'image data'), 10)
+
+        with self.storage.open('a.jpg') as f:
+            self.assertEqual(f.read(), b'image data')
+        with self.storage.open('a.jpg') as f:
+            self.assertEqual(f.read(), b'image data')
+
+        self.assertEqual(len(self.github.calls), 1)
+
+    def test_cache_is_skipped_with_a_warning_without_index(self):
+        with self.settings(GITHUB_STORAGE_INDEX=False), self.assertLogs('storage.github_storage', 'WARNING'):
+            for _ in range(2):
+                with self.storage.open('a.jpg') as f:
+                    self.assertEqual(f.read(), b'image data')
+
+        self.assertEqual(len(self.github.calls), 2)
+
+
+class RefreshIndexTests(GitHubStorageTestCase):
+    def test_refresh_rebuilds_rows_from_tree(self):
+        modified = datetime(2025, 6, 1, tzinfo=dt_timezone.utc)
+        index.record(self.storage, 'media/kept.jpg', 'k' * 40, 1, modified)
+        index.record(self.storage, 'media/changed.jpg', 'o' * 40, 1, modified)
+        index.record(self.storage, 'media/removed.jpg', 'r' * 40, 1, modified)
+        self.github.trees['main'] = {'sha': 't' * 40, 'truncated': False, 'tree': [
+            {'path': 'media', 'type': 'tree', 'sha': 'd' * 40},
+            {'path': 'media/kept.jpg', 'type': 'blob', 'sha': 'k' * 40, 'size': 1},
+            {'path': 'media/changed.jpg', 'type': 'blob', 'sha': 'n' * 40, 'size': 2},
+            {'path': 'media/new.jpg', 'type': 'blob', 'sha': 'w' * 40, 'size': 3},
+        ]}
+
+        result = index.refresh_index(self.storage)
+
+        self.assertEqual(result, {'files': 3, 'updated': 3, 'removed': 1})
+        rows = {row.path: row for row in GitHubFile.objects.all()}
+        self.assertEqual(set(rows), {'media/kept.jpg', 'media/changed.jpg', 'media/new.jpg'})
+        self.assertEqual((rows['media/changed.jpg'].sha, rows['media/changed.jpg'].size), ('n' * 40, 2))
+        # Only unchanged files keep their modified time
+        self.assertEqual(rows['media/kept.jpg'].modified, modified)
+        self.assertIsNone(rows['media/changed.jpg'].modified)
+        state = GitHubIndexState.objects.get(repository='owner/repo', branch='main')
+        self.assertEqual((state.tree_sha, state.files), ('t' * 40, 3))
+
+    def test_truncated_tree_is_walked_directory_by_directory(self):
+        self.github.trees['main'] = {'sha': 'root', 'truncated': True, 'tree': [
+            {'path': 'README.md', 'type': 'blob', 'sha': 'r' * 40, 'size': 5},
+        ]}
+        self.github.trees['root'] = {'sha': 'root', 'tree': [
+            {'path': 'README.md', 'type': 'blob', 'sha': 'r' * 40, 'size': 5},
+            {'path': 'media', 'type': 'tree', 'sha': 'media'},
+        ]}
+        self.github.trees['media'] = {'sha': 'media', 'tree': [
+            {'path': 'a.jpg', 'type': 'blob', 'sha': 'a' * 40, 'size': 1},
+            {'path': 'products', 'type': 'tree', 'sha': 'products'},
+        ]}
+        self.github.trees['products'] = {'sha': 'products', 'tree': [
+            {'path': 'b.jpg', 'type': 'blob', 'sha': 'b' * 40, 'size': 2},
+        ]}
+
+        result = index.refresh_index(self.storage)
+
+        self.assertEqual(result['files'], 3)
+        self.assertEqual(
+            dict(GitHubFile.objects.values_list('path', 'sha')),
+            {'README.md': 'r' * 40, 'media/a.jpg': 'a' * 40, 'media/products/b.jpg': 'b' * 40},
+        )
+        self.assertEqual(len(self.github.calls), 4)
+
+    def test_refresh_without_tree_raises_and_keeps_rows(self):
+        index.record(self.storage, 'media/a.jpg', 'a' * 40, 1)
+
+        with self.assertRaises(index.IndexRefreshError):
+            index.refresh_index(self.storage)
+
+        self.assertIsNotNone(self.row('media/a.jpg'))
+
+
+class CommitBatchTests(GitHubStorageTestCase):
+    def git_calls(self):
+        """Git data API calls after the blobs, which are created concurrently."""
+        return [(method, url.split('/git/', 1)[1]) for method, url in self.github.calls
+                if '/git/' in url and not url.endswith('/blobs')]
+
+    def blob_calls(self):
+        return sum(1 for _, url in self.github.calls if url.endswith('/blobs'))
+
+    def push_calls(self, parent):
+        return [('GET', 'ref/heads/main'), ('GET', f'commits/{parent}'), ('POST', 'trees'),
+                ('POST', 'commits'), ('PATCH', 'refs/heads/main')]
+
+    def test_files_are_pushed_as_one_commit(self):
+        with self.storage.batch(message='Upload images') as batch:
+            self.storage._save('a.jpg', ContentFile(b'a'))
+            self.storage._save('b.jpg', ContentFile(b'b'))
+            self.assertEqual(self.github.calls, [])
+
+        self.assertEqual(self.blob_calls(), 2)
+        self.assertEqual(self.git_calls(), self.push_calls('base'))
+        self.assertFalse([call for call in self.github.calls if call[0] == 'PUT'])
+        commit = self.github.commits[batch.commit_sha]
+        self.assertEqual((commit['message'], commit['parents']), ('Upload images', ['base']))
+        self.assertEqual(self.github.files, {'media/a.jpg': b'a', 'media/b.jpg': b'b'})
+        self.assertEqual(self.row('media/b.jpg').sha, blob_sha(b'b'))
+        self.assertEqual(self.row('media/b.jpg').modified, datetime(2026, 1, 2, 3, 4, 5, tzinfo=dt_timezone.utc))
+        self.assertTrue(all(result.committed for result in batch.results))
+
+    def test_moved_branch_is_retried_on_the_new_head_with_the_same_blobs(self):
+        self.github.racing_commits = 1
+
+        with self.assertLogs('storage.batch', 'WARNING'):
+            with self.storage.batch() as batch:
+                self.storage._save('a.jpg', ContentFile(b'a'))
+
+        self.assertEqual(self.blob_calls(), 1)
+        self.assertEqual(self.git_calls(), self.push_calls('base') + self.push_calls('elsewhere-0'))
+        self.assertEqual(self.github.commits[batch.commit_sha]['parents'], ['elsewhere-0'])
+        self.assertEqual(self.github.files, {'media/a.jpg': b'a'})
+
+    def test_branch_that_keeps_moving_fails_every_file(self):
+        self.github.racing_commits = 3
+
+        with self.assertRaises(BatchUploadError), self.assertLogs('storage.batch'):
+            with self.storage.batch():
+                self.storage._save('a.jpg', ContentFile(b'a'))
+
+        self.assertEqual(self.github.files, {})
+        self.assertIsNone(self.row('media/a.jpg'))
+
+    def test_failed_blob_raises_after_the_rest_is_committed(self):
+        self.github.bad_blobs.add(b'bad')
+
+        with self.assertRaises(BatchUploadError) as raised, self.assertLogs('storage.batch', 'ERROR'):
+            with self.storage.batch():
+                self.storage._save('good.jpg', ContentFile(b'good'))
+                self.storage._save('bad.jpg', ContentFile(b'bad'))
+
+        results = {result.name: result for result in raised.exception.results}
+        self.assertTrue(results['good.jpg'].committed)
+        self.assertIn('500', results['bad.jpg'].error)
+        self.assertEqual(self.github.files, {'media/good.jpg': b'good'})
+        self.assertIsNotNone(self.row('media/good.jpg'))
+        self.assertIsNone(self.row('media/bad.jpg'))
+
+    def test_failed_blob_is_reported_without_raise_on_error(self):
+        self.github.bad_blobs.add(b'bad')
+
+        with self.assertLogs('storage.batch', 'ERROR'):
+            with self.storage.batch(raise_on_error=False) as batch:
+                self.storage._save('good.jpg', ContentFile(b'good'))
+                self.storage._save('bad.jpg', ContentFile(b'bad'))
+
+        self.assertEqual([result.name for result in batch.failed], ['bad.jpg'])
+
+    def test_nested_batch_commits_its_own_files_when_left(self):
+        with self.storage.batch() as outer:
+            self.storage._save('a.jpg', ContentFile(b'a'))
+            with self.storage.batch() as inner:
+                self.storage._save('b.jpg', ContentFile(b'b'))
+            self.assertEqual(self.github.files, {'media/b.jpg': b'b'})
+            self.assertTrue(self.storage.exists('a.jpg'))
+
+        self.assertEqual(self.github.commits[outer.commit_sha]['parents'], [inner.commit_sha])
+        self.assertEqual([result.name for result in outer.results], ['a.jpg'])
+        self.assertEqual(self.github.files, {'media/a.jpg': b'a', 'media/b.jpg': b'b'})
+
+    def test_exception_discards_the_queue(self):
+        with self.assertRaises(ValueError):
+            with self.storage.batch():
+                self.storage._save('a.jpg', ContentFile(b'a'))
+                raise ValueError
+
+        self.assertEqual(self.github.calls, [])
+        self.assertFalse(self.storage.exists('a.jpg'))